@@ -0,0 +1,57 @@
+"""
+Requests/sec of the exercise catalog endpoints, before and after
+pre-encoding the responses.
+
+"before" re-runs the previous handler body (model_dump + jsonify on every
+request) against the same in-memory catalog, "after" is the real endpoint,
+with and without a matching If-None-Match.
+
+    python -m benchmarks.bench_catalog_endpoints --exercises 200
+"""
+import argparse
+from benchmarks.support import use_sqlite_database, seed_catalog, measure, print_results
+
+use_sqlite_database()
+
+from flask import jsonify
+from src.fit.app import create_app
+from src.fit.services.fitness_service import get_all_exercises, get_exercise_by_id
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exercises", type=int, default=200, help="size of the synthetic catalog")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    
+    seed_catalog(exercise_count=args.exercises)
+    app = create_app({"TESTING": True})
+    
+    # The handlers as they were before the responses were pre-encoded
+    @app.route("/bench/before/exercises")
+    def before_exercises():
+        return jsonify([ex.model_dump() for ex in get_all_exercises()]), 200
+    
+    @app.route("/bench/before/exercises/<int:exercise_id>")
+    def before_exercise(exercise_id):
+        return jsonify(get_exercise_by_id(exercise_id).model_dump()), 200
+    
+    client = app.test_client()
+    etag = client.get("/fitness/exercises").headers["ETag"]
+    exercise_etag = client.get("/fitness/exercises/1").headers["ETag"]
+    
+    results = {
+        "before: GET /fitness/exercises": measure(lambda: client.get("/bench/before/exercises"), args.iterations),
+        "after:  GET /fitness/exercises": measure(lambda: client.get("/fitness/exercises"), args.iterations),
+        "after:  GET /fitness/exercises (304)": measure(
+            lambda: client.get("/fitness/exercises", headers={"If-None-Match": etag}), args.iterations
+        ),
+        "before: GET /fitness/exercises/1": measure(lambda: client.get("/bench/before/exercises/1"), args.iterations),
+        "after:  GET /fitness/exercises/1": measure(lambda: client.get("/fitness/exercises/1"), args.iterations),
+        "after:  GET /fitness/exercises/1 (304)": measure(
+            lambda: client.get("/fitness/exercises/1", headers={"If-None-Match": exercise_etag}), args.iterations
+        ),
+    }
+    print_results(f"Catalog endpoints, {args.exercises} exercises (Flask test client, single thread)", results)
+
+if __name__ == "__main__":
+    main()
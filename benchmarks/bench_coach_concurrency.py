@@ -0,0 +1,112 @@
+"""
+Concurrent /generate-wod throughput of the coach service, Flask dev server
+(a thread per in-flight request, time.sleep) against the ASGI app under
+uvicorn (one event loop, asyncio.sleep).
+
+Both servers run the coach's real 1-2s simulated latency in a subprocess.
+The client keeps --concurrency requests in flight on raw asyncio sockets, so
+it is not the bottleneck itself.
+
+    python -m benchmarks.bench_coach_concurrency --concurrency 5000 --requests 10000
+"""
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+from time import perf_counter
+from typing import Dict, List
+from benchmarks.support import print_results
+
+SERVERS = {
+    "flask dev server (threaded)": [sys.executable, "-m", "flask", "--app", "src/coach/app.py", "run", "--port", "{port}"],
+    "uvicorn + asgi_app": [sys.executable, "-m", "uvicorn", "src.coach.app:asgi_app", "--port", "{port}", "--log-level", "warning"],
+}
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_until_listening(port: int, timeout: float = 15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Coach did not start listening on port {port}")
+
+async def post_wod(port: int, body: bytes) -> bool:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(
+            b"POST /generate-wod HTTP/1.1\r\nHost: coach\r\nContent-Type: application/json\r\n"
+            b"Connection: close\r\nContent-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+        )
+        await writer.drain()
+        response = await reader.read()
+        return response.startswith(b"HTTP/1.1 200") or response.startswith(b"HTTP/1.0 200")
+    finally:
+        writer.close()
+
+async def run_load(port: int, total: int, concurrency: int) -> Dict[str, float]:
+    body = json.dumps({"user_email": "bench@test.com", "excluded_exercises": ["Plank"]}).encode()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = perf_counter()
+            try:
+                ok = await asyncio.wait_for(post_wod(port, body), timeout=60)
+            except (OSError, asyncio.TimeoutError):
+                ok = False
+            if ok:
+                latencies.append(perf_counter() - start)
+            else:
+                errors += 1
+
+    start = perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = perf_counter() - start
+    return {
+        "iterations": total,
+        "requests_per_sec": len(latencies) / elapsed,
+        "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else float("nan"),
+        "errors": errors,
+    }
+
+def bench_server(command: List[str], total: int, concurrency: int) -> Dict[str, float]:
+    port = free_port()
+    server = subprocess.Popen(
+        [part.format(port=port) for part in command],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_listening(port)
+        return asyncio.run(run_load(port, total, concurrency))
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=5000, help="requests kept in flight")
+    parser.add_argument("--requests", type=int, default=10000, help="total requests per server")
+    args = parser.parse_args()
+
+    results = {name: bench_server(command, args.requests, args.concurrency) for name, command in SERVERS.items()}
+    print_results(f"Coach /generate-wod, {args.requests} requests, {args.concurrency} in flight", results)
+    for name, result in results.items():
+        if result["errors"]:
+            print(f"{name}: {result['errors']} failed requests")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Cost of picking a WOD in the coach as the template list grows, before and
+after the template index.
+
+"before" is the previous list scan, lowering every excluded name again for
+every template, "after" is TemplateIndex.select, with and without covering
+four distinct muscle groups.
+
+    python -m benchmarks.bench_coach_templates --sizes 10 1000 100000
+"""
+import argparse
+import random
+from time import perf_counter
+from benchmarks.support import measure, print_results
+from src.coach.app import TemplateIndex
+
+def make_templates(count: int, muscle_group_count: int = 40):
+    return [
+        {
+            "id": i,
+            "name": f"Exercise {i}",
+            "sets": 3,
+            "reps": "8-12",
+            "muscle_groups": [f"group {i % muscle_group_count}", f"group {i * 7 % muscle_group_count}"],
+            "equipment": ("bodyweight", "dumbbells", "kettlebell", "barbell")[i % 4],
+        }
+        for i in range(count)
+    ]
+
+def previous_select(templates, excluded_exercises):
+    available_exercises = [
+        ex for ex in templates
+        if ex['name'].lower() not in [e.lower() for e in excluded_exercises]
+    ]
+    return random.sample(available_exercises, min(6, len(available_exercises)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000], help="template list sizes")
+    parser.add_argument("--excluded", type=int, default=18, help="recently done exercises excluded by name")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        templates = make_templates(size)
+        excluded = [f"EXERCISE {i}" for i in random.sample(range(size), min(args.excluded, size // 2))]
+
+        start = perf_counter()
+        index = TemplateIndex(templates)
+        build_ms = (perf_counter() - start) * 1000
+
+        results = {
+            "before: list scan": measure(lambda: previous_select(templates, excluded), args.iterations),
+            "after:  index": measure(lambda: index.select(excluded), args.iterations),
+            "after:  index, cover 4 muscle groups": measure(
+                lambda: index.select(excluded, cover_muscle_groups=4), args.iterations
+            ),
+            "after:  index, dumbbells only": measure(
+                lambda: index.select(excluded, equipment=["dumbbells"]), args.iterations
+            ),
+        }
+        print_results(f"{size} templates, {len(excluded)} excluded (index built in {build_ms:.1f} ms)", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Password verifications (logins) per second for each hasher cost setting,
+one at a time and --clients at once through the verification pool.
+
+Throughput scales with the pool threads up to the number of cores, since
+hashlib releases the GIL while deriving. Pick the highest cost whose
+logins/sec per core still covers the expected login rate.
+
+    python -m benchmarks.bench_password_hashing --clients 16
+"""
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from benchmarks.support import measure, print_results
+from src.fit.services.password_hashing import PasswordVerifier, ScryptHasher, Pbkdf2Hasher
+
+HASHERS = {
+    "scrypt n=2**14": ScryptHasher(n=2 ** 14),
+    "scrypt n=2**15": ScryptHasher(n=2 ** 15),
+    "scrypt n=2**16": ScryptHasher(n=2 ** 16),
+    "pbkdf2_sha256 100000": Pbkdf2Hasher(iterations=100000),
+    "pbkdf2_sha256 310000": Pbkdf2Hasher(iterations=310000),
+    "pbkdf2_sha256 600000": Pbkdf2Hasher(iterations=600000),
+}
+
+def measure_concurrent(verifier: PasswordVerifier, encoded: str, clients: int, iterations: int):
+    def login(_):
+        return verifier.verify("s3cret", encoded)
+
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(login, range(clients)))  # warm up
+        start = perf_counter()
+        list(executor.map(login, range(iterations)))
+        elapsed = perf_counter() - start
+    return {"iterations": iterations, "requests_per_sec": iterations / elapsed, "mean_ms": elapsed / iterations * 1000}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20, help="logins per setting and mode")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent logins through the pool")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="verification pool threads")
+    args = parser.parse_args()
+
+    results = {}
+    for name, hasher in HASHERS.items():
+        encoded = hasher.hash("s3cret")
+        serial = PasswordVerifier(hasher, workers=0)
+        pooled = PasswordVerifier(hasher, workers=args.workers, max_pending=args.clients)
+        results[f"{name}, 1 at a time"] = measure(lambda: serial.verify("s3cret", encoded), args.iterations)
+        results[f"{name}, pool"] = measure_concurrent(pooled, encoded, args.clients, args.iterations * args.workers)
+        pooled.shutdown()
+
+    print_results(f"Logins/sec ({args.workers} verification threads, {args.clients} clients)", results)
+
+if __name__ == "__main__":
+    main()
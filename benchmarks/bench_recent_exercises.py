@@ -0,0 +1,78 @@
+"""
+get_recent_exercises on a large user_exercise_history table, with and
+without the (user_email, performed_at, exercise_id) index. The recent
+exercises cache is cleared before every lookup, so both figures time the
+SQL query rather than cache hits.
+
+Rows are spread over --users users and the past year, six per WOD, so a
+user's last three days hold about 18 of them.
+
+    python -m benchmarks.bench_recent_exercises --rows 2000000
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+from time import perf_counter
+from benchmarks.support import use_sqlite_database, seed_catalog, measure, print_results
+
+use_sqlite_database()
+
+from sqlalchemy import text
+from src.fit.database import engine
+from src.fit.db_migrations import create_missing_indexes
+from src.fit.services.fitness_coach_service import get_recent_exercises
+from src.fit.services.recent_exercises import recent_exercises_cache
+
+INDEX = "ix_user_exercise_history_user_performed_exercise"
+
+def insert_history(rows: int, users: int, chunk: int = 100000):
+    now = datetime.utcnow()
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("DELETE FROM user_exercise_history")
+        for start in range(0, rows, chunk):
+            cursor.executemany(
+                "INSERT INTO user_exercise_history (user_email, exercise_id, performed_at, suggested_weight, suggested_reps) "
+                "VALUES (?, ?, ?, ?, ?)",
+                # Same text format as SQLAlchemy's SQLite DateTime
+                [
+                    (f"user{i % users}@test.com", i % 60 + 1, (now - timedelta(days=(i // users // 6) % 365, minutes=i % 6)).isoformat(" "), 20.0, 10)
+                    for i in range(start, min(start + chunk, rows))
+                ]
+            )
+        connection.commit()
+    finally:
+        connection.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000000, help="history rows")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=2000, help="lookups with the index, without it runs 1/100 of them")
+    args = parser.parse_args()
+
+    seed_catalog(exercise_count=60)
+    start = perf_counter()
+    insert_history(args.rows, args.users)
+    print(f"Inserted {args.rows} history rows in {perf_counter() - start:.1f}s")
+
+    def lookup():
+        # Only the query is measured, a cached user would skip it
+        recent_exercises_cache.clear()
+        return get_recent_exercises(f"user{random.randrange(args.users)}@test.com")
+
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP INDEX IF EXISTS {INDEX}"))
+    results = {"without index": measure(lookup, max(1, args.iterations // 100))}
+
+    start = perf_counter()
+    create_missing_indexes(engine)
+    print(f"Built {INDEX} in {perf_counter() - start:.1f}s")
+    results["with index"] = measure(lookup, args.iterations)
+    assert len(lookup()) > 0
+
+    print_results(f"get_recent_exercises, {args.rows} rows, {args.users} users (SQLite)", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Compare two endpoint benchmark result files, e.g. from two commits.
+
+Prints each endpoint's throughput and percentiles before and after with the
+change in percent, and exits with 1 when a p95 latency grew by more than
+--threshold percent.
+
+    python -m benchmarks.compare_results .benchmarks/endpoints-abc123.json .benchmarks/endpoints-def456.json
+"""
+import sys
+import json
+import argparse
+
+METRICS = ("requests_per_sec", "p50_ms", "p95_ms", "p99_ms")
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+def change(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="p95 increase in percent counted as a regression")
+    args = parser.parse_args()
+
+    before, after = load(args.before), load(args.after)
+    if before["settings"] != after["settings"] or before["database"] != after["database"]:
+        print(f"Warning: the runs used other settings ({before['database']} {before['settings']} vs {after['database']} {after['settings']})")
+
+    print(f"{before['commit']} -> {after['commit']}")
+    print(f"{'scenario':<32} " + " ".join(f"{metric:>26}" for metric in METRICS))
+    regressions = []
+    for name, result in after["results"].items():
+        previous = before["results"].get(name)
+        if previous is None:
+            print(f"{name:<32} (new)")
+            continue
+        cells = [
+            f"{previous[metric]:>9.2f} -> {result[metric]:>9.2f} {change(previous[metric], result[metric]):>+4.0f}%"
+            for metric in METRICS
+        ]
+        print(f"{name:<32} " + " ".join(cells))
+        if change(previous["p95_ms"], result["p95_ms"]) > args.threshold:
+            regressions.append(name)
+
+    if regressions:
+        print(f"\np95 regressed by more than {args.threshold:.0f}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Fixtures of the endpoint benchmark suite.
+
+The application runs in-process (create_app() and the Flask test client)
+against a fresh SQLite file, or the database given with --bench-database-url,
+seeded once per session with the configured catalog, users and history.
+Each benchmark records its latencies with `bench`, and the results are
+printed and saved as JSON at the end of the session.
+"""
+import os
+import json
+import platform
+import subprocess
+import threading
+from datetime import datetime, timezone
+import pytest
+from benchmarks.support import use_sqlite_database, seed_catalog, seed_users, seed_history, measure_latencies, print_latencies
+
+PASSWORD = "bench-password"
+
+def pytest_addoption(parser):
+    group = parser.getgroup("bench", "endpoint benchmarks")
+    group.addoption("--bench-database-url", help="database to benchmark against (default: a fresh SQLite file)")
+    group.addoption("--bench-exercises", type=int, default=200, help="exercises in the catalog")
+    group.addoption("--bench-muscle-groups", type=int, default=20, help="muscle groups in the catalog")
+    group.addoption("--bench-users", type=int, default=1000, help="users, listed by /users")
+    group.addoption("--bench-history-rows", type=int, default=100000, help="exercise history rows spread over the users")
+    group.addoption("--bench-iterations", type=int, default=500, help="requests per endpoint")
+    group.addoption("--bench-login-iterations", type=int, default=20, help="requests to /oauth/token, each verifies a password")
+    group.addoption("--bench-wod-iterations", type=int, default=5, help="WODs generated, each for another user")
+    group.addoption("--bench-concurrency", type=int, default=1, help="threads sending requests")
+    group.addoption("--bench-json", help="results file (default: .benchmarks/endpoints-<commit>.json)")
+
+def pytest_configure(config):
+    # Before anything from src.fit is imported
+    database_url = config.getoption("--bench-database-url", None)
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+    else:
+        use_sqlite_database()
+    config._bench_results = {}
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+class Bench:
+    """
+    Runs a request repeatedly, checking its status, and keeps the latencies
+    """
+    def __init__(self, app, config):
+        self.app = app
+        self.config = config
+        self.results = config._bench_results
+        self._local = threading.local()
+    
+    @property
+    def client(self):
+        # One test client per sending thread
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        return client
+    
+    def __call__(self, name: str, send, status: int = 200, iterations: int = None):
+        def call():
+            response = send(self.client)
+            assert response.status_code == status, f"{name}: {response.status_code} {response.get_data(as_text=True)[:200]}"
+        
+        result = measure_latencies(
+            call,
+            iterations or self.config.getoption("--bench-iterations"),
+            self.config.getoption("--bench-concurrency")
+        )
+        self.results[name] = result
+        return result
+
+@pytest.fixture(scope="session")
+def app(pytestconfig):
+    from src.fit.app import create_app
+    from src.fit.services.password_hashing import password_verifier
+    
+    exercises = pytestconfig.getoption("--bench-exercises")
+    seed_catalog(exercise_count=exercises, muscle_group_count=pytestconfig.getoption("--bench-muscle-groups"))
+    emails = seed_users(pytestconfig.getoption("--bench-users"), password_verifier.hash(PASSWORD))
+    seed_history(pytestconfig.getoption("--bench-history-rows"), emails, exercises)
+    app = create_app({"TESTING": True})
+    app.bench_users = emails
+    return app
+
+@pytest.fixture(scope="session")
+def bench(app, pytestconfig):
+    return Bench(app, pytestconfig)
+
+@pytest.fixture(scope="session")
+def tokens(app):
+    """
+    Access tokens of the admin and of every user
+    """
+    from src.fit.services.auth_service import create_access_token
+    
+    def token(email, role):
+        return create_access_token({"sub": email, "name": email, "role": role, "iss": "fit-api"})
+    
+    return {"admin": token("admin@bench.com", "admin"), **{email: token(email, "user") for email in app.bench_users}}
+
+def pytest_sessionfinish(session, exitstatus):
+    config = session.config
+    results = config._bench_results
+    if not results:
+        return
+    from src.fit.database import engine
+    
+    commit = _git_commit()
+    path = config.getoption("--bench-json") or os.path.join(".benchmarks", f"endpoints-{commit}.json")
+    report = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "database": engine.dialect.name,
+        "settings": {
+            name: config.getoption(f"--bench-{name.replace('_', '-')}")
+            for name in ("exercises", "muscle_groups", "users", "history_rows", "concurrency")
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    config._bench_report_path = path
+
+def pytest_terminal_summary(terminalreporter, config):
+    results = getattr(config, "_bench_results", None)
+    if results:
+        print_latencies(f"Endpoints, concurrency {config.getoption('--bench-concurrency')} (Flask test client)", results)
+        terminalreporter.write_line(f"\nResults saved to {getattr(config, '_bench_report_path', '?')}")
@@ -0,0 +1,185 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run against a throwaway SQLite database, so DATABASE_URL must be
+set before anything from src.fit is imported: call use_sqlite_database()
+first, then import the application modules.
+"""
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Callable, Dict, List
+
+def use_sqlite_database() -> str:
+    """
+    Point the application at a fresh SQLite file unless DATABASE_URL is already set
+    """
+    if "DATABASE_URL" not in os.environ:
+        fd, path = tempfile.mkstemp(suffix=".db", prefix="fit-bench-")
+        os.close(fd)
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return os.environ["DATABASE_URL"]
+
+def seed_catalog(exercise_count: int = 20, muscle_group_count: int = 20):
+    """
+    Create the tables and insert a synthetic catalog where every exercise
+    works one primary and two secondary muscle groups
+    """
+    from src.fit.database import init_db, db_session
+    from src.fit.models_db import MuscleGroupModel, ExerciseModel, exercise_muscle_groups
+    from src.fit.services.catalog_cache import bump_catalog_version
+    
+    init_db()
+    db = db_session()
+    try:
+        db.execute(exercise_muscle_groups.delete())
+        db.query(ExerciseModel).delete()
+        db.query(MuscleGroupModel).delete()
+        db.add_all([
+            MuscleGroupModel(id=i, name=f"Muscle {i}", body_part=f"Part {i % 6}", description=f"Muscle group number {i}")
+            for i in range(1, muscle_group_count + 1)
+        ])
+        db.add_all([
+            ExerciseModel(
+                id=i,
+                name=f"Exercise {i}",
+                description=f"A synthetic exercise number {i}",
+                difficulty=i % 5 + 1,
+                equipment="Dumbbells",
+                instructions="Lift the weight, then put it back down"
+            )
+            for i in range(1, exercise_count + 1)
+        ])
+        db.flush()
+        db.execute(exercise_muscle_groups.insert(), [
+            {"exercise_id": i, "muscle_group_id": (i + offset) % muscle_group_count + 1, "is_primary": offset == 0}
+            for i in range(1, exercise_count + 1)
+            for offset in range(min(3, muscle_group_count))
+        ])
+        db.commit()
+    finally:
+        db.close()
+    bump_catalog_version()
+
+def seed_users(count: int, password_hash: str, admin_email: str = "admin@bench.com") -> List[str]:
+    """
+    Replace the users (and their history and WODs) with `count` users and an
+    admin, all sharing `password_hash` so seeding does not hash each password
+    """
+    from src.fit.database import db_session
+    from src.fit.models_db import UserModel, UserExerciseHistoryModel, UserExerciseAggregateModel, DailyWODModel
+    
+    emails = [f"user{i}@bench.com" for i in range(count)]
+    db = db_session()
+    try:
+        for model in (UserExerciseHistoryModel, UserExerciseAggregateModel, DailyWODModel, UserModel):
+            db.query(model).delete()
+        db.execute(UserModel.__table__.insert(), [
+            {"email": email, "name": f"User {i}", "role": "user", "password_hash": password_hash, "weight": 75.0, "height": 180.0, "fitness_goal": "strength", "onboarded": "true"}
+            for i, email in enumerate(emails)
+        ])
+        db.add(UserModel(email=admin_email, name="Admin", role="admin", password_hash=password_hash, onboarded="true"))
+        db.commit()
+    finally:
+        db.close()
+    return emails
+
+def seed_history(rows: int, emails: List[str], exercise_count: int, chunk: int = 10000):
+    """
+    Spread `rows` exercise history rows over the users and the past year,
+    six exercises per WOD
+    """
+    from src.fit.database import engine
+    from src.fit.models_db import UserExerciseHistoryModel
+    
+    now = datetime.utcnow()
+    table = UserExerciseHistoryModel.__table__
+    with engine.begin() as connection:
+        for start in range(0, rows, chunk):
+            connection.execute(table.insert(), [
+                {
+                    "user_email": emails[i % len(emails)],
+                    "exercise_id": i % exercise_count + 1,
+                    "performed_at": now - timedelta(days=(i // len(emails) // 6) % 365, minutes=i % 6),
+                    "suggested_weight": 20.0,
+                    "suggested_reps": 10,
+                }
+                for i in range(start, min(start + chunk, rows))
+            ])
+
+def measure(call: Callable[[], object], iterations: int) -> Dict[str, float]:
+    """
+    Call `call` repeatedly and report throughput and mean latency
+    """
+    call()  # warm up
+    start = perf_counter()
+    for _ in range(iterations):
+        call()
+    elapsed = perf_counter() - start
+    return {
+        "iterations": iterations,
+        "requests_per_sec": iterations / elapsed,
+        "mean_ms": elapsed / iterations * 1000,
+    }
+
+def _percentile(ordered: List[float], percent: float) -> float:
+    # Nearest-rank percentile of already sorted values
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+def measure_latencies(call: Callable[[], object], iterations: int, concurrency: int = 1) -> Dict[str, float]:
+    """
+    Call `call` `iterations` times from `concurrency` threads and report
+    throughput, mean and p50/p95/p99 latencies
+    """
+    call()  # warm up
+    latencies: List[float] = []
+    remaining = iter(range(iterations))
+    lock = threading.Lock()
+    
+    def worker():
+        timings = []
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    break
+            start = perf_counter()
+            call()
+            timings.append((perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(timings)
+    
+    threads = [threading.Thread(target=worker) for _ in range(max(1, concurrency))]
+    start = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - start
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "requests_per_sec": iterations / elapsed,
+        "mean_ms": sum(latencies) / len(latencies),
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+    }
+
+def print_results(title: str, results: Dict[str, Dict[str, float]]):
+    print(f"\n{title}")
+    print(f"{'scenario':<40} {'req/s':>12} {'mean ms':>10}")
+    for name, result in results.items():
+        print(f"{name:<40} {result['requests_per_sec']:>12.0f} {result['mean_ms']:>10.3f}")
+
+def print_latencies(title: str, results: Dict[str, Dict[str, float]]):
+    print(f"\n{title}")
+    print(f"{'scenario':<40} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<40} {result['requests_per_sec']:>10.1f} {result['p50_ms']:>10.3f} "
+            f"{result['p95_ms']:>10.3f} {result['p99_ms']:>10.3f}"
+        )
@@ -0,0 +1,5 @@
+#!/usr/bin/env python
+from src.fit.server import run_server
+
+if __name__ == "__main__":
+    run_server()
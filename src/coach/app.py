@@ -1,47 +1,284 @@
 from flask import Flask, request, jsonify
+import asyncio
+import json
+import os
 import random
 import time
 
 app = Flask(__name__)
 
 EXERCISE_TEMPLATES = [
-    {"id": 1, "name": "Push-ups", "sets": 3, "reps": "10-15", "muscle_groups": ["chest", "triceps"]},
-    {"id": 2, "name": "Squats", "sets": 4, "reps": "12-20", "muscle_groups": ["legs", "glutes"]},
-    {"id": 3, "name": "Pull-ups", "sets": 3, "reps": "5-10", "muscle_groups": ["back", "biceps"]},
-    {"id": 4, "name": "Burpees", "sets": 3, "reps": "8-12", "muscle_groups": ["full_body"]},
-    {"id": 5, "name": "Lunges", "sets": 3, "reps": "10-15", "muscle_groups": ["legs", "glutes"]},
-    {"id": 6, "name": "Plank", "sets": 3, "duration": "30-60s", "muscle_groups": ["core"]},
+    {"id": 1, "name": "Push-ups", "sets": 3, "reps": "10-15", "muscle_groups": ["chest", "triceps"], "equipment": "bodyweight"},
+    {"id": 2, "name": "Squats", "sets": 4, "reps": "12-20", "muscle_groups": ["legs", "glutes"], "equipment": "bodyweight"},
+    {"id": 3, "name": "Pull-ups", "sets": 3, "reps": "5-10", "muscle_groups": ["back", "biceps"], "equipment": "pull-up bar"},
+    {"id": 4, "name": "Burpees", "sets": 3, "reps": "8-12", "muscle_groups": ["full_body"], "equipment": "bodyweight"},
+    {"id": 5, "name": "Lunges", "sets": 3, "reps": "10-15", "muscle_groups": ["legs", "glutes"], "equipment": "bodyweight"},
+    {"id": 6, "name": "Plank", "sets": 3, "duration": "30-60s", "muscle_groups": ["core"], "equipment": "bodyweight"},
 ]
 
-@app.route('/health', methods=['GET'])
-def health_check():
-    return jsonify({"status": "healthy", "service": "coach"})
+# Exercises in a WOD unless the request asks for another count, and the most it can ask for
+DEFAULT_WOD_SIZE = 6
+MAX_WOD_SIZE = 50
 
-@app.route('/generate-wod', methods=['POST'])
-def generate_wod():
-    data = request.get_json()
+def normalize_name(name):
+    """
+    Key under which template names are compared, ignoring case and extra spaces
+    """
+    return " ".join(name.split()).casefold()
+
+class TemplateIndex:
+    """
+    The exercise templates, indexed once so that a WOD costs O(excluded + picked)
+    instead of a scan of every template for every excluded name.
+    Templates are referred to by their position in `templates`.
+    """
+    # Below that many candidates filtering them is cheaper than random draws
+    SMALL_POOL = 64
     
-    time.sleep(random.uniform(1, 2))
+    def __init__(self, templates):
+        self.templates = tuple(templates)
+        self.equipment = tuple(template.get("equipment", "bodyweight") for template in self.templates)
+        self.by_name = {}
+        by_muscle_group = {}
+        by_equipment = {}
+        for position, template in enumerate(self.templates):
+            self.by_name.setdefault(normalize_name(template["name"]), position)
+            for muscle_group in template.get("muscle_groups", ()):
+                by_muscle_group.setdefault(muscle_group, []).append(position)
+            by_equipment.setdefault(self.equipment[position], []).append(position)
+        self.muscle_groups = tuple(by_muscle_group)
+        self.by_muscle_group = {key: tuple(positions) for key, positions in by_muscle_group.items()}
+        self.by_equipment = {key: tuple(positions) for key, positions in by_equipment.items()}
     
-    user_email = data.get('user_email')
-    excluded_exercises = data.get('excluded_exercises', [])
+    def excluded_positions(self, excluded_names):
+        positions = (self.by_name.get(normalize_name(name)) for name in excluded_names)
+        return {position for position in positions if position is not None}
+    
+    def _allowed(self, position, rejected, equipment):
+        return position not in rejected and (equipment is None or self.equipment[position] in equipment)
+    
+    def _draw(self, pool, count, rejected, equipment):
+        """
+        Up to `count` random allowed positions of `pool`, drawn at random and
+        retried while most of a large pool is allowed (O(count)), otherwise
+        filtered once (O(pool))
+        """
+        picked = []
+        if count <= 0:
+            return picked
+        if len(pool) > self.SMALL_POOL and len(rejected) * 2 <= len(pool):
+            seen = set()
+            for _ in range(4 * count + 8):
+                position = pool[random.randrange(len(pool))]
+                if position not in seen and self._allowed(position, rejected, equipment):
+                    seen.add(position)
+                    picked.append(position)
+                    if len(picked) == count:
+                        return picked
+        available = [
+            position for position in pool
+            if position not in picked and self._allowed(position, rejected, equipment)
+        ]
+        return picked + random.sample(available, min(count - len(picked), len(available)))
     
-    available_exercises = [
-        ex for ex in EXERCISE_TEMPLATES 
-        if ex['name'].lower() not in [e.lower() for e in excluded_exercises]
-    ]
+    def _best_cover(self, candidates, rejected, covered, equipment, tries=8):
+        """
+        Out of a few random allowed candidates, the one working the most muscle groups not covered yet
+        """
+        best, best_gain = None, -1
+        for position in self._draw(candidates, tries, rejected, equipment):
+            gain = len(set(self.templates[position].get("muscle_groups", ())) - covered)
+            if gain > best_gain:
+                best, best_gain = position, gain
+        return best
     
-    num_exercises = min(6, len(available_exercises))
-    selected_exercises = random.sample(available_exercises, num_exercises)
+    def select(self, excluded_names=(), count=DEFAULT_WOD_SIZE, cover_muscle_groups=0, equipment=None):
+        """
+        Up to `count` random templates, none of them excluded by name.
+        With `cover_muscle_groups` they work at least that many distinct
+        muscle groups when the templates and `count` allow it (every template
+        picked for coverage adds at least one). With `equipment` only
+        templates needing one of those are picked.
+        """
+        rejected = self.excluded_positions(excluded_names)
+        if equipment is not None:
+            equipment = frozenset(equipment)
+            pools = [self.by_equipment.get(key, ()) for key in equipment]
+            pool = pools[0] if len(pools) == 1 else tuple(position for positions in pools for position in positions)
+        else:
+            pool = range(len(self.templates))
+        
+        picked = []
+        covered = set()
+        if cover_muscle_groups > 0:
+            muscle_groups = list(self.muscle_groups)
+            random.shuffle(muscle_groups)
+            for muscle_group in muscle_groups:
+                if len(covered) >= cover_muscle_groups or len(picked) >= count:
+                    break
+                if muscle_group in covered:
+                    continue
+                position = self._best_cover(self.by_muscle_group[muscle_group], rejected, covered, equipment)
+                if position is not None:
+                    rejected.add(position)
+                    picked.append(position)
+                    covered.update(self.templates[position].get("muscle_groups", ()))
+        
+        picked += self._draw(pool, count - len(picked), rejected, equipment)
+        return [self.templates[position] for position in picked]
+
+TEMPLATE_INDEX = TemplateIndex(EXERCISE_TEMPLATES)
+
+HEALTH = {"status": "healthy", "service": "coach"}
+# Most WOD requests accepted by one /generate-wod/batch call
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '500'))
+
+def simulated_latency():
+    """
+    Seconds the coach pretends to think before answering
+    """
+    return random.uniform(1, 2)
+
+def _int_field(data, name, default, low, high):
+    value = data.get(name, default)
+    if not isinstance(value, int) or isinstance(value, bool) or not low <= value <= high:
+        raise ValueError(f"{name} must be an integer between {low} and {high}")
+    return value
+
+def build_wod(data, index=TEMPLATE_INDEX):
+    """
+    Pick the exercises of a WOD for the JSON body of a /generate-wod request.
+    Besides excluded_exercises the body may ask for a `count` of exercises,
+    `cover_muscle_groups` distinct muscle groups and a list of allowed
+    `equipment`. Raises ValueError when invalid.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    user_email = data.get('user_email')
+    excluded_exercises = data.get('excluded_exercises') or []
+    equipment = data.get('equipment')
+    if not isinstance(excluded_exercises, list) or not all(isinstance(name, str) for name in excluded_exercises):
+        raise ValueError("excluded_exercises must be a list of exercise names")
+    if equipment is not None and (not isinstance(equipment, list) or not all(isinstance(e, str) for e in equipment)):
+        raise ValueError("equipment must be a list of equipment names")
     
-    wod = {
+    selected_exercises = index.select(
+        excluded_exercises,
+        count=_int_field(data, 'count', DEFAULT_WOD_SIZE, 1, MAX_WOD_SIZE),
+        cover_muscle_groups=_int_field(data, 'cover_muscle_groups', 0, 0, MAX_WOD_SIZE),
+        equipment=equipment
+    )
+    
+    return {
         "exercises": selected_exercises,
         "generated_at": time.time(),
         "user_email": user_email,
         "source": "coach_microservice"
     }
+
+def build_wod_batch(data):
+    """
+    WODs for the body of a /generate-wod/batch request, {"requests": [...]}
+    where every request is a /generate-wod body. Raises ValueError when invalid.
+    """
+    requests = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(requests, list) or not all(isinstance(item, dict) for item in requests):
+        raise ValueError("Expected {\"requests\": [...]} with one object per user")
+    if len(requests) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} requests per batch")
+    return {"wods": [build_wod(item) for item in requests]}
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    return jsonify(HEALTH)
+
+@app.route('/generate-wod', methods=['POST'])
+def generate_wod():
+    try:
+        wod = build_wod(request.get_json())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    time.sleep(simulated_latency())
     
     return jsonify(wod)
 
+@app.route('/generate-wod/batch', methods=['POST'])
+def generate_wod_batch():
+    try:
+        wods = build_wod_batch(request.get_json())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # The whole batch thinks once
+    time.sleep(simulated_latency())
+    
+    return jsonify(wods)
+
+async def _send_json(send, status, payload):
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+async def asgi_app(scope, receive, send):
+    """
+    The same endpoints as the Flask app, served by an ASGI server such as uvicorn:
+    
+        uvicorn app:asgi_app --host 0.0.0.0 --port 5001
+    
+    The simulated latency is awaited instead of slept, so a waiting WOD costs
+    a suspended coroutine rather than a whole thread and one process can keep
+    thousands of them in flight.
+    """
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+    
+    route = (scope["method"], scope["path"])
+    if route == ("GET", "/health"):
+        await _send_json(send, 200, HEALTH)
+    elif route in (("POST", "/generate-wod"), ("POST", "/generate-wod/batch")):
+        body = await _read_body(receive)
+        if body is None:
+            return
+        try:
+            data = json.loads(body)
+            if not isinstance(data, dict):
+                raise ValueError("Expected a JSON object")
+            wod = build_wod_batch(data) if scope["path"] == "/generate-wod/batch" else build_wod(data)
+        except ValueError as e:
+            await _send_json(send, 400, {"error": str(e)})
+            return
+        
+        await asyncio.sleep(simulated_latency())
+        
+        await _send_json(send, 200, wod)
+    elif scope["path"] in ("/health", "/generate-wod", "/generate-wod/batch"):
+        await _send_json(send, 405, {"error": "Method not allowed"})
+    else:
+        await _send_json(send, 404, {"error": "Not found"})
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    # Set PORT to run several coach replicas side by side
+    app.run(host='0.0.0.0', port=int(os.getenv('PORT', '5001')), debug=True)
@@ -1,13 +1,18 @@
 import os
-from flask import Flask
-from .blueprints.auth import auth_bp
-from .blueprints.users import user_bp
-from .blueprints.fitness import fitness_bp
-from .database import init_db
-from .services.fitness_data_init import init_fitness_data
+from time import perf_counter
+from flask import Flask, Response
 
 def create_app(config=None):
     """Application factory pattern for testing"""
+    # Imported here so that importing this module stays cheap: the blueprints
+    # pull in the models, pydantic schemas and services (tests/test_import_time.py)
+    from .blueprints.auth import auth_bp
+    from .blueprints.users import user_bp
+    from .blueprints.fitness import fitness_bp, wod_service
+    from .database import remove_session, get_pool_metrics
+    from .services.auth_service import load_request_claims
+    from .services.instrumentation import instrument_app, render_metrics
+    
     app = Flask(__name__)
     
     # Apply configuration
@@ -21,25 +26,68 @@ def create_app(config=None):
     app.register_blueprint(auth_bp)
     app.register_blueprint(user_bp)
     app.register_blueprint(fitness_bp)
+    
+    # Latency, status and SQL statements of every request, registered first to time the other hooks
+    instrument_app(app)
+    
+    # Bearer tokens are verified once per token and their claims put on g
+    app.before_request(load_request_claims)
+    
+    # Sessions are reused for a whole request and closed at its end
+    app.teardown_appcontext(remove_session)
 
     @app.route("/health")
     def health():
         return {"status": "UP"}
     
+    @app.route("/metrics")
+    def metrics():
+        # Prometheus text exposition format
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+    
+    @app.route("/metrics/db")
+    def db_metrics():
+        return get_pool_metrics()
+    
+    @app.route("/metrics/wod")
+    def wod_metrics():
+        return wod_service.stats.snapshot()
+    
+    @app.route("/metrics/coach")
+    def coach_metrics():
+        return {**wod_service.coach_client.stats(), "batching": wod_service.coach_batcher.stats()}
+    
     return app
 
-# Create the app instance for direct usage
-app = create_app()
-
 def run_app():
     """Entry point for the application script"""
+    from .database import init_db
+    from .services.fitness_data_init import init_fitness_data
+    from .services.wod_of_the_day import WODPregenerator, WOD_PREGEN_ENABLED
+    from .services.history_storage import HistoryMaintenance, HISTORY_MAINTENANCE_ENABLED
+    
+    start = perf_counter()
+    
     # Initialize the database before starting the app
     init_db()
     
-    # Initialize fitness data
+    # Initialize fitness data, a no-op unless the seed script changed
     init_fitness_data()
+    print(f"Database ready in {(perf_counter() - start) * 1000:.1f}ms")
+    
+    app = create_app()
+    # Debug mode, and with it the reloader, is on unless FLASK_DEBUG turns it off
+    app.debug = os.getenv("FLASK_DEBUG", "true").lower() in ("1", "true")
+    
+    # The reloader serves requests from a child process, only run the background jobs there
+    serving = not app.debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+    if WOD_PREGEN_ENABLED and serving:
+        from .blueprints.fitness import wod_of_the_day
+        WODPregenerator(wod_of_the_day).start()
+    if HISTORY_MAINTENANCE_ENABLED and serving:
+        HistoryMaintenance().start()
     
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    app.run(host="0.0.0.0", port=5000)
 
 if __name__ == "__main__":
     run_app()
\ No newline at end of file
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify, g
 from pydantic import ValidationError
 from ..models_dto import LoginSchema, TokenSchema
 from ..services.auth_service import authenticate_user, create_access_token
+from ..services.password_hashing import PasswordVerifierBusy
 import datetime
 
 auth_bp = Blueprint('auth', __name__)
@@ -53,5 +54,9 @@ def login():
         
     except ValidationError as e:
         return jsonify({"error": "Invalid login data", "details": e.errors()}), 400
+    except PasswordVerifierBusy as e:
+        response = jsonify({"error": "Too many logins in progress, retry later"})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 429
     except Exception as e:
         return jsonify({"error": "Error logging in", "details": str(e)}), 500
\ No newline at end of file
@@ -1,17 +1,46 @@
-from flask import Blueprint, request, jsonify, g
-from ..models_dto import WodResponseSchema, WodExerciseSchema, MuscleGroupImpact
-from ..services.fitness_service import (
-    get_all_exercises, get_exercise_by_id, get_exercises_by_muscle_group
-)
-from ..services.fitness_coach_service import calculate_intensity
+from flask import Blueprint, request, jsonify, g, current_app, url_for
+from ..models_dto import WodJobSchema
+from ..services.catalog_cache import get_catalog
 from ..services.wod_service import WODService
+from ..services.wod_jobs import WODJobManager, WODJob, WODJobQueueFull, FAILED
+from ..services.wod_of_the_day import WODOfTheDayService, seconds_until_midnight
 from ..services.auth_service import jwt_required
-import datetime
-import random
+from ..services.instrumentation import wod_stage_seconds
+from ..database import remove_session
 
 fitness_bp = Blueprint('fitness', __name__)
 
+# Longest time a job poll is held open waiting for the result
+MAX_LONG_POLL_SECONDS = 30
+
 wod_service = WODService()
+wod_of_the_day = WODOfTheDayService(wod_service.generate_wod_response)
+wod_jobs = WODJobManager(wod_of_the_day.get_or_generate)
+
+def _catalog_response(catalog, key, select):
+    """
+    Serve DTOs selected from the catalog snapshot as pre-encoded JSON.
+    The body is encoded once per snapshot and key, and clients sending back
+    its ETag in If-None-Match get an empty 304.
+    """
+    def encode(catalog):
+        selected = select(catalog)
+        if isinstance(selected, (list, tuple)):
+            payload = [ex.model_dump() for ex in selected]
+        else:
+            payload = selected.model_dump()
+        return f"{current_app.json.dumps(payload)}\n".encode()
+    
+    encoded = catalog.get_encoded(key, encode)
+    # If-None-Match compares weakly (RFC 9110), proxies compressing the body weaken the ETag
+    if request.if_none_match.contains_weak(encoded.etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(encoded.body, mimetype="application/json")
+    response.set_etag(encoded.etag)
+    # Let clients keep the payload but revalidate it on every poll
+    response.cache_control.no_cache = True
+    return response
 
 @fitness_bp.route("/fitness/exercises", methods=["GET"])
 def get_exercises():
@@ -19,68 +48,92 @@ def get_exercises():
         muscle_group_id = request.args.get("muscle_group_id")
         if muscle_group_id:
             # Get exercises for a specific muscle group
-            exercises = get_exercises_by_muscle_group(int(muscle_group_id))
+            muscle_group_id = int(muscle_group_id)
+            return _catalog_response(
+                get_catalog(),
+                ("exercises", muscle_group_id),
+                lambda catalog: catalog.by_muscle_group.get(muscle_group_id, ())
+            )
         else:
             # Get all exercises
-            exercises = get_all_exercises()
-        return jsonify([ex.model_dump() for ex in exercises]), 200
+            return _catalog_response(get_catalog(), ("exercises", None), lambda catalog: catalog.exercises)
     except Exception as e:
         return jsonify({"error": "Error retrieving exercises", "details": str(e)}), 500
 
 @fitness_bp.route("/fitness/exercises/<int:exercise_id>", methods=["GET"])
 def get_exercise(exercise_id):
     try:
-        exercise = get_exercise_by_id(exercise_id)
-        if not exercise:
+        # Check and serve from the same snapshot so a concurrent reload can't drop the exercise
+        catalog = get_catalog()
+        if exercise_id not in catalog.by_id:
             return jsonify({"error": "Exercise not found"}), 404
-        return jsonify(exercise.model_dump()), 200
+        return _catalog_response(catalog, ("exercise", exercise_id), lambda catalog: catalog.by_id[exercise_id])
     except Exception as e:
         return jsonify({"error": "Error retrieving exercise", "details": str(e)}), 500
 
+def _wod_job_schema(job: WODJob) -> WodJobSchema:
+    return WodJobSchema(id=job.id, status=job.status, result=job.result, error=job.error)
+
+def _queue_full_response(e: WODJobQueueFull):
+    return jsonify({"error": "Too many workouts being generated, retry later"}), 429, {"Retry-After": str(e.retry_after)}
+
 @fitness_bp.route("/fitness/wod", methods=["GET"])
 @jwt_required
 def get_wod():
     try:
-        # Get user email from token
-        user_email = g.user_email
-        
-        # Get the workout exercises with their muscle groups using strangler fig pattern
-        exercises_with_muscles = wod_service.request_wod(user_email)
-        
-        # Convert to response schema
-        wod_exercises = []
-        for exercise, muscle_groups in exercises_with_muscles:
-            # Create muscle group impact objects
-            muscle_impacts = [
-                MuscleGroupImpact(
-                    id=mg.id,
-                    name=mg.name,
-                    body_part=mg.body_part,
-                    is_primary=is_primary,
-                    # Higher intensity for primary muscle groups
-                    intensity=calculate_intensity(exercise.difficulty) * (1.2 if is_primary else 0.8)
-                )
-                for mg, is_primary in muscle_groups
-            ]
+        # Serve today's WOD right away when it was already generated
+        wod = wod_of_the_day.get(g.user_email)
+        if wod is None:
+            # Generate on the job workers like asynchronous requests, and wait for it
+            job = wod_jobs.submit(g.user_email)
+            # Don't keep a pooled connection idle for the seconds the generation takes
+            remove_session()
+            job.wait()
             
-            # Create exercise object
-            wod_exercise = WodExerciseSchema(
-                id=exercise.id,
-                name=exercise.name,
-                description=exercise.description,
-                difficulty=exercise.difficulty,
-                muscle_groups=muscle_impacts,
-                suggested_weight=random.uniform(5.0, 50.0),  # Random weight between 5 and 50 kg
-                suggested_reps=random.randint(8, 15)  # Random reps between 8 and 15
-            )
-            wod_exercises.append(wod_exercise)
+            if job.status == FAILED:
+                if job.error_status == 429:
+                    return jsonify({"error": job.error}), 429, {"Retry-After": str(job.retry_after)}
+                return jsonify({"error": "Error generating workout of the day", "details": job.error}), 500
+            wod = job.result
         
-        response = WodResponseSchema(
-            exercises=wod_exercises,
-            generated_at=datetime.datetime.now(datetime.UTC).isoformat()
-        )
+        # The WOD stays the same until midnight UTC
+        with wod_stage_seconds.time(stage="serialization"):
+            response = jsonify(wod.model_dump())
+        return response, 200, {"Cache-Control": f"private, max-age={seconds_until_midnight()}"}
+        
+    except WODJobQueueFull as e:
+        return _queue_full_response(e)
+    except Exception as e:
+        return jsonify({"error": "Error generating workout of the day", "details": str(e)}), 500
+
+@fitness_bp.route("/fitness/wod/jobs", methods=["POST"])
+@jwt_required
+def create_wod_job():
+    try:
+        job = wod_jobs.submit(g.user_email)
+        location = url_for("fitness.get_wod_job", job_id=job.id)
+        return jsonify(_wod_job_schema(job).model_dump()), 202, {"Location": location}
+    except WODJobQueueFull as e:
+        return _queue_full_response(e)
+    except Exception as e:
+        return jsonify({"error": "Error creating workout of the day job", "details": str(e)}), 500
+
+@fitness_bp.route("/fitness/wod/jobs/<job_id>", methods=["GET"])
+@jwt_required
+def get_wod_job(job_id):
+    try:
+        job = wod_jobs.get(job_id)
+        # Jobs of other users are not disclosed
+        if not job or job.user_email != g.user_email:
+            return jsonify({"error": "Job not found"}), 404
         
-        return jsonify(response.model_dump()), 200
+        # Optional long poll: hold the request until the job finishes or the wait is over
+        wait = float(request.args.get("wait", 0))
+        if wait > 0:
+            job = wod_jobs.wait(job, min(wait, MAX_LONG_POLL_SECONDS))
         
+        return jsonify(_wod_job_schema(job).model_dump()), 200 if job.finished else 202
+    except ValueError:
+        return jsonify({"error": "Invalid wait parameter"}), 400
     except Exception as e:
-        return jsonify({"error": "Error generating workout of the day", "details": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": "Error retrieving workout of the day job", "details": str(e)}), 500
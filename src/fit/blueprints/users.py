@@ -5,7 +5,7 @@ from ..services.user_service import create_user as create_user_service
 from ..services.user_service import get_all_users as get_all_users_service
 from ..services.user_service import update_user_profile, get_user_profile
 from ..services.auth_service import admin_required, jwt_required
-from ..database import db_session
+from ..database import db_session, release_session
 from ..models_db import UserModel
 import os
 
@@ -46,7 +46,7 @@ def create_bootstrap_admin():
         # Check if admin already exists to prevent multiple bootstraps
         db = db_session()
         admin_exists = db.query(UserModel).filter(UserModel.role == "admin").first() is not None
-        db.close()
+        release_session(db)
         
         if admin_exists:
             return jsonify({"error": "Admin user already exists"}), 409
@@ -1,8 +1,9 @@
 -- Initialization script for muscle groups and exercises tables
-
-DROP TABLE muscle_groups CASCADE;
-DROP TABLE exercises CASCADE;
-DROP TABLE exercise_muscle_groups CASCADE;
+--
+-- Idempotent: rows are upserted by name (and by exercise/muscle group pair),
+-- so the ids referenced by the exercise history never change. The script
+-- only runs when its checksum differs from the one stored in seed_versions,
+-- see init_fitness_data(). Rows removed from here are not deleted.
 
 -- Create muscle groups table
 CREATE TABLE IF NOT EXISTS muscle_groups (
@@ -56,7 +57,8 @@ INSERT INTO muscle_groups (name, body_part, description) VALUES
 ('Gluteus Medius', 'Glutes', 'The muscle on the outer surface of the pelvis'),
 ('Calves', 'Legs', 'The muscle group at the back of the lower leg including gastrocnemius and soleus'),
 ('Hip Flexors', 'Hips', 'The group of muscles that allow you to lift your knee toward your body'),
-('Adductors', 'Legs', 'The muscles of the inner thigh that pull the legs together');
+('Adductors', 'Legs', 'The muscles of the inner thigh that pull the legs together')
+ON CONFLICT (name) DO UPDATE SET body_part = excluded.body_part, description = excluded.description;
 
 -- Populate exercises
 INSERT INTO exercises (name, description, difficulty, equipment, instructions) VALUES
@@ -90,95 +92,113 @@ INSERT INTO exercises (name, description, difficulty, equipment, instructions) V
 ('Deadlifts', 'A compound exercise for the entire posterior chain', 4, 'Barbell', 'Bend at hips and knees to grab a barbell, stand up straight while keeping back flat'),
 ('Lunges', 'A unilateral exercise for legs and glutes', 2, 'Dumbbells (optional)', 'Step forward with one leg and lower your body until both knees are bent at 90 degrees'),
 ('Leg Press', 'A machine-based compound leg exercise', 2, 'Leg press machine', 'Push weight away by extending legs from a seated position'),
-('Calf Raises', 'An isolation exercise for the calves', 1, 'Step or calf raise machine', 'Raise heels off the ground by extending ankles, then lower back down');
+('Calf Raises', 'An isolation exercise for the calves', 1, 'Step or calf raise machine', 'Raise heels off the ground by extending ankles, then lower back down')
+ON CONFLICT (name) DO UPDATE SET description = excluded.description, difficulty = excluded.difficulty,
+    equipment = excluded.equipment, instructions = excluded.instructions;
 
 -- Link exercises to muscle groups (primary and secondary)
 -- Bench Press
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
 ((SELECT id FROM exercises WHERE name = 'Bench Press'), (SELECT id FROM muscle_groups WHERE name = 'Pectoralis Major'), TRUE),
 ((SELECT id FROM exercises WHERE name = 'Bench Press'), (SELECT id FROM muscle_groups WHERE name = 'Deltoids'), FALSE),
-((SELECT id FROM exercises WHERE name = 'Bench Press'), (SELECT id FROM muscle_groups WHERE name = 'Triceps Brachii'), FALSE);
+((SELECT id FROM exercises WHERE name = 'Bench Press'), (SELECT id FROM muscle_groups WHERE name = 'Triceps Brachii'), FALSE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Push-ups
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
 ((SELECT id FROM exercises WHERE name = 'Push-ups'), (SELECT id FROM muscle_groups WHERE name = 'Pectoralis Major'), TRUE),
 ((SELECT id FROM exercises WHERE name = 'Push-ups'), (SELECT id FROM muscle_groups WHERE name = 'Deltoids'), FALSE),
 ((SELECT id FROM exercises WHERE name = 'Push-ups'), (SELECT id FROM muscle_groups WHERE name = 'Triceps Brachii'), FALSE),
-((SELECT id FROM exercises WHERE name = 'Push-ups'), (SELECT id FROM muscle_groups WHERE name = 'Rectus Abdominis'), FALSE);
+((SELECT id FROM exercises WHERE name = 'Push-ups'), (SELECT id FROM muscle_groups WHERE name = 'Rectus Abdominis'), FALSE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Dumbbell Flyes
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
 ((SELECT id FROM exercises WHERE name = 'Dumbbell Flyes'), (SELECT id FROM muscle_groups WHERE name = 'Pectoralis Major'), TRUE),
-((SELECT id FROM exercises WHERE name = 'Dumbbell Flyes'), (SELECT id FROM muscle_groups WHERE name = 'Pectoralis Minor'), FALSE);
+((SELECT id FROM exercises WHERE name = 'Dumbbell Flyes'), (SELECT id FROM muscle_groups WHERE name = 'Pectoralis Minor'), FALSE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Pull-ups
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
 ((SELECT id FROM exercises WHERE name = 'Pull-ups'), (SELECT id FROM muscle_groups WHERE name = 'Latissimus Dorsi'), TRUE),
 ((SELECT id FROM exercises WHERE name = 'Pull-ups'), (SELECT id FROM muscle_groups WHERE name = 'Biceps Brachii'), FALSE),
-((SELECT id FROM exercises WHERE name = 'Pull-ups'), (SELECT id FROM muscle_groups WHERE name = 'Forearms'), FALSE);
+((SELECT id FROM exercises WHERE name = 'Pull-ups'), (SELECT id FROM muscle_groups WHERE name = 'Forearms'), FALSE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Barbell Rows
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
 ((SELECT id FROM exercises WHERE name = 'Barbell Rows'), (SELECT id FROM muscle_groups WHERE name = 'Latissimus Dorsi'), TRUE),
 ((SELECT id FROM exercises WHERE name = 'Barbell Rows'), (SELECT id FROM muscle_groups WHERE name = 'Rhomboids'), FALSE),
-((SELECT id FROM exercises WHERE name = 'Barbell Rows'), (SELECT id FROM muscle_groups WHERE name = 'Biceps Brachii'), FALSE);
+((SELECT id FROM exercises WHERE name = 'Barbell Rows'), (SELECT id FROM muscle_groups WHERE name = 'Biceps Brachii'), FALSE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Lat Pulldowns
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
 ((SELECT id FROM exercises WHERE name = 'Lat Pulldowns'), (SELECT id FROM muscle_groups WHERE name = 'Latissimus Dorsi'), TRUE),
-((SELECT id FROM exercises WHERE name = 'Lat Pulldowns'), (SELECT id FROM muscle_groups WHERE name = 'Biceps Brachii'), FALSE);
+((SELECT id FROM exercises WHERE name = 'Lat Pulldowns'), (SELECT id FROM muscle_groups WHERE name = 'Biceps Brachii'), FALSE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Overhead Press
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
 ((SELECT id FROM exercises WHERE name = 'Overhead Press'), (SELECT id FROM muscle_groups WHERE name = 'Deltoids'), TRUE),
-((SELECT id FROM exercises WHERE name = 'Overhead Press'), (SELECT id FROM muscle_groups WHERE name = 'Triceps Brachii'), FALSE);
+((SELECT id FROM exercises WHERE name = 'Overhead Press'), (SELECT id FROM muscle_groups WHERE name = 'Triceps Brachii'), FALSE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Lateral Raises
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
-((SELECT id FROM exercises WHERE name = 'Lateral Raises'), (SELECT id FROM muscle_groups WHERE name = 'Deltoids'), TRUE);
+((SELECT id FROM exercises WHERE name = 'Lateral Raises'), (SELECT id FROM muscle_groups WHERE name = 'Deltoids'), TRUE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Face Pulls
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
 ((SELECT id FROM exercises WHERE name = 'Face Pulls'), (SELECT id FROM muscle_groups WHERE name = 'Deltoids'), TRUE),
 ((SELECT id FROM exercises WHERE name = 'Face Pulls'), (SELECT id FROM muscle_groups WHERE name = 'Trapezius'), FALSE),
-((SELECT id FROM exercises WHERE name = 'Face Pulls'), (SELECT id FROM muscle_groups WHERE name = 'Rhomboids'), FALSE);
+((SELECT id FROM exercises WHERE name = 'Face Pulls'), (SELECT id FROM muscle_groups WHERE name = 'Rhomboids'), FALSE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Bicep Curls
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
 ((SELECT id FROM exercises WHERE name = 'Bicep Curls'), (SELECT id FROM muscle_groups WHERE name = 'Biceps Brachii'), TRUE),
-((SELECT id FROM exercises WHERE name = 'Bicep Curls'), (SELECT id FROM muscle_groups WHERE name = 'Forearms'), FALSE);
+((SELECT id FROM exercises WHERE name = 'Bicep Curls'), (SELECT id FROM muscle_groups WHERE name = 'Forearms'), FALSE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Tricep Pushdowns
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
-((SELECT id FROM exercises WHERE name = 'Tricep Pushdowns'), (SELECT id FROM muscle_groups WHERE name = 'Triceps Brachii'), TRUE);
+((SELECT id FROM exercises WHERE name = 'Tricep Pushdowns'), (SELECT id FROM muscle_groups WHERE name = 'Triceps Brachii'), TRUE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Hammer Curls
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
 ((SELECT id FROM exercises WHERE name = 'Hammer Curls'), (SELECT id FROM muscle_groups WHERE name = 'Biceps Brachii'), TRUE),
-((SELECT id FROM exercises WHERE name = 'Hammer Curls'), (SELECT id FROM muscle_groups WHERE name = 'Forearms'), TRUE);
+((SELECT id FROM exercises WHERE name = 'Hammer Curls'), (SELECT id FROM muscle_groups WHERE name = 'Forearms'), TRUE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Crunches
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
-((SELECT id FROM exercises WHERE name = 'Crunches'), (SELECT id FROM muscle_groups WHERE name = 'Rectus Abdominis'), TRUE);
+((SELECT id FROM exercises WHERE name = 'Crunches'), (SELECT id FROM muscle_groups WHERE name = 'Rectus Abdominis'), TRUE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Plank
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
 ((SELECT id FROM exercises WHERE name = 'Plank'), (SELECT id FROM muscle_groups WHERE name = 'Rectus Abdominis'), TRUE),
 ((SELECT id FROM exercises WHERE name = 'Plank'), (SELECT id FROM muscle_groups WHERE name = 'Transverse Abdominis'), TRUE),
 ((SELECT id FROM exercises WHERE name = 'Plank'), (SELECT id FROM muscle_groups WHERE name = 'Deltoids'), FALSE),
-((SELECT id FROM exercises WHERE name = 'Plank'), (SELECT id FROM muscle_groups WHERE name = 'Lower Back'), FALSE);
+((SELECT id FROM exercises WHERE name = 'Plank'), (SELECT id FROM muscle_groups WHERE name = 'Lower Back'), FALSE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Russian Twists
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
 ((SELECT id FROM exercises WHERE name = 'Russian Twists'), (SELECT id FROM muscle_groups WHERE name = 'Obliques'), TRUE),
-((SELECT id FROM exercises WHERE name = 'Russian Twists'), (SELECT id FROM muscle_groups WHERE name = 'Rectus Abdominis'), FALSE);
+((SELECT id FROM exercises WHERE name = 'Russian Twists'), (SELECT id FROM muscle_groups WHERE name = 'Rectus Abdominis'), FALSE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Squats
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
 ((SELECT id FROM exercises WHERE name = 'Squats'), (SELECT id FROM muscle_groups WHERE name = 'Quadriceps'), TRUE),
 ((SELECT id FROM exercises WHERE name = 'Squats'), (SELECT id FROM muscle_groups WHERE name = 'Gluteus Maximus'), TRUE),
 ((SELECT id FROM exercises WHERE name = 'Squats'), (SELECT id FROM muscle_groups WHERE name = 'Hamstrings'), FALSE),
-((SELECT id FROM exercises WHERE name = 'Squats'), (SELECT id FROM muscle_groups WHERE name = 'Lower Back'), FALSE);
+((SELECT id FROM exercises WHERE name = 'Squats'), (SELECT id FROM muscle_groups WHERE name = 'Lower Back'), FALSE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Deadlifts
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
@@ -187,20 +207,24 @@ INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VA
 ((SELECT id FROM exercises WHERE name = 'Deadlifts'), (SELECT id FROM muscle_groups WHERE name = 'Hamstrings'), TRUE),
 ((SELECT id FROM exercises WHERE name = 'Deadlifts'), (SELECT id FROM muscle_groups WHERE name = 'Quadriceps'), FALSE),
 ((SELECT id FROM exercises WHERE name = 'Deadlifts'), (SELECT id FROM muscle_groups WHERE name = 'Trapezius'), FALSE),
-((SELECT id FROM exercises WHERE name = 'Deadlifts'), (SELECT id FROM muscle_groups WHERE name = 'Forearms'), FALSE);
+((SELECT id FROM exercises WHERE name = 'Deadlifts'), (SELECT id FROM muscle_groups WHERE name = 'Forearms'), FALSE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Lunges
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
 ((SELECT id FROM exercises WHERE name = 'Lunges'), (SELECT id FROM muscle_groups WHERE name = 'Quadriceps'), TRUE),
 ((SELECT id FROM exercises WHERE name = 'Lunges'), (SELECT id FROM muscle_groups WHERE name = 'Gluteus Maximus'), TRUE),
-((SELECT id FROM exercises WHERE name = 'Lunges'), (SELECT id FROM muscle_groups WHERE name = 'Hamstrings'), FALSE);
+((SELECT id FROM exercises WHERE name = 'Lunges'), (SELECT id FROM muscle_groups WHERE name = 'Hamstrings'), FALSE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Leg Press
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
 ((SELECT id FROM exercises WHERE name = 'Leg Press'), (SELECT id FROM muscle_groups WHERE name = 'Quadriceps'), TRUE),
 ((SELECT id FROM exercises WHERE name = 'Leg Press'), (SELECT id FROM muscle_groups WHERE name = 'Gluteus Maximus'), FALSE),
-((SELECT id FROM exercises WHERE name = 'Leg Press'), (SELECT id FROM muscle_groups WHERE name = 'Hamstrings'), FALSE);
+((SELECT id FROM exercises WHERE name = 'Leg Press'), (SELECT id FROM muscle_groups WHERE name = 'Hamstrings'), FALSE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
 
 -- Calf Raises
 INSERT INTO exercise_muscle_groups (exercise_id, muscle_group_id, is_primary) VALUES
-((SELECT id FROM exercises WHERE name = 'Calf Raises'), (SELECT id FROM muscle_groups WHERE name = 'Calves'), TRUE); 
\ No newline at end of file
+((SELECT id FROM exercises WHERE name = 'Calf Raises'), (SELECT id FROM muscle_groups WHERE name = 'Calves'), TRUE)
+ON CONFLICT (exercise_id, muscle_group_id) DO UPDATE SET is_primary = excluded.is_primary;
@@ -0,0 +1,80 @@
+import logging
+from typing import List, Optional
+from sqlalchemy import Index, MetaData, inspect, text
+from sqlalchemy.engine import Engine
+from .database import Base, get_engine
+from .services.history_storage import PartitionedHistoryStorage
+
+logger = logging.getLogger(__name__)
+
+def _invalid_indexes(engine: Engine, table_name: str) -> List[str]:
+    """
+    Indexes left INVALID by an interrupted CREATE INDEX CONCURRENTLY, which
+    PostgreSQL keeps (and the inspector lists) but does not use
+    """
+    with engine.connect() as connection:
+        return list(connection.execute(
+            text(
+                "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE i.indrelid = to_regclass(:table) AND NOT i.indisvalid"
+            ),
+            {"table": table_name}
+        ).scalars())
+
+def _concurrent_copy(index: Index) -> Index:
+    """
+    A copy of the index created CONCURRENTLY, the index of the models must
+    keep creating inside transactions (create_all)
+    """
+    table = index.table.to_metadata(MetaData())
+    copy = next(table_index for table_index in table.indexes if table_index.name == index.name)
+    copy.dialect_options["postgresql"]["concurrently"] = True
+    return copy
+
+def create_missing_indexes(engine: Optional[Engine] = None) -> List[str]:
+    """
+    Create the indexes declared on the models that an existing database lacks,
+    returning their names.
+    On PostgreSQL they are built CONCURRENTLY, so the history table keeps
+    taking writes while its index is built, except on partitioned tables
+    which don't support it. An invalid index left by an interrupted build
+    is dropped and built again.
+    """
+    engine = engine or get_engine()
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        declared = {index.name for index in table.indexes}
+        concurrently = False
+        if engine.dialect.name == "postgresql":
+            with engine.connect() as connection:
+                concurrently = not PartitionedHistoryStorage.is_partitioned(connection, table.name)
+            for name in [name for name in _invalid_indexes(engine, table.name) if name in declared]:
+                logger.warning(f"Dropping invalid index {name} on {table.name}")
+                # DROP INDEX CONCURRENTLY cannot run inside a transaction either
+                with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                    connection.execute(text(f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {name}"))
+                existing_indexes.discard(name)
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            logger.info(f"Creating index {index.name} on {table.name}")
+            if concurrently:
+                # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+                with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                    _concurrent_copy(index).create(connection, checkfirst=True)
+            else:
+                with engine.begin() as connection:
+                    index.create(connection, checkfirst=True)
+            created.append(index.name)
+    return created
+
+if __name__ == "__main__":
+    # Migrate an existing database: python -m src.fit.db_migrations
+    logging.basicConfig(level=logging.INFO)
+    names = create_missing_indexes()
+    print(f"Created indexes: {', '.join(names)}" if names else "All indexes already exist")
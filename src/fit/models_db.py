@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, Integer, Boolean, ForeignKey, Table, Text, DateTime
+from sqlalchemy import Column, String, Float, Integer, Boolean, ForeignKey, Table, Text, DateTime, Date, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -26,6 +26,11 @@ class UserModel(Base):
 
 class UserExerciseHistoryModel(Base):
     __tablename__ = "user_exercise_history"
+    __table_args__ = (
+        # Covers the recent exercises of a user (user_email = ? AND performed_at >= ?)
+        # without reading the table rows
+        Index("ix_user_exercise_history_user_performed_exercise", "user_email", "performed_at", "exercise_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_email = Column(String, ForeignKey("users.email", ondelete="CASCADE"), nullable=False)
@@ -41,6 +46,59 @@ class UserExerciseHistoryModel(Base):
     def __repr__(self):
         return f"<UserExerciseHistory(user='{self.user_email}', exercise_id={self.exercise_id}, date='{self.performed_at}')>"
 
+class UserExerciseAggregateModel(Base):
+    __tablename__ = "user_exercise_aggregates"
+
+    # Totals of the history rows removed by the retention job, one row per user and exercise
+    user_email = Column(String, ForeignKey("users.email", ondelete="CASCADE"), primary_key=True)
+    exercise_id = Column(Integer, ForeignKey("exercises.id", ondelete="CASCADE"), primary_key=True)
+    times_performed = Column(Integer, nullable=False, default=0)
+    total_reps = Column(Integer, nullable=False, default=0)
+    total_volume = Column(Float, nullable=False, default=0.0)  # sum of weight x reps
+    first_performed_at = Column(DateTime, nullable=False)
+    last_performed_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<UserExerciseAggregate(user='{self.user_email}', exercise_id={self.exercise_id}, times={self.times_performed})>"
+
+class DailyWODModel(Base):
+    __tablename__ = "daily_wods"
+
+    # A workout of the day is generated once per user and UTC day
+    user_email = Column(String, ForeignKey("users.email", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    payload = Column(Text, nullable=False)  # WodResponseSchema as JSON
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<DailyWOD(user='{self.user_email}', day='{self.day}')>"
+
+class WODJobModel(Base):
+    __tablename__ = "wod_jobs"
+
+    # WOD generations run in the background, polled from any worker process
+    id = Column(String(32), primary_key=True)
+    user_email = Column(String, nullable=False)
+    status = Column(String(10), nullable=False)  # pending, running, done or failed
+    result = Column(Text, nullable=True)  # WodResponseSchema as JSON once done
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True, index=True)
+
+    def __repr__(self):
+        return f"<WODJob(id='{self.id}', user='{self.user_email}', status='{self.status}')>"
+
+class SeedVersionModel(Base):
+    __tablename__ = "seed_versions"
+
+    # One row per seed script, holding the checksum of the version last applied
+    name = Column(String(50), primary_key=True)
+    checksum = Column(String(64), nullable=False)  # sha256 of the script
+    applied_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<SeedVersion(name='{self.name}', checksum='{self.checksum[:12]}')>"
+
 # Junction table for the many-to-many relationship between exercises and muscle groups
 exercise_muscle_groups = Table(
     "exercise_muscle_groups",
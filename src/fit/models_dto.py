@@ -104,3 +104,9 @@ class WodExerciseSchema(BaseModel):
 class WodResponseSchema(BaseModel):
     exercises: List[WodExerciseSchema]
     generated_at: datetime
+
+class WodJobSchema(BaseModel):
+    id: str
+    status: str  # pending, running, done or failed
+    result: Optional[WodResponseSchema] = None
+    error: Optional[str] = None
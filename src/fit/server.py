@@ -0,0 +1,159 @@
+"""
+Production server of the fit app: gunicorn with several worker processes,
+each serving requests from a pool of threads.
+
+The master process imports the app, prepares the database and loads the
+exercise catalog once, then forks the workers, which share those pages
+copy-on-write instead of each loading its own copy. Workers are restarted
+gracefully: on SIGHUP, after WEB_MAX_REQUESTS requests, or when one dies,
+a worker finishes its requests in flight (up to WEB_GRACEFUL_TIMEOUT
+seconds) before exiting.
+"""
+import os
+import gc
+import fcntl
+import logging
+import tempfile
+from time import perf_counter
+from gunicorn.app.base import BaseApplication
+
+logger = logging.getLogger(__name__)
+
+# Address to listen on
+WEB_BIND = os.getenv('WEB_BIND', '0.0.0.0:5000')
+# Worker processes, each with its own GIL
+WEB_WORKERS = int(os.getenv('WEB_WORKERS', str(os.cpu_count() or 1)))
+# Threads serving requests in each worker
+WEB_THREADS = int(os.getenv('WEB_THREADS', '8'))
+# Seconds a worker may be silent before the master kills and replaces it
+WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', '60'))
+# Seconds a stopping worker gets to finish its requests in flight
+WEB_GRACEFUL_TIMEOUT = int(os.getenv('WEB_GRACEFUL_TIMEOUT', '30'))
+# Seconds an idle keep-alive connection is held open
+WEB_KEEPALIVE = int(os.getenv('WEB_KEEPALIVE', '5'))
+# Requests after which a worker is replaced, 0 never recycles workers; a random jitter up to WEB_MAX_REQUESTS_JITTER spreads the restarts
+WEB_MAX_REQUESTS = int(os.getenv('WEB_MAX_REQUESTS', '0'))
+WEB_MAX_REQUESTS_JITTER = int(os.getenv('WEB_MAX_REQUESTS_JITTER', '0'))
+# Load the app, database and catalog in the master before forking the workers
+WEB_PRELOAD = os.getenv('WEB_PRELOAD', 'true').lower() == 'true'
+
+# The CPU-bound pools default to one thread or process per CPU in every worker,
+# share the CPUs between the workers instead
+os.environ.setdefault('WOD_ENGINE_WORKERS', str(max(1, (os.cpu_count() or 1) // WEB_WORKERS)))
+os.environ.setdefault('PASSWORD_VERIFY_WORKERS', str(max(1, (os.cpu_count() or 1) // WEB_WORKERS)))
+
+def prepare_database():
+    """
+    Create the tables and seed data, once in the master rather than in every worker
+    """
+    from .database import init_db, get_engine
+    from .services.fitness_data_init import init_fitness_data
+    
+    start = perf_counter()
+    init_db()
+    init_fitness_data()
+    get_engine().dispose()
+    logger.info(f"Database ready in {(perf_counter() - start) * 1000:.1f}ms")
+
+def preload_app():
+    """
+    Create the app and everything the workers can share: tables, seed data and catalog
+    """
+    from .app import create_app
+    from .database import get_engine
+    from .services.catalog_cache import get_catalog
+    
+    prepare_database()
+    app = create_app()
+    catalog = get_catalog()
+    logger.info(f"Preloaded the catalog ({len(catalog.exercises)} exercises)")
+    
+    # Connections must not be shared with the workers, they open their own
+    get_engine().dispose()
+    # Keep the collector from writing to the shared objects, which would copy their pages
+    gc.freeze()
+    return app
+
+def _claim_background_jobs(bind: str):
+    """
+    The lock file when this worker is to run the background jobs, which must
+    run once per host, else None. The first worker to lock the file gets them;
+    the lock is released when it exits, so its replacement takes them over.
+    """
+    path = os.path.join(tempfile.gettempdir(), f"fit-background-{bind.replace(':', '_').replace('/', '_')}.lock")
+    lock_file = open(path, "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+def on_starting(server):
+    # Without preloading the workers import the app themselves, the database is still prepared once
+    if not server.cfg.preload_app:
+        prepare_database()
+
+def post_fork(server, worker):
+    from .database import get_engine
+    from .services.wod_of_the_day import WODPregenerator, WOD_PREGEN_ENABLED
+    from .services.history_storage import HistoryMaintenance, HISTORY_MAINTENANCE_ENABLED
+    
+    # Drop the connections inherited from the master without closing them under its feet
+    get_engine().dispose(close=False)
+    
+    if WOD_PREGEN_ENABLED or HISTORY_MAINTENANCE_ENABLED:
+        worker.background_lock = _claim_background_jobs(WEB_BIND)
+        if worker.background_lock is not None:
+            logger.info(f"Worker {worker.pid} runs the background jobs")
+            if WOD_PREGEN_ENABLED:
+                from .blueprints.fitness import wod_of_the_day
+                WODPregenerator(wod_of_the_day).start()
+            if HISTORY_MAINTENANCE_ENABLED:
+                HistoryMaintenance().start()
+
+def worker_exit(server, worker):
+    from .database import get_engine
+    from .services.wod_engine import wod_engine
+    
+    wod_engine.shutdown()
+    get_engine().dispose()
+
+class FitServer(BaseApplication):
+    """
+    gunicorn application serving the fit app with the settings above
+    """
+    def __init__(self, options: dict = None):
+        self.options = {
+            "bind": WEB_BIND,
+            "workers": WEB_WORKERS,
+            "threads": WEB_THREADS,
+            "worker_class": "gthread",
+            "timeout": WEB_TIMEOUT,
+            "graceful_timeout": WEB_GRACEFUL_TIMEOUT,
+            "keepalive": WEB_KEEPALIVE,
+            "max_requests": WEB_MAX_REQUESTS,
+            "max_requests_jitter": WEB_MAX_REQUESTS_JITTER,
+            "preload_app": WEB_PRELOAD,
+            "on_starting": on_starting,
+            "post_fork": post_fork,
+            "worker_exit": worker_exit,
+            **(options or {}),
+        }
+        super().__init__()
+    
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+    
+    def load(self):
+        if self.cfg.preload_app:
+            return preload_app()
+        from .app import create_app
+        return create_app()
+
+def run_server():
+    """Entry point of the production server"""
+    # The app's own loggers (startup time, background jobs) next to gunicorn's
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] [%(process)d] [%(levelname)s] %(name)s: %(message)s")
+    FitServer().run()
@@ -1,15 +1,23 @@
+import os
 import jwt
+import hashlib
 import datetime
-from typing import Optional, Callable
+import threading
+from collections import OrderedDict
+from time import time
+from types import MappingProxyType
+from typing import Optional, Callable, Mapping, Tuple
 from functools import wraps
 from flask import request, jsonify, g
 from ..models_db import UserModel
-from ..database import db_session
-from ..services.user_service import hash_password
+from ..database import db_session, release_session
+from .password_hashing import password_verifier
 
 
 SECRET_KEY = "fit-secret-key" 
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 8
+# Verified tokens whose claims are kept until they expire, least recently used ones are evicted
+JWT_CLAIMS_CACHE_SIZE = int(os.getenv('JWT_CLAIMS_CACHE_SIZE', '10000'))
 
 def authenticate_user(email: str, password: str) -> Optional[UserModel]:
     """
@@ -19,16 +27,24 @@ def authenticate_user(email: str, password: str) -> Optional[UserModel]:
     try:
         user = db.query(UserModel).filter(UserModel.email == email).first()
         if not user:
+            # As slow as a wrong password, not to reveal which emails have an account
+            password_verifier.verify_dummy(password)
             return None
         
-        # Check if password matches
-        hashed_password = hash_password(password)
-        if user.password_hash != hashed_password:
+        # Check if password matches, in constant time on the verification pool
+        valid, new_hash = password_verifier.verify(password, user.password_hash)
+        if not valid:
             return None
+        
+        if new_hash:
+            # Legacy or outdated hash, upgraded now that the password is known
+            user.password_hash = new_hash
+            db.commit()
+            db.refresh(user)
             
         return user
     finally:
-        db.close()
+        release_session(db)
 
 def create_access_token(data: dict, expires_delta: Optional[datetime.timedelta] = None) -> str:
     """
@@ -58,31 +74,128 @@ def decode_token(token: str) -> dict:
     except jwt.InvalidTokenError:
         return {"error": "Invalid token"}
 
+class ClaimsCache:
+    """
+    Claims of the tokens already verified, keyed by the SHA-256 digest of
+    the token and kept until the token's exp, so a token is verified once
+    rather than on every request it is sent with
+    """
+    def __init__(self, max_entries: int = JWT_CLAIMS_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[Mapping, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "expired": 0}
+    
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+    
+    def get(self, token: str) -> Optional[Mapping]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            claims, expires_at = entry
+            if time() >= expires_at:
+                del self._entries[key]
+                self.counters["expired"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return claims
+    
+    def put(self, token: str, claims: dict) -> Mapping:
+        """
+        Cache the claims of a verified token, returns them read-only
+        """
+        frozen = MappingProxyType(dict(claims))
+        if self.max_entries <= 0:
+            return frozen
+        # Tokens without exp never expire, they only leave the cache when evicted
+        expires_at = float(claims["exp"]) if isinstance(claims.get("exp"), (int, float)) else float("inf")
+        with self._lock:
+            self._entries[self._key(token)] = (frozen, expires_at)
+            self._entries.move_to_end(self._key(token))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return frozen
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries, **self.counters}
+
+claims_cache = ClaimsCache()
+
+def verify_token(token: str) -> Mapping:
+    """
+    Claims of a valid token, from the cache when it was already verified.
+    Like decode_token, returns {"error": ...} for an invalid or expired token.
+    """
+    claims = claims_cache.get(token)
+    if claims is not None:
+        return claims
+    
+    payload = decode_token(token)
+    if "error" in payload:
+        return payload
+    return claims_cache.put(token, payload)
+
+def load_request_claims():
+    """
+    Authentication middleware, registered to run before every request.
+    Parses the Authorization header once and stores the verified claims
+    in g.claims (and the subject in g.user_email), or the reason they are
+    missing in g.auth_error. Endpoints decide whether they require them.
+    """
+    g.claims = None
+    g.auth_error = None
+    
+    # Check if Authorization header is present
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        g.auth_error = "Authorization header missing"
+        return
+    
+    # Check if it's a Bearer token
+    parts = auth_header.split()
+    if len(parts) != 2 or parts[0].lower() != 'bearer':
+        g.auth_error = "Invalid authorization header format"
+        return
+    
+    payload = verify_token(parts[1])
+    
+    # Check if token is valid
+    if "error" in payload:
+        g.auth_error = payload["error"]
+        return
+    
+    g.claims = payload
+    g.user_email = payload.get("sub")
+
+def _request_claims() -> Tuple[Optional[Mapping], Optional[str]]:
+    # The middleware is not registered on apps built without create_app
+    if "auth_error" not in g:
+        load_request_claims()
+    return g.claims, g.auth_error
+
 def admin_required(f: Callable) -> Callable:
     """
     Decorator to require admin role for an endpoint
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        # Check if Authorization header is present
-        auth_header = request.headers.get('Authorization')
-        if not auth_header:
-            return jsonify({"error": "Authorization header missing"}), 401
-        
-        # Check if it's a Bearer token
-        parts = auth_header.split()
-        if parts[0].lower() != 'bearer' or len(parts) != 2:
-            return jsonify({"error": "Invalid authorization header format"}), 401
-        
-        token = parts[1]
-        payload = decode_token(token)
-        
-        # Check if token is valid
-        if "error" in payload:
-            return jsonify({"error": payload["error"]}), 401
+        claims, error = _request_claims()
+        if claims is None:
+            return jsonify({"error": error}), 401
         
         # Check if user has admin role
-        if payload.get("role") != "admin":
+        if claims.get("role") != "admin":
             return jsonify({"error": "Admin privileges required"}), 403
             
         return f(*args, **kwargs)
@@ -91,30 +204,14 @@ def admin_required(f: Callable) -> Callable:
 
 def jwt_required(f: Callable) -> Callable:
     """
-    Decorator to require a valid JWT token and set the user identity in Flask's g object
+    Decorator to require a valid JWT token, the claims and user identity are in Flask's g object
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        # Check if Authorization header is present
-        auth_header = request.headers.get('Authorization')
-        if not auth_header:
-            return jsonify({"error": "Authorization header missing"}), 401
-        
-        # Check if it's a Bearer token
-        parts = auth_header.split()
-        if parts[0].lower() != 'bearer' or len(parts) != 2:
-            return jsonify({"error": "Invalid authorization header format"}), 401
-        
-        token = parts[1]
-        payload = decode_token(token)
-        
-        # Check if token is valid
-        if "error" in payload:
-            return jsonify({"error": payload["error"]}), 401
-        
-        # Store user email in Flask's g object for the view function to use
-        g.user_email = payload.get("sub")
+        claims, error = _request_claims()
+        if claims is None:
+            return jsonify({"error": error}), 401
             
         return f(*args, **kwargs)
     
-    return decorated_function 
\ No newline at end of file
+    return decorated_function
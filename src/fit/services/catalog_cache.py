@@ -0,0 +1,213 @@
+import os
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from time import monotonic
+from types import MappingProxyType
+from typing import Callable, Dict, Hashable, Mapping, NamedTuple, Optional, Tuple
+from ..database import db_session, release_session
+from ..models_db import MuscleGroupModel, ExerciseModel, exercise_muscle_groups
+from ..models_dto import MuscleGroup, Exercise, MuscleGroupWithPrimary
+
+# Seconds after which a loaded catalog is re-read even without a version bump.
+# 0 keeps it until the next bump, which is enough for a single process.
+CATALOG_CACHE_MAX_AGE = float(os.getenv('CATALOG_CACHE_MAX_AGE', '0'))
+
+# Upper bound on the number of encoded responses kept per catalog snapshot
+MAX_ENCODED_RESPONSES = 512
+
+class EncodedResponse(NamedTuple):
+    body: bytes
+    etag: str
+
+@dataclass(frozen=True)
+class Catalog:
+    """
+    Immutable snapshot of the exercise catalog with its lookup indexes.
+    The DTOs inside are shared between requests and must not be modified.
+    """
+    version: int
+    loaded_at: float
+    exercises: Tuple[Exercise, ...]
+    muscle_groups: Mapping[int, MuscleGroup]
+    by_id: Mapping[int, Exercise]
+    by_name: Mapping[str, Exercise]  # keyed by normalize_name()
+    by_muscle_group: Mapping[int, Tuple[Exercise, ...]]
+    by_body_part: Mapping[str, Tuple[Exercise, ...]]
+    # Serialized responses built from this snapshot, dropped along with it
+    encoded_responses: Dict[Hashable, EncodedResponse] = field(default_factory=dict, compare=False, repr=False)
+    
+    def get_encoded(self, key: Hashable, encode: Callable[["Catalog"], bytes]) -> EncodedResponse:
+        """
+        Get the response body encoded from this snapshot for the given key,
+        along with a strong ETag computed from its content
+        """
+        encoded = self.encoded_responses.get(key)
+        if encoded is None:
+            body = encode(self)
+            encoded = EncodedResponse(body, hashlib.sha256(body).hexdigest())
+            if len(self.encoded_responses) < MAX_ENCODED_RESPONSES:
+                self.encoded_responses[key] = encoded
+        return encoded
+
+def query_exercise_catalog(db, exercise_filter=None):
+    """
+    Fetch exercises together with their muscle groups and the is_primary flag
+    in a single query, whatever the size of the catalog.
+    Returns a list of tuples containing:
+    - The exercise
+    - A list of tuples containing:
+      - The muscle group
+      - Whether it's a primary muscle group
+    """
+    query = db.query(
+        ExerciseModel,
+        MuscleGroupModel,
+        exercise_muscle_groups.c.is_primary
+    ).outerjoin(
+        exercise_muscle_groups,
+        ExerciseModel.id == exercise_muscle_groups.c.exercise_id
+    ).outerjoin(
+        MuscleGroupModel,
+        MuscleGroupModel.id == exercise_muscle_groups.c.muscle_group_id
+    )
+    if exercise_filter is not None:
+        query = query.filter(exercise_filter)
+    
+    # Group the flat join rows by exercise, keeping the exercise order
+    catalog = {}
+    for exercise, muscle_group, is_primary in query.order_by(ExerciseModel.id).all():
+        muscle_groups = catalog.setdefault(exercise.id, (exercise, []))[1]
+        if muscle_group is not None:
+            muscle_groups.append((muscle_group, is_primary))
+    
+    return list(catalog.values())
+
+def to_exercise_dto(exercise, muscle_groups) -> Exercise:
+    """
+    Convert an exercise and its (muscle group, is_primary) pairs to the DTO format
+    """
+    return Exercise.model_validate(
+        {
+            "id": exercise.id,
+            "name": exercise.name,
+            "description": exercise.description,
+            "difficulty": exercise.difficulty,
+            "equipment": exercise.equipment,
+            "instructions": exercise.instructions,
+            "muscle_groups": [
+                MuscleGroupWithPrimary.model_validate(
+                    {
+                        "id": mg.id,
+                        "name": mg.name,
+                        "body_part": mg.body_part,
+                        "description": mg.description,
+                        "is_primary": is_primary
+                    }
+                ) for mg, is_primary in muscle_groups
+            ]
+        }
+    )
+
+def normalize_name(name: str) -> str:
+    """
+    Normalize an exercise name for lookups, e.g. "Push-ups " and "push-ups" match
+    """
+    return " ".join(name.split()).casefold()
+
+def _freeze_index(index: dict) -> Mapping:
+    return MappingProxyType({key: tuple(values) for key, values in index.items()})
+
+def load_catalog(version: int) -> Catalog:
+    """
+    Read the whole catalog from the database and build its indexes
+    """
+    db = db_session()
+    try:
+        rows = query_exercise_catalog(db)
+        muscle_groups = {
+            mg.id: MuscleGroup.model_validate(
+                {
+                    "id": mg.id,
+                    "name": mg.name,
+                    "body_part": mg.body_part,
+                    "description": mg.description
+                }
+            ) for mg in db.query(MuscleGroupModel).order_by(MuscleGroupModel.id).all()
+        }
+        
+        exercises = []
+        by_muscle_group = {}
+        by_body_part = {}
+        for exercise, exercise_muscle_groups in rows:
+            exercise_dto = to_exercise_dto(exercise, exercise_muscle_groups)
+            exercises.append(exercise_dto)
+            
+            for mg in exercise_dto.muscle_groups:
+                by_muscle_group.setdefault(mg.id, []).append(exercise_dto)
+                # An exercise hitting several muscles of one body part is listed once
+                by_body_part.setdefault(mg.body_part, {})[exercise_dto.id] = exercise_dto
+        
+        return Catalog(
+            version=version,
+            loaded_at=monotonic(),
+            exercises=tuple(exercises),
+            muscle_groups=MappingProxyType(muscle_groups),
+            by_id=MappingProxyType({ex.id: ex for ex in exercises}),
+            by_name=MappingProxyType({normalize_name(ex.name): ex for ex in exercises}),
+            by_muscle_group=_freeze_index(by_muscle_group),
+            by_body_part=_freeze_index({part: exs.values() for part, exs in by_body_part.items()}),
+        )
+    finally:
+        release_session(db)
+
+class CatalogCache:
+    """
+    Process-wide cache of the exercise catalog.
+    The catalog is loaded once and served from memory until its version is
+    bumped, which must happen whenever the catalog tables are written.
+    """
+    def __init__(self, max_age: float = CATALOG_CACHE_MAX_AGE):
+        self.max_age = max_age
+        self._version = 0
+        self._catalog: Optional[Catalog] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def version(self) -> int:
+        return self._version
+    
+    def _is_fresh(self, catalog: Optional[Catalog]) -> bool:
+        if catalog is None or catalog.version != self._version:
+            return False
+        return not self.max_age or monotonic() - catalog.loaded_at < self.max_age
+    
+    def get(self) -> Catalog:
+        """
+        Get the current catalog, loading it from the database if needed
+        """
+        catalog = self._catalog
+        if self._is_fresh(catalog):
+            return catalog
+        
+        with self._lock:
+            # Another thread may have reloaded it while we were waiting
+            if not self._is_fresh(self._catalog):
+                self._catalog = load_catalog(self._version)
+            return self._catalog
+    
+    def bump_version(self) -> int:
+        """
+        Invalidate the cached catalog, the next read reloads it
+        """
+        with self._lock:
+            self._version += 1
+            return self._version
+
+catalog_cache = CatalogCache()
+
+def get_catalog() -> Catalog:
+    return catalog_cache.get()
+
+def bump_catalog_version() -> int:
+    return catalog_cache.bump_version()
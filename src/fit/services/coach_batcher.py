@@ -0,0 +1,87 @@
+import os
+import logging
+import threading
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Milliseconds a coach request waits for others to share its batch call, 0 calls /generate-wod directly
+COACH_BATCH_WINDOW_MS = float(os.getenv('COACH_BATCH_WINDOW_MS', '5'))
+# Most WOD requests sent in one batch call
+COACH_BATCH_MAX_SIZE = int(os.getenv('COACH_BATCH_MAX_SIZE', '50'))
+
+class _Batch:
+    def __init__(self):
+        self.requests: List[dict] = []
+        self.wods: Optional[List[dict]] = None
+        self.error: Optional[Exception] = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+class CoachBatcher:
+    """
+    Coalesces the WOD requests of concurrent threads into batch calls.
+    The first request of a batch waits up to the window (or until the batch is
+    full) for others to join, then sends the whole batch itself and hands
+    every waiting thread its own WOD. No background thread is involved.
+    """
+    def __init__(
+        self,
+        generate_batch: Callable[[List[dict]], List[dict]],
+        window: float = COACH_BATCH_WINDOW_MS / 1000,
+        max_size: int = COACH_BATCH_MAX_SIZE
+    ):
+        self.generate_batch = generate_batch
+        self.window = window
+        self.max_size = max(1, max_size)
+        self._open: Optional[_Batch] = None
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "batches": 0, "largest_batch": 0}
+    
+    def generate_wod(self, user_email: str, excluded_exercises: List[str]) -> dict:
+        """
+        WOD from the coach for one user, possibly generated along with other users' WODs
+        """
+        with self._lock:
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch()
+            index = len(batch.requests)
+            batch.requests.append({"user_email": user_email, "excluded_exercises": excluded_exercises})
+            if len(batch.requests) >= self.max_size:
+                self._open = None
+                batch.full.set()
+        
+        if leader:
+            if self.window > 0:
+                batch.full.wait(self.window)
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+            self._send(batch)
+        else:
+            batch.done.wait()
+        
+        if batch.error is not None:
+            raise batch.error
+        return batch.wods[index]
+    
+    def _send(self, batch: _Batch):
+        try:
+            batch.wods = self.generate_batch(batch.requests)
+        except Exception as e:
+            batch.error = e
+        finally:
+            size = len(batch.requests)
+            with self._lock:
+                self.counters["requests"] += size
+                self.counters["batches"] += 1
+                self.counters["largest_batch"] = max(self.counters["largest_batch"], size)
+            batch.done.set()
+        if batch.error is not None and size > 1:
+            logger.warning(f"Coach batch of {size} WOD requests failed: {batch.error}")
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {"window_ms": self.window * 1000, "max_size": self.max_size, **self.counters}
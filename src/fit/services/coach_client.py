@@ -0,0 +1,306 @@
+import os
+import random
+import logging
+import threading
+from time import monotonic, perf_counter
+from typing import List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from .instrumentation import coach_request_seconds
+
+logger = logging.getLogger(__name__)
+
+# Seconds to establish a connection to the coach, and to wait for its answer
+COACH_CONNECT_TIMEOUT = float(os.getenv('COACH_CONNECT_TIMEOUT', '0.5'))
+COACH_READ_TIMEOUT = float(os.getenv('COACH_READ_TIMEOUT', '5'))
+# Keep-alive connections kept open to the coach
+COACH_POOL_SIZE = int(os.getenv('COACH_POOL_SIZE', '20'))
+# Consecutive failures opening the circuit, and seconds before probing the coach again
+COACH_BREAKER_FAILURES = int(os.getenv('COACH_BREAKER_FAILURES', '5'))
+COACH_BREAKER_RESET_SECONDS = float(os.getenv('COACH_BREAKER_RESET_SECONDS', '30'))
+
+# Comma separated coach replicas, COACH_SERVICE_URL is used when not set
+COACH_SERVICE_URLS = os.getenv('COACH_SERVICE_URLS', os.getenv('COACH_SERVICE_URL', 'http://localhost:5001'))
+# Seconds between two health checks of every coach replica
+COACH_HEALTH_INTERVAL = float(os.getenv('COACH_HEALTH_INTERVAL', '5'))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CoachUnavailable(Exception):
+    """
+    Raised without calling the coach while its circuit is open
+    """
+
+class CircuitBreaker:
+    """
+    Stops calling a failing service after consecutive failures.
+    Once the reset timeout is over a single probe request is let through
+    (half open): its success closes the circuit, its failure opens it again.
+    """
+    def __init__(self, failure_threshold: int = COACH_BREAKER_FAILURES, reset_timeout: float = COACH_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.counters = {
+            "successes": 0,
+            "failures": 0,
+            "short_circuited": 0,
+            "opened": 0,
+            "half_opened": 0,
+            "closed": 0,
+        }
+    
+    @property
+    def state(self) -> str:
+        return self._state
+    
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == OPEN and monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self.counters["half_opened"] += 1
+            
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            
+            self.counters["short_circuited"] += 1
+            return False
+    
+    def is_available(self) -> bool:
+        """
+        Whether allow_request() would let a request through, without changing the state
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                return monotonic() - self._opened_at >= self.reset_timeout
+            return not self._probe_in_flight
+    
+    def record_success(self):
+        with self._lock:
+            self.counters["successes"] += 1
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+            if self._state != CLOSED:
+                self._state = CLOSED
+                self.counters["closed"] += 1
+    
+    def record_failure(self):
+        with self._lock:
+            self.counters["failures"] += 1
+            self._consecutive_failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or (
+                self._state == CLOSED and self._consecutive_failures >= self.failure_threshold
+            ):
+                self._state = OPEN
+                self._opened_at = monotonic()
+                self.counters["opened"] += 1
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self._state, "consecutive_failures": self._consecutive_failures, **self.counters}
+
+class CoachClient:
+    """
+    HTTP client of the coach microservice.
+    Reuses keep-alive connections, bounds connect and read times separately
+    and short-circuits through a circuit breaker while the coach is failing.
+    """
+    def __init__(
+        self,
+        base_url: str,
+        connect_timeout: float = COACH_CONNECT_TIMEOUT,
+        read_timeout: float = COACH_READ_TIMEOUT,
+        pool_size: int = COACH_POOL_SIZE,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+    
+    def _post(self, path: str, payload: dict) -> dict:
+        if not self.breaker.allow_request():
+            coach_request_seconds.observe(0.0, path=path, outcome="rejected")
+            raise CoachUnavailable(f"Circuit to the coach at {self.base_url} is {self.breaker.state}")
+        
+        start = perf_counter()
+        try:
+            response = self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        except Exception:
+            coach_request_seconds.observe(perf_counter() - start, path=path, outcome="error")
+            self.breaker.record_failure()
+            raise
+        
+        coach_request_seconds.observe(perf_counter() - start, path=path, outcome="ok")
+        self.breaker.record_success()
+        return data
+    
+    def generate_wod(self, user_email: str, excluded_exercises: List[str]) -> dict:
+        """
+        Ask the coach for a WOD avoiding the excluded exercises (by name)
+        """
+        return self._post("/generate-wod", {
+            "user_email": user_email,
+            "excluded_exercises": excluded_exercises
+        })
+    
+    def generate_wod_batch(self, wod_requests: List[dict]) -> List[dict]:
+        """
+        Ask the coach for several WODs in one call, wod_requests holding
+        {"user_email", "excluded_exercises"} items. WODs come back in the same order.
+        """
+        wods = self._post("/generate-wod/batch", {"requests": wod_requests}).get("wods", [])
+        if len(wods) != len(wod_requests):
+            raise ValueError(f"Coach returned {len(wods)} WODs for {len(wod_requests)} requests")
+        return wods
+    
+    def health(self, timeout: float = 1.0) -> bool:
+        """
+        Check the coach answers its health endpoint, without affecting the breaker
+        """
+        try:
+            response = self.session.get(f"{self.base_url}/health", timeout=(self.timeout[0], timeout))
+            return response.ok
+        except requests.RequestException:
+            return False
+    
+    def stats(self) -> dict:
+        return {"url": self.base_url, "breaker": self.breaker.stats()}
+    
+    def close(self):
+        self.session.close()
+
+class CoachReplica:
+    def __init__(self, client: CoachClient):
+        self.client = client
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+    
+    @property
+    def available(self) -> bool:
+        return self.healthy and self.client.breaker.is_available()
+
+class CoachReplicaPool:
+    """
+    Spreads coach calls over several coach replicas.
+    Each call goes to the replica with the fewest outstanding requests out of
+    two picked at random (power of two choices). Replicas failing their
+    periodic health check or with an open circuit are left out until they recover.
+    """
+    def __init__(self, urls: List[str], health_interval: float = COACH_HEALTH_INTERVAL, **client_options):
+        if not urls:
+            raise ValueError("At least one coach URL is required")
+        self.replicas = [CoachReplica(CoachClient(url, **client_options)) for url in urls]
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+        self._health_thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+    
+    @classmethod
+    def from_env(cls) -> "CoachReplicaPool":
+        return cls([url.strip() for url in COACH_SERVICE_URLS.split(",") if url.strip()])
+    
+    def _choose(self, exclude: List[CoachReplica]) -> CoachReplica:
+        with self._lock:
+            candidates = [replica for replica in self.replicas if replica.available and replica not in exclude]
+            if not candidates:
+                raise CoachUnavailable("No healthy coach replica available")
+            
+            if len(candidates) == 1:
+                replica = candidates[0]
+            else:
+                first, second = random.sample(candidates, 2)
+                replica = first if first.outstanding <= second.outstanding else second
+            
+            replica.outstanding += 1
+            replica.requests += 1
+            return replica
+    
+    def _call(self, call):
+        """
+        Run call(client) on a replica, retrying once on another replica if
+        the chosen one could not be reached or refused because of its circuit
+        """
+        self._ensure_health_checks()
+        tried = []
+        while True:
+            replica = self._choose(tried)
+            try:
+                return call(replica.client)
+            except (CoachUnavailable, requests.ConnectionError):
+                tried.append(replica)
+                if len(tried) >= 2:
+                    raise
+            finally:
+                with self._lock:
+                    replica.outstanding -= 1
+    
+    def generate_wod(self, user_email: str, excluded_exercises: List[str]) -> dict:
+        return self._call(lambda client: client.generate_wod(user_email, excluded_exercises))
+    
+    def generate_wod_batch(self, wod_requests: List[dict]) -> List[dict]:
+        return self._call(lambda client: client.generate_wod_batch(wod_requests))
+    
+    def check_health(self):
+        """
+        Probe every replica, ejecting the failing ones and readmitting the recovered ones
+        """
+        for replica in self.replicas:
+            healthy = replica.client.health()
+            if healthy != replica.healthy:
+                logger.warning(f"Coach replica {replica.client.base_url} is {'back' if healthy else 'unhealthy'}")
+            replica.healthy = healthy
+    
+    def _ensure_health_checks(self):
+        # Started on first use, so that forked web workers each run their own
+        if self._health_thread is not None or self.health_interval <= 0:
+            return
+        with self._lock:
+            if self._health_thread is None:
+                self._health_thread = threading.Thread(target=self._health_loop, name="coach-health", daemon=True)
+                self._health_thread.start()
+    
+    def _health_loop(self):
+        while not self._stopped.wait(self.health_interval):
+            try:
+                self.check_health()
+            except Exception as e:
+                logger.warning(f"Coach health check failed: {e}")
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "replicas": [
+                    {
+                        **replica.client.stats(),
+                        "healthy": replica.healthy,
+                        "outstanding": replica.outstanding,
+                        "requests": replica.requests,
+                    }
+                    for replica in self.replicas
+                ]
+            }
+    
+    def close(self):
+        self._stopped.set()
+        for replica in self.replicas:
+            replica.client.close()
@@ -1,6 +1,11 @@
-from typing import List, Tuple
-from ..models_db import ExerciseModel, MuscleGroupModel, exercise_muscle_groups, UserExerciseHistoryModel
-from ..database import db_session
+from typing import List, Sequence, Set, Tuple
+from sqlalchemy import insert, select
+from ..models_db import UserExerciseHistoryModel
+from ..models_dto import Exercise, WodResponseSchema
+from ..database import db_session, release_session
+from .catalog_cache import get_catalog
+from .recent_exercises import recent_exercises_cache
+from .wod_engine import wod_engine
 from datetime import datetime, timedelta
 import random
 from time import time
@@ -29,95 +34,124 @@ def calculate_intensity(difficulty: int) -> float:
 def get_recent_exercises(user_email: str, days_back: int = 3) -> List[int]:
     """
     Get exercise IDs that the user has performed in the last N days.
+    Served from the recent exercises cache when N is within its window.
+    """
+    cached = recent_exercises_cache.get(user_email, days_back)
+    if cached is not None:
+        return cached
+    
+    db = db_session()
+    try:
+        cutoff_date = datetime.utcnow() - timedelta(days=days_back)
+        
+        # Answered from the (user_email, performed_at, exercise_id) index alone
+        recent_exercises = db.execute(
+            select(UserExerciseHistoryModel.exercise_id).where(
+                UserExerciseHistoryModel.user_email == user_email,
+                UserExerciseHistoryModel.performed_at >= cutoff_date
+            ).distinct()
+        ).scalars()
+        
+        return list(recent_exercises)
+    finally:
+        release_session(db)
+
+def get_recently_active_users(days_back: int = 3) -> List[str]:
+    """
+    Get the emails of the users who performed exercises in the last N days.
     """
     db = db_session()
     try:
         cutoff_date = datetime.utcnow() - timedelta(days=days_back)
         
-        recent_exercises = db.query(UserExerciseHistoryModel.exercise_id).filter(
-            UserExerciseHistoryModel.user_email == user_email,
+        active_users = db.query(UserExerciseHistoryModel.user_email).filter(
             UserExerciseHistoryModel.performed_at >= cutoff_date
         ).distinct().all()
         
-        return [ex[0] for ex in recent_exercises]
+        return [user[0] for user in active_users]
     finally:
-        db.close()
+        release_session(db)
 
 def save_exercise_history(user_email: str, exercise_id: int, weight: float, reps: int):
     """
     Save the user's exercise to history.
     """
+    save_exercise_history_batch(user_email, [(exercise_id, weight, reps)])
+
+def history_entries(wod: WodResponseSchema) -> List[Tuple[int, float, int]]:
+    """
+    The exercise ID, suggested weight and reps of each exercise of the WOD, as saved to history
+    """
+    return [(ex.id, ex.suggested_weight, ex.suggested_reps) for ex in wod.exercises]
+
+def insert_exercise_history(db, user_email: str, entries: Sequence[Tuple[int, float, int]], performed_at: datetime):
+    """
+    Add exercises to the user's history with one multi-row INSERT in the
+    transaction of the session, which the caller commits
+    """
+    db.execute(insert(UserExerciseHistoryModel).values([
+        {
+            "user_email": user_email,
+            "exercise_id": exercise_id,
+            "performed_at": performed_at,
+            "suggested_weight": weight,
+            "suggested_reps": reps
+        }
+        for exercise_id, weight, reps in entries
+    ]))
+
+def save_exercise_history_batch(user_email: str, entries: List[Tuple[int, float, int]]):
+    """
+    Save several exercises of the user to history in a single transaction.
+    Each entry is a tuple containing the exercise ID, the suggested weight and reps.
+    All rows are written with one multi-row INSERT and one commit.
+    """
+    if not entries:
+        return
+    
+    performed_at = datetime.utcnow()
     db = db_session()
     try:
-        history_entry = UserExerciseHistoryModel(
-            user_email=user_email,
-            exercise_id=exercise_id,
-            suggested_weight=weight,
-            suggested_reps=reps
-        )
-        
-        db.add(history_entry)
+        insert_exercise_history(db, user_email, entries, performed_at)
         db.commit()
     except Exception as e:
         db.rollback()
         raise e
     finally:
-        db.close()
+        release_session(db)
+    
+    # Write-through, the next WOD of the user excludes these without reading the history
+    recent_exercises_cache.record(user_email, [exercise_id for exercise_id, _, _ in entries], performed_at)
+
+def select_wod_exercises(excluded_ids: Set[int], count: int = 6, already_selected: Sequence[Exercise] = ()) -> List[Exercise]:
+    """
+    Complete the already selected exercises with random catalog exercises up to `count`.
+    Avoids the excluded exercises, unless there are not enough exercises left without them.
+    """
+    selected = list(already_selected)
+    missing = count - len(selected)
+    if missing <= 0:
+        return selected[:count]
+    
+    # Get all exercises, excluding recent ones
+    selected_ids = {ex.id for ex in selected}
+    candidates = [ex for ex in get_catalog().exercises if ex.id not in selected_ids]
+    available_exercises = [ex for ex in candidates if ex.id not in excluded_ids]
+    
+    # If we don't have enough available exercises, fall back to all exercises
+    if len(available_exercises) < missing:
+        available_exercises = candidates
+    
+    # Select the missing exercises at random
+    return selected + random.sample(available_exercises, min(missing, len(available_exercises)))
 
-def request_wod(user_email: str) -> List[Tuple[ExerciseModel, List[Tuple[MuscleGroupModel, bool]]]]:
+def generate_local_wod(excluded_ids: Set[int]) -> List[Exercise]:
     """
-    Request a workout of the day (WOD) for a specific user.
-    Avoids exercises the user has done recently.
-    Returns a list of tuples containing:
-    - The exercise
-    - A list of tuples containing:
-      - The muscle group
-      - Whether it's a primary muscle group
+    Generate the exercises of a WOD locally, avoiding the excluded exercises when possible
     """
     # Simulate heavy computation (AI model processing, complex calculations, etc.) for 1-5 seconds
-    heavy_computation(random.randint(1, 5)) # DO NOT REMOVE THIS LINE
+    # It runs on the WOD engine worker processes to keep the request thread responsive
+    wod_engine.run(heavy_computation, random.randint(1, 5)) # DO NOT REMOVE THIS LINE
     
-    db = db_session()
-    try:
-        # Get exercises the user has done recently
-        recent_exercise_ids = get_recent_exercises(user_email)
-        
-        # Get all exercises, excluding recent ones
-        query = db.query(ExerciseModel)
-        if recent_exercise_ids:
-            query = query.filter(~ExerciseModel.id.in_(recent_exercise_ids))
-        
-        available_exercises = query.all()
-        
-        # If we don't have enough available exercises, fall back to all exercises
-        if len(available_exercises) < 6:
-            available_exercises = db.query(ExerciseModel).all()
-        
-        # Select 6 random exercises
-        selected_exercises = random.sample(available_exercises, 6) if len(available_exercises) >= 6 else available_exercises
-        
-        # For each exercise, get its muscle groups and whether they are primary
-        result = []
-        for exercise in selected_exercises:
-            # Get the junction table information for this exercise
-            stmt = db.query(
-                MuscleGroupModel,
-                exercise_muscle_groups.c.is_primary
-            ).join(
-                exercise_muscle_groups,
-                MuscleGroupModel.id == exercise_muscle_groups.c.muscle_group_id
-            ).filter(
-                exercise_muscle_groups.c.exercise_id == exercise.id
-            )
-            
-            muscle_groups = [(mg, is_primary) for mg, is_primary in stmt.all()]
-            result.append((exercise, muscle_groups))
-            
-            # Save to history (with random weight and reps for tracking)
-            weight = random.uniform(5.0, 50.0)
-            reps = random.randint(8, 15)
-            save_exercise_history(user_email, exercise.id, weight, reps)
-            
-        return result
-    finally:
-        db.close()
\ No newline at end of file
+    # Select 6 random exercises
+    return select_wod_exercises(excluded_ids)
@@ -1,28 +1,91 @@
 import os
-import psycopg2
-from sqlalchemy import text
-from ..database import engine
+import hashlib
+from datetime import datetime
+from time import perf_counter
+from typing import List
+from sqlalchemy import select, text, update
+from ..database import get_engine
+from ..models_db import SeedVersionModel
+from .catalog_cache import bump_catalog_version
 
-def init_fitness_data():
+# Name of the catalog seed in the seed_versions table
+CATALOG_SEED = "catalog"
+# PostgreSQL advisory lock serializing the seeding of concurrently starting instances
+SEED_LOCK_ID = 424201
+
+def catalog_seed_path() -> str:
+    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(script_dir, "db_init_scripts", "init_muscle_groups_exercises.sql")
+
+def split_sql_statements(script: str) -> List[str]:
+    """
+    Split a SQL script on the semicolons outside string literals, dropping
+    comments, as the SQLite driver runs a single statement at a time
+    """
+    statements, current, quoted = [], [], False
+    for line in script.splitlines():
+        for index, char in enumerate(line):
+            if char == "'":
+                quoted = not quoted
+            elif not quoted and line.startswith("--", index):
+                # The comment runs to the end of the line
+                break
+            if char == ";" and not quoted:
+                statement = "".join(current).strip()
+                if statement:
+                    statements.append(statement)
+                current = []
+            else:
+                current.append(char)
+        current.append("\n")
+    statement = "".join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+def init_fitness_data(seed_path: str = None) -> bool:
     """
     Initialize the fitness database with muscle groups and exercises
     from the SQL script file.
+    The script upserts the catalog and only runs when its checksum differs
+    from the one of the last applied version, so a restart costs a single
+    query instead of rewriting (and locking) the catalog tables.
     """
-    # Path to the SQL script file
-    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    sql_file_path = os.path.join(script_dir, "db_init_scripts", "init_muscle_groups_exercises.sql")
+    start = perf_counter()
     
     try:
         # Read the SQL file
-        with open(sql_file_path, 'r') as file:
+        with open(seed_path or catalog_seed_path(), 'r') as file:
             sql_script = file.read()
+        checksum = hashlib.sha256(sql_script.encode()).hexdigest()
+        
+        with get_engine().begin() as connection:
+            if connection.dialect.name == "postgresql":
+                # Instances starting together wait for the first one, then see its checksum
+                connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": SEED_LOCK_ID})
+            applied = connection.execute(
+                select(SeedVersionModel.checksum).where(SeedVersionModel.name == CATALOG_SEED)
+            ).scalar()
+            if applied == checksum:
+                print(f"Fitness data up to date (seed {checksum[:12]}), checked in {(perf_counter() - start) * 1000:.1f}ms")
+                return True
+            
+            for statement in split_sql_statements(sql_script):
+                connection.exec_driver_sql(statement)
+            
+            values = {"checksum": checksum, "applied_at": datetime.utcnow()}
+            if applied is None:
+                connection.execute(SeedVersionModel.__table__.insert().values(name=CATALOG_SEED, **values))
+            else:
+                connection.execute(update(SeedVersionModel).where(SeedVersionModel.name == CATALOG_SEED).values(**values))
         
-        # Execute the SQL script using SQLAlchemy
-        with engine.connect() as connection:
-            connection.execute(text(sql_script))
-            connection.commit()
+        # The catalog tables were written, drop the cached copy
+        bump_catalog_version()
         
-        print("Fitness data initialized successfully!")
+        print(
+            f"Fitness data initialized successfully (seed {checksum[:12]}, previously {applied[:12] if applied else 'none'}) "
+            f"in {(perf_counter() - start) * 1000:.1f}ms"
+        )
         return True
     except Exception as e:
         print(f"Error initializing fitness data: {e}")
@@ -30,4 +93,4 @@ def init_fitness_data():
 
 if __name__ == "__main__":
     # This allows the script to be run directly
-    init_fitness_data() 
\ No newline at end of file
+    init_fitness_data()
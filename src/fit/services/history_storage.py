@@ -0,0 +1,378 @@
+import os
+import re
+import logging
+import threading
+import datetime
+from typing import List, NamedTuple, Optional
+from sqlalchemy import DateTime, bindparam, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from ..database import Base, get_engine
+
+logger = logging.getLogger(__name__)
+
+HISTORY_TABLE = "user_exercise_history"
+RECENT_EXERCISES_INDEX = "ix_user_exercise_history_user_performed_exercise"
+HISTORY_COLUMNS = "id, user_email, exercise_id, performed_at, suggested_weight, suggested_reps"
+
+# Days of history held by every partition
+HISTORY_PARTITION_DAYS = int(os.getenv('HISTORY_PARTITION_DAYS', '7'))
+# Partitions created ahead of the current one
+HISTORY_PARTITIONS_AHEAD = int(os.getenv('HISTORY_PARTITIONS_AHEAD', '2'))
+# Days of history rows kept before they are rolled up into user_exercise_aggregates
+HISTORY_RETENTION_DAYS = int(os.getenv('HISTORY_RETENTION_DAYS', '90'))
+# Background partition creation and retention, and seconds between two runs
+HISTORY_MAINTENANCE_ENABLED = os.getenv('HISTORY_MAINTENANCE_ENABLED', 'false').lower() == 'true'
+HISTORY_MAINTENANCE_INTERVAL = float(os.getenv('HISTORY_MAINTENANCE_INTERVAL', '3600'))
+
+# WODs read the last 3 days of history and the pre-generation the last WOD_PREGEN_ACTIVE_DAYS,
+# retention never goes below this
+MIN_RETENTION_DAYS = 7
+# Partitions start every HISTORY_PARTITION_DAYS days counted from this Monday
+PARTITION_EPOCH = datetime.date(2000, 1, 3)
+
+ROLLUP_SQL = """
+INSERT INTO user_exercise_aggregates (
+    user_email, exercise_id, times_performed, total_reps, total_volume, first_performed_at, last_performed_at
+)
+SELECT
+    user_email,
+    exercise_id,
+    COUNT(*),
+    COALESCE(SUM(suggested_reps), 0),
+    COALESCE(SUM(suggested_weight * suggested_reps), 0),
+    MIN(performed_at),
+    MAX(performed_at)
+FROM {table}
+WHERE performed_at < :end
+GROUP BY user_email, exercise_id
+ON CONFLICT (user_email, exercise_id) DO UPDATE SET
+    times_performed = user_exercise_aggregates.times_performed + excluded.times_performed,
+    total_reps = user_exercise_aggregates.total_reps + excluded.total_reps,
+    total_volume = user_exercise_aggregates.total_volume + excluded.total_volume,
+    first_performed_at = CASE WHEN excluded.first_performed_at < user_exercise_aggregates.first_performed_at
+        THEN excluded.first_performed_at ELSE user_exercise_aggregates.first_performed_at END,
+    last_performed_at = CASE WHEN excluded.last_performed_at > user_exercise_aggregates.last_performed_at
+        THEN excluded.last_performed_at ELSE user_exercise_aggregates.last_performed_at END
+"""
+
+def partition_start(day: datetime.date, days: int = HISTORY_PARTITION_DAYS) -> datetime.date:
+    """
+    First day of the partition holding the given day
+    """
+    return day - datetime.timedelta(days=(day - PARTITION_EPOCH).days % days)
+
+def _midnight(day: datetime.date) -> datetime.datetime:
+    return datetime.datetime.combine(day, datetime.time())
+
+class ExpiredRange(NamedTuple):
+    """
+    History rows of `table` performed before `end`, removed by dropping the
+    table when `droppable` (a whole partition) or else by deleting them
+    """
+    table: str
+    end: datetime.datetime
+    droppable: bool
+
+class RollingHistoryStorage:
+    """
+    History kept in the single user_exercise_history table (SQLite).
+    Time ranges play the part of partitions: once a range is past the
+    retention its rows are rolled up into per-user aggregates and deleted,
+    so the table only holds the recent history.
+    """
+    def __init__(
+        self,
+        engine: Engine,
+        partition_days: int = HISTORY_PARTITION_DAYS,
+        retention_days: int = HISTORY_RETENTION_DAYS
+    ):
+        self.engine = engine
+        self.partition_days = partition_days
+        self.retention_days = max(retention_days, MIN_RETENTION_DAYS)
+    
+    def prepare(self):
+        """
+        Called by init_db before the tables are created
+        """
+    
+    def ensure_partitions(self, today: Optional[datetime.date] = None) -> List[str]:
+        """
+        Create the partitions of the current and next periods, returns the created ones
+        """
+        return []
+    
+    def retention_boundary(self, now: Optional[datetime.datetime] = None) -> datetime.datetime:
+        """
+        Rows performed before this are past the retention, aligned on a partition start
+        """
+        now = now or datetime.datetime.utcnow()
+        cutoff = (now - datetime.timedelta(days=self.retention_days)).date()
+        return _midnight(partition_start(cutoff, self.partition_days))
+    
+    def expired_ranges(self, connection: Connection, boundary: datetime.datetime) -> List[ExpiredRange]:
+        has_expired_rows = connection.execute(
+            text(f"SELECT EXISTS (SELECT 1 FROM {HISTORY_TABLE} WHERE performed_at < :end)").bindparams(
+                bindparam("end", boundary, type_=DateTime)
+            )
+        ).scalar()
+        return [ExpiredRange(HISTORY_TABLE, boundary, droppable=False)] if has_expired_rows else []
+    
+    def run_retention(self, now: Optional[datetime.datetime] = None) -> dict:
+        """
+        Roll the history rows past the retention up into user_exercise_aggregates
+        and remove them, one transaction per partition
+        """
+        boundary = self.retention_boundary(now)
+        with self.engine.connect() as connection:
+            expired = self.expired_ranges(connection, boundary)
+        
+        rows = 0
+        for expired_range in expired:
+            end = bindparam("end", expired_range.end, type_=DateTime)
+            with self.engine.begin() as connection:
+                rows += connection.execute(
+                    text(f"SELECT COUNT(*) FROM {expired_range.table} WHERE performed_at < :end").bindparams(end)
+                ).scalar()
+                connection.execute(text(ROLLUP_SQL.format(table=expired_range.table)).bindparams(end))
+                if expired_range.droppable:
+                    connection.execute(text(f"DROP TABLE {expired_range.table}"))
+                else:
+                    connection.execute(
+                        text(f"DELETE FROM {expired_range.table} WHERE performed_at < :end").bindparams(end)
+                    )
+            logger.info(f"Rolled up history of {expired_range.table} before {expired_range.end}")
+        return {"boundary": boundary.isoformat(), "partitions": len(expired), "rows": rows}
+
+class PartitionedHistoryStorage(RollingHistoryStorage):
+    """
+    History in a PostgreSQL table partitioned by range of performed_at.
+    Partitions are created ahead of time, expired ones are rolled up and
+    dropped whole, which costs neither a large DELETE nor index maintenance.
+    A default partition catches rows outside of the created ranges.
+    """
+    DEFAULT_PARTITION = f"{HISTORY_TABLE}_default"
+    
+    def __init__(self, *args, partitions_ahead: int = HISTORY_PARTITIONS_AHEAD, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.partitions_ahead = partitions_ahead
+    
+    def partition_name(self, start: datetime.date) -> str:
+        return f"{HISTORY_TABLE}_p{start:%Y%m%d}"
+    
+    @staticmethod
+    def is_partitioned(connection: Connection, table: str = HISTORY_TABLE) -> bool:
+        return connection.execute(
+            text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+            {"table": table}
+        ).scalar()
+    
+    def _create_parent(self, connection: Connection):
+        connection.execute(text(f"""
+            CREATE TABLE {HISTORY_TABLE} (
+                id BIGSERIAL NOT NULL,
+                user_email VARCHAR NOT NULL REFERENCES users (email) ON DELETE CASCADE,
+                exercise_id INTEGER NOT NULL REFERENCES exercises (id) ON DELETE CASCADE,
+                performed_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+                suggested_weight FLOAT,
+                suggested_reps INTEGER,
+                PRIMARY KEY (id, performed_at)
+            ) PARTITION BY RANGE (performed_at)
+        """))
+        # Declared on the parent, the index is created on every partition
+        connection.execute(text(
+            f"CREATE INDEX {RECENT_EXERCISES_INDEX} ON {HISTORY_TABLE} (user_email, performed_at, exercise_id)"
+        ))
+        connection.execute(text(f"CREATE TABLE {self.DEFAULT_PARTITION} PARTITION OF {HISTORY_TABLE} DEFAULT"))
+    
+    def prepare(self):
+        """
+        Create the partitioned history table, which create_all cannot declare,
+        and on every start the partitions up to HISTORY_PARTITIONS_AHEAD ahead,
+        as the background maintenance may be off
+        """
+        if inspect(self.engine).has_table(HISTORY_TABLE):
+            with self.engine.connect() as connection:
+                if not self.is_partitioned(connection):
+                    logger.warning(
+                        f"{HISTORY_TABLE} is not partitioned, convert it with "
+                        "python -m src.fit.services.history_storage --migrate"
+                    )
+                    return
+        else:
+            users, exercises = Base.metadata.tables["users"], Base.metadata.tables["exercises"]
+            Base.metadata.create_all(bind=self.engine, tables=[users, exercises])
+            with self.engine.begin() as connection:
+                self._create_parent(connection)
+        
+        self.ensure_partitions()
+    
+    def _create_partitions(self, connection: Connection, first_day: datetime.date, last_day: Optional[datetime.date] = None) -> List[str]:
+        """
+        Create the missing partitions from the one holding first_day up to
+        HISTORY_PARTITIONS_AHEAD partitions after the one holding last_day.
+        Rows of their ranges that went to the default partition meanwhile are
+        moved into them, which locks the history table until the transaction ends.
+        """
+        existing = {name for name, _ in self._partitions(connection)}
+        start = partition_start(first_day, self.partition_days)
+        last = partition_start(last_day or first_day, self.partition_days) + datetime.timedelta(
+            days=self.partitions_ahead * self.partition_days
+        )
+        missing = []
+        while start <= last:
+            end = start + datetime.timedelta(days=self.partition_days)
+            if self.partition_name(start) not in existing:
+                missing.append((start, end))
+            start = end
+        if not missing:
+            return []
+        
+        # PostgreSQL refuses a partition whose range has rows in the default partition,
+        # which is detached while the partitions are created and its rows moved to them
+        moved_range = {
+            "start": bindparam("start", _midnight(missing[0][0]), type_=DateTime),
+            "end": bindparam("end", _midnight(missing[-1][1]), type_=DateTime),
+        }
+        in_moved_range = "performed_at >= :start AND performed_at < :end"
+        has_default_rows = connection.execute(
+            text(f"SELECT EXISTS (SELECT 1 FROM {self.DEFAULT_PARTITION} WHERE {in_moved_range})").bindparams(
+                *moved_range.values()
+            )
+        ).scalar()
+        if has_default_rows:
+            connection.execute(text(f"ALTER TABLE {HISTORY_TABLE} DETACH PARTITION {self.DEFAULT_PARTITION}"))
+        
+        created = []
+        for start, end in missing:
+            name = self.partition_name(start)
+            connection.execute(text(
+                f"CREATE TABLE {name} PARTITION OF {HISTORY_TABLE} "
+                f"FOR VALUES FROM ('{_midnight(start).isoformat(' ')}') TO ('{_midnight(end).isoformat(' ')}')"
+            ))
+            created.append(name)
+        
+        if has_default_rows:
+            moved = connection.execute(text(
+                f"WITH moved AS (DELETE FROM {self.DEFAULT_PARTITION} WHERE {in_moved_range} RETURNING {HISTORY_COLUMNS}) "
+                f"INSERT INTO {HISTORY_TABLE} ({HISTORY_COLUMNS}) SELECT {HISTORY_COLUMNS} FROM moved"
+            ).bindparams(*moved_range.values())).rowcount
+            connection.execute(text(f"ALTER TABLE {HISTORY_TABLE} ATTACH PARTITION {self.DEFAULT_PARTITION} DEFAULT"))
+            logger.info(f"Moved {moved} history rows from {self.DEFAULT_PARTITION} to the new partitions")
+        return created
+    
+    def ensure_partitions(self, today: Optional[datetime.date] = None) -> List[str]:
+        with self.engine.begin() as connection:
+            if not self.is_partitioned(connection):
+                return []
+            created = self._create_partitions(connection, today or datetime.datetime.utcnow().date())
+        if created:
+            logger.info(f"Created history partitions {', '.join(created)}")
+        return created
+    
+    def _partitions(self, connection: Connection):
+        """
+        (name, end of range) of the partitions, None as end for the default one
+        """
+        rows = connection.execute(text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(:table)"
+        ), {"table": HISTORY_TABLE})
+        partitions = []
+        for name, bound in rows:
+            match = re.search(r"TO \('([^']+)'\)", bound or "")
+            partitions.append((name, datetime.datetime.fromisoformat(match.group(1)) if match else None))
+        return partitions
+    
+    def expired_ranges(self, connection: Connection, boundary: datetime.datetime) -> List[ExpiredRange]:
+        if not self.is_partitioned(connection):
+            return super().expired_ranges(connection, boundary)
+        
+        expired = [
+            ExpiredRange(name, end, droppable=True)
+            for name, end in sorted(self._partitions(connection), key=lambda partition: partition[1] or boundary)
+            if end is not None and end <= boundary
+        ]
+        has_old_default_rows = connection.execute(
+            text(f"SELECT EXISTS (SELECT 1 FROM {self.DEFAULT_PARTITION} WHERE performed_at < :end)").bindparams(
+                bindparam("end", boundary, type_=DateTime)
+            )
+        ).scalar()
+        if has_old_default_rows:
+            expired.append(ExpiredRange(self.DEFAULT_PARTITION, boundary, droppable=False))
+        return expired
+    
+    def migrate(self) -> bool:
+        """
+        Move an existing unpartitioned history table into a partitioned one,
+        returns False when it already is partitioned.
+        Copies every row in a single transaction, run it during a maintenance window.
+        """
+        old_table = f"{HISTORY_TABLE}_unpartitioned"
+        with self.engine.begin() as connection:
+            if self.is_partitioned(connection):
+                return False
+            
+            connection.execute(text(f"ALTER TABLE {HISTORY_TABLE} RENAME TO {old_table}"))
+            connection.execute(text(f"ALTER TABLE {old_table} RENAME CONSTRAINT {HISTORY_TABLE}_pkey TO {old_table}_pkey"))
+            for index in inspect(connection).get_indexes(old_table):
+                connection.execute(text(f"DROP INDEX {index['name']}"))
+            self._create_parent(connection)
+            
+            today = datetime.datetime.utcnow().date()
+            oldest = connection.execute(text(f"SELECT MIN(performed_at) FROM {old_table}")).scalar()
+            self._create_partitions(connection, min(oldest.date(), today) if oldest else today, today)
+            
+            connection.execute(text(
+                f"INSERT INTO {HISTORY_TABLE} ({HISTORY_COLUMNS}) SELECT {HISTORY_COLUMNS} FROM {old_table}"
+            ))
+            connection.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{HISTORY_TABLE}', 'id'), COALESCE(MAX(id), 0) + 1, false) "
+                f"FROM {HISTORY_TABLE}"
+            ))
+            connection.execute(text(f"DROP TABLE {old_table}"))
+        logger.info(f"Migrated {HISTORY_TABLE} to a partitioned table")
+        return True
+
+def history_storage_for(engine: Optional[Engine] = None) -> RollingHistoryStorage:
+    engine = engine or get_engine()
+    if engine.dialect.name == "postgresql":
+        return PartitionedHistoryStorage(engine)
+    return RollingHistoryStorage(engine)
+
+class HistoryMaintenance(threading.Thread):
+    """
+    Background thread creating the upcoming history partitions and rolling
+    up the expired ones every HISTORY_MAINTENANCE_INTERVAL seconds
+    """
+    def __init__(self, storage: Optional[RollingHistoryStorage] = None, interval: float = HISTORY_MAINTENANCE_INTERVAL):
+        super().__init__(name="history-maintenance", daemon=True)
+        self.storage = storage or history_storage_for()
+        self.interval = interval
+        self._stopped = threading.Event()
+    
+    def run_once(self) -> dict:
+        created = self.storage.ensure_partitions()
+        return {"created_partitions": created, **self.storage.run_retention()}
+    
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                result = self.run_once()
+                logger.info(f"History maintenance: {result}")
+            except Exception as e:
+                logger.warning(f"History maintenance failed: {e}")
+            self._stopped.wait(self.interval)
+    
+    def stop(self):
+        self._stopped.set()
+
+if __name__ == "__main__":
+    # Run the maintenance once, e.g. from cron: python -m src.fit.services.history_storage [--migrate]
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    storage = history_storage_for()
+    if "--migrate" in sys.argv:
+        if not isinstance(storage, PartitionedHistoryStorage):
+            sys.exit("Only PostgreSQL history tables are partitioned")
+        print("Migrated" if storage.migrate() else f"{HISTORY_TABLE} is already partitioned")
+    print(HistoryMaintenance(storage).run_once())
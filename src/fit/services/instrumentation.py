@@ -0,0 +1,365 @@
+import os
+import re
+import sys
+import logging
+import tempfile
+import threading
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from time import perf_counter, sleep
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from flask import Flask, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Requests slower than this many milliseconds get their sampled stacks dumped, 0 disables the profiler
+PROFILE_SLOW_REQUESTS_MS = float(os.getenv('PROFILE_SLOW_REQUESTS_MS', '0'))
+# Milliseconds between two stack samples of the requests in flight
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', '5'))
+# Directory receiving the folded stacks of slow requests
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'fit-profiles'))
+
+# Upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds of the buckets of per-request counts
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(pairs: Iterable[Tuple[str, str]]) -> str:
+    text = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return f"{{{text}}}" if text else ""
+
+class Histogram:
+    """
+    A Prometheus histogram: per label set, the number of observations
+    in each bucket, their sum and count
+    """
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [count per bucket (non-cumulative, last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+    
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+    
+    @contextmanager
+    def time(self, **labels):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, **labels)
+    
+    def snapshot(self, **labels) -> Dict[str, float]:
+        """
+        Count and sum of the observations with these labels
+        """
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            counts, total = self._series.get(key, ([0], 0.0))
+            return {"count": sum(counts), "sum": total}
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            pairs = list(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(pairs)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(pairs)} {cumulative}")
+        return lines
+    
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+class MetricsRegistry:
+    """
+    The histograms of this process, and gauges read when rendering
+    """
+    def __init__(self):
+        self.histograms: List[Histogram] = []
+        self.gauges: List[Tuple[str, str, Callable[[], Dict[str, float]]]] = []
+    
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        histogram = Histogram(name, documentation, labels, buckets)
+        self.histograms.append(histogram)
+        return histogram
+    
+    def gauges_from(self, prefix: str, documentation: str, read: Callable[[], Dict[str, float]]):
+        """
+        Export the numeric values of the dict returned by read() as gauges named <prefix>_<key>
+        """
+        self.gauges.append((prefix, documentation, read))
+    
+    def render(self) -> str:
+        lines = []
+        for histogram in self.histograms:
+            lines.extend(histogram.render())
+        for prefix, documentation, read in self.gauges:
+            try:
+                values = read()
+            except Exception as e:
+                logger.warning(f"Could not read the {prefix} gauges: {e}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', key)}"
+                lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} gauge", f"{name} {value}"])
+        return "\n".join(lines) + "\n"
+    
+    def reset(self):
+        for histogram in self.histograms:
+            histogram.reset()
+
+registry = MetricsRegistry()
+
+http_request_seconds = registry.histogram(
+    "fit_http_request_duration_seconds", "Time to handle a request, by route", ("method", "route", "status")
+)
+db_queries_per_request = registry.histogram(
+    "fit_db_queries_per_request", "SQL statements executed by the request thread", ("route",), COUNT_BUCKETS
+)
+db_query_seconds = registry.histogram(
+    "fit_db_query_duration_seconds", "Time to execute a SQL statement, by route (background outside requests)", ("route",)
+)
+coach_request_seconds = registry.histogram(
+    "fit_coach_request_duration_seconds", "Time of the calls to the coach service", ("path", "outcome")
+)
+wod_stage_seconds = registry.histogram(
+    "fit_wod_stage_duration_seconds", "Time spent in each stage of WOD generation and in serializing WODs", ("stage",)
+)
+
+def _pool_gauges() -> Dict[str, float]:
+    from ..database import get_pool_metrics
+    return get_pool_metrics()
+
+registry.gauges_from("fit_db_pool", "Connection pool state and checkout waits, see /metrics/db", _pool_gauges)
+
+class RequestState:
+    """
+    What is measured about the request handled by a thread
+    """
+    __slots__ = ("method", "route", "start", "status", "queries", "query_seconds", "samples")
+    
+    def __init__(self, method: str, route: str):
+        self.method = method
+        self.route = route
+        self.start = perf_counter()
+        self.status = 500
+        self.queries = 0
+        self.query_seconds = 0.0
+        # Folded stack -> number of samples, filled by the profiler
+        self.samples: Counter = Counter()
+
+_request_state: ContextVar[Optional[RequestState]] = ContextVar("fit_request_state", default=None)
+
+def current_request_state() -> Optional[RequestState]:
+    return _request_state.get()
+
+@contextmanager
+def on_behalf_of(state: Optional[RequestState]):
+    """
+    Count the SQL statements of the current thread towards the request, for
+    work handed to another thread while the request waits for it. Threads
+    don't inherit the request's context, their statements would otherwise
+    be recorded as background ones.
+    """
+    token = _request_state.set(state)
+    try:
+        yield
+    finally:
+        _request_state.reset(token)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = perf_counter() - conn.info["query_start"].pop()
+    state = _request_state.get()
+    if state is not None:
+        state.queries += 1
+        state.query_seconds += seconds
+    db_query_seconds.observe(seconds, route=state.route if state is not None else "background")
+
+def _handle_error(exception_context):
+    # The statement failed, after_cursor_execute won't pop its start time
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start"):
+        connection.info["query_start"].pop()
+
+def instrument_engine(engine: Engine):
+    """
+    Time every SQL statement executed through the engine
+    """
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+def _fold(frame) -> str:
+    # Root first, as flamegraph.pl and speedscope expect
+    names = []
+    while frame is not None:
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+# Modules whose functions at the top of a stack mean the thread is waiting for work
+IDLE_MODULES = {"threading", "queue", "selectors", "socketserver", "concurrent.futures.thread"}
+
+class SlowRequestProfiler:
+    """
+    Statistical profiler of the requests in flight. A thread samples the
+    stacks of the request threads every `interval` seconds, along with the
+    busy stacks of the other threads (WOD job workers, batchers...) that may
+    be working on their behalf. Requests taking longer than `threshold`
+    seconds get their samples written as folded stacks, one
+    "frame;frame;... count" line per stack, readable by flamegraph.pl or
+    speedscope. Work done in other processes (WOD engine workers) only
+    shows as the waiting thread.
+    """
+    def __init__(self, threshold: float, interval: float = PROFILE_SAMPLE_INTERVAL_MS / 1000, directory: str = PROFILE_DIR):
+        self.threshold = threshold
+        self.interval = interval
+        self.directory = directory
+        self._active: Dict[int, RequestState] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.dumped = 0
+    
+    def begin(self, state: RequestState):
+        with self._lock:
+            self._active[threading.get_ident()] = state
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+                self._thread.start()
+    
+    def end(self, state: RequestState, seconds: float) -> Optional[str]:
+        """
+        Stop sampling the request, returns the file its stacks were dumped to if it was slow
+        """
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+            samples = Counter(state.samples)
+        if seconds < self.threshold or not samples:
+            return None
+        
+        os.makedirs(self.directory, exist_ok=True)
+        route = re.sub(r"[^a-zA-Z0-9]+", "_", state.route).strip("_") or "root"
+        path = os.path.join(
+            self.directory,
+            f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{state.method}-{route}-{seconds * 1000:.0f}ms.folded"
+        )
+        with open(path, "w") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        self.dumped += 1
+        logger.info(f"{state.method} {state.route} took {seconds * 1000:.0f}ms, stacks dumped to {path}")
+        return path
+    
+    def sample(self):
+        """
+        Take one sample of the stacks of every thread
+        """
+        with self._lock:
+            if not self._active:
+                return
+            active = dict(self._active)
+        
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        frames = sys._current_frames()
+        busy = []
+        for ident, frame in frames.items():
+            if ident in active or ident == threading.get_ident():
+                continue
+            if frame.f_globals.get("__name__") in IDLE_MODULES:
+                continue
+            busy.append(f"{names.get(ident, ident)};{_fold(frame)}")
+        
+        with self._lock:
+            for ident, state in active.items():
+                frame = frames.get(ident)
+                if frame is None or self._active.get(ident) is not state:
+                    continue
+                state.samples[f"request;{_fold(frame)}"] += 1
+                for stack in busy:
+                    state.samples[stack] += 1
+    
+    def _sample_loop(self):
+        while True:
+            sleep(self.interval)
+            try:
+                self.sample()
+            except Exception as e:
+                logger.warning(f"Request profiler sample failed: {e}")
+
+slow_request_profiler = SlowRequestProfiler(PROFILE_SLOW_REQUESTS_MS / 1000) if PROFILE_SLOW_REQUESTS_MS > 0 else None
+
+def _start_request():
+    rule = request.url_rule
+    state = RequestState(request.method, rule.rule if rule is not None else "unmatched")
+    request.environ["fit.request_state"] = (state, _request_state.set(state))
+    if slow_request_profiler is not None:
+        slow_request_profiler.begin(state)
+
+def _record_status(response):
+    started = request.environ.get("fit.request_state")
+    if started is not None:
+        started[0].status = response.status_code
+    return response
+
+def _finish_request(exception=None):
+    started = request.environ.pop("fit.request_state", None)
+    if started is None:
+        return
+    state, token = started
+    seconds = perf_counter() - state.start
+    _request_state.reset(token)
+    http_request_seconds.observe(seconds, method=state.method, route=state.route, status=state.status)
+    db_queries_per_request.observe(state.queries, route=state.route)
+    if slow_request_profiler is not None:
+        slow_request_profiler.end(state, seconds)
+
+def instrument_app(app: Flask):
+    """
+    Record the latency, status and SQL statements of every request of the app.
+    Register it before the other request hooks for their time to be counted.
+    Only the app's engine is timed, not the ones scripts and benchmarks create.
+    """
+    from ..database import get_engine
+    instrument_engine(get_engine())
+    app.before_request(_start_request)
+    app.after_request(_record_status)
+    app.teardown_request(_finish_request)
+
+def render_metrics() -> str:
+    """
+    The metrics of this process in the Prometheus text format
+    """
+    return registry.render()
@@ -0,0 +1,214 @@
+import os
+import hmac
+import base64
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Algorithm of the new hashes, "scrypt" or "pbkdf2_sha256"
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'scrypt')
+# scrypt cost: CPU/memory cost n (a power of 2), block size r and parallelism p
+PASSWORD_SCRYPT_N = int(os.getenv('PASSWORD_SCRYPT_N', str(2 ** 14)))
+PASSWORD_SCRYPT_R = int(os.getenv('PASSWORD_SCRYPT_R', '8'))
+PASSWORD_SCRYPT_P = int(os.getenv('PASSWORD_SCRYPT_P', '1'))
+# PBKDF2-HMAC-SHA256 iterations
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', '600000'))
+# Threads verifying passwords, and verifications running or waiting before logins are refused (0 for no limit)
+PASSWORD_VERIFY_WORKERS = int(os.getenv('PASSWORD_VERIFY_WORKERS', str(os.cpu_count() or 1)))
+PASSWORD_VERIFY_MAX_PENDING = int(os.getenv('PASSWORD_VERIFY_MAX_PENDING', str(PASSWORD_VERIFY_WORKERS * 8)))
+
+SALT_BYTES = 16
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+class PasswordHasher(ABC):
+    """
+    A salted password hashing scheme. Hashes are stored as
+    "<algorithm>$<cost parameters>$<salt>$<hash>" so that the scheme and
+    the cost they were made with are known when verifying them.
+    """
+    algorithm = ""
+    
+    @abstractmethod
+    def _derive(self, password: bytes, salt: bytes, params: str) -> bytes:
+        """
+        Hash of the password with the salt and cost parameters, raises ValueError on invalid parameters
+        """
+    
+    @abstractmethod
+    def params(self) -> str:
+        """
+        Cost parameters of the new hashes
+        """
+    
+    def hash(self, password: str) -> str:
+        salt = os.urandom(SALT_BYTES)
+        params = self.params()
+        derived = self._derive(password.encode(), salt, params)
+        return f"{self.algorithm}${params}${_b64encode(salt)}${_b64encode(derived)}"
+    
+    def verify(self, password: str, encoded: str) -> bool:
+        try:
+            _, params, salt, expected = encoded.split("$")
+            expected = _b64decode(expected)
+            derived = self._derive(password.encode(), _b64decode(salt), params)
+        except ValueError:
+            return False
+        return hmac.compare_digest(derived, expected)
+    
+    def needs_rehash(self, encoded: str) -> bool:
+        """
+        Whether the hash was made with other cost parameters than the current ones
+        """
+        parts = encoded.split("$")
+        return len(parts) != 4 or parts[1] != self.params()
+
+class ScryptHasher(PasswordHasher):
+    algorithm = "scrypt"
+    
+    def __init__(self, n: int = PASSWORD_SCRYPT_N, r: int = PASSWORD_SCRYPT_R, p: int = PASSWORD_SCRYPT_P):
+        self.n, self.r, self.p = n, r, p
+    
+    def params(self) -> str:
+        return f"n={self.n},r={self.r},p={self.p}"
+    
+    def _derive(self, password: bytes, salt: bytes, params: str) -> bytes:
+        cost = dict(item.split("=") for item in params.split(","))
+        if not {"n", "r", "p"} <= set(cost):
+            raise ValueError(f"Invalid scrypt parameters {params!r}")
+        n, r, p = int(cost["n"]), int(cost["r"]), int(cost["p"])
+        if not all(0 < value < 2 ** 32 for value in (n, r, p)):
+            raise ValueError(f"Invalid scrypt parameters {params!r}")
+        # OpenSSL refuses to use more than maxmem, which is 32MB by default
+        return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p, maxmem=128 * r * (n + p + 2) + 1024 * 1024, dklen=32)
+
+class Pbkdf2Hasher(PasswordHasher):
+    algorithm = "pbkdf2_sha256"
+    
+    def __init__(self, iterations: int = PASSWORD_PBKDF2_ITERATIONS):
+        self.iterations = iterations
+    
+    def params(self) -> str:
+        return str(self.iterations)
+    
+    def _derive(self, password: bytes, salt: bytes, params: str) -> bytes:
+        iterations = int(params)
+        if not 0 < iterations < 2 ** 32:
+            raise ValueError(f"Invalid pbkdf2_sha256 iterations {params!r}")
+        return hashlib.pbkdf2_hmac("sha256", password, salt, iterations)
+
+class LegacySha256Hasher:
+    """
+    The unsalted SHA-256 hex digests stored before salted hashes, only verified
+    """
+    algorithm = "sha256"
+    
+    @staticmethod
+    def matches(encoded: str) -> bool:
+        return len(encoded) == 64 and "$" not in encoded
+    
+    def verify(self, password: str, encoded: str) -> bool:
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), encoded)
+
+def hasher_from_env() -> PasswordHasher:
+    if PASSWORD_HASHER == "pbkdf2_sha256":
+        return Pbkdf2Hasher()
+    if PASSWORD_HASHER != "scrypt":
+        raise ValueError(f"Unknown PASSWORD_HASHER {PASSWORD_HASHER!r}, use scrypt or pbkdf2_sha256")
+    return ScryptHasher()
+
+class PasswordVerifierBusy(Exception):
+    """
+    Raised when as many password verifications are pending as the verifier accepts
+    """
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too many logins in progress, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+class PasswordVerifier:
+    """
+    Hashes and verifies passwords with the preferred hasher, verifying the
+    hashes of the other schemes too so users can log in after a change.
+    Verifications run on a bounded thread pool (hashlib releases the GIL
+    while deriving), so a burst of logins uses at most `workers` cores and
+    is refused beyond `max_pending` rather than starving other requests.
+    """
+    def __init__(
+        self,
+        hasher: Optional[PasswordHasher] = None,
+        workers: int = PASSWORD_VERIFY_WORKERS,
+        max_pending: int = PASSWORD_VERIFY_MAX_PENDING
+    ):
+        self.hasher = hasher or hasher_from_env()
+        self.hashers: Dict[str, PasswordHasher] = {
+            scheme.algorithm: scheme for scheme in (ScryptHasher(), Pbkdf2Hasher())
+        }
+        self.hashers[self.hasher.algorithm] = self.hasher
+        self.legacy = LegacySha256Hasher()
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max_pending) if max_pending > 0 else None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._dummy_hash: Optional[str] = None
+    
+    def hash(self, password: str) -> str:
+        return self.hasher.hash(password)
+    
+    def _verify(self, password: str, encoded: str) -> Tuple[bool, Optional[str]]:
+        if self.legacy.matches(encoded):
+            valid, outdated = self.legacy.verify(password, encoded), True
+        else:
+            hasher = self.hashers.get(encoded.split("$", 1)[0])
+            if hasher is None:
+                return False, None
+            valid = hasher.verify(password, encoded)
+            outdated = valid and (hasher is not self.hasher or hasher.needs_rehash(encoded))
+        # Rehashed with the current scheme while the password is at hand
+        return valid, self.hasher.hash(password) if valid and outdated else None
+    
+    def _submit(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        if self._slots is not None and not self._slots.acquire(blocking=False):
+            raise PasswordVerifierBusy(retry_after=1)
+        try:
+            if self._executor is None:
+                with self._lock:
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password")
+            return self._executor.submit(fn, *args).result()
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+    
+    def verify(self, password: str, encoded: str) -> Tuple[bool, Optional[str]]:
+        """
+        Check the password against its stored hash.
+        Returns whether it matches and, when the hash is outdated (legacy
+        SHA-256, other scheme or cost), the new hash to store instead.
+        """
+        return self._submit(self._verify, password, encoded)
+    
+    def verify_dummy(self, password: str):
+        """
+        Spend the time of a verification, for unknown users not to answer faster
+        """
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hasher.hash(os.urandom(SALT_BYTES).hex())
+        self._submit(self.hasher.verify, password, self._dummy_hash)
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+password_verifier = PasswordVerifier()
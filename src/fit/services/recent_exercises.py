@@ -0,0 +1,149 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from time import monotonic
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, select
+from ..database import db_session, release_session
+from ..models_db import UserExerciseHistoryModel
+
+# Users whose recent exercises are kept in memory, least recently used ones are evicted
+RECENT_EXERCISES_CACHE_USERS = int(os.getenv('RECENT_EXERCISES_CACHE_USERS', '100000'))
+# Days of history held per user, longer look-backs read the database
+RECENT_EXERCISES_WINDOW_DAYS = int(os.getenv('RECENT_EXERCISES_WINDOW_DAYS', '3'))
+# Seconds before a user's entry is reloaded, catching history written by other processes, 0 never reloads
+RECENT_EXERCISES_CACHE_TTL = float(os.getenv('RECENT_EXERCISES_CACHE_TTL', '300'))
+
+class _Entry:
+    __slots__ = ("performed_at", "loaded_at")
+    
+    def __init__(self, performed_at: Dict[int, datetime], loaded_at: float):
+        # Last time each exercise was performed
+        self.performed_at = performed_at
+        self.loaded_at = loaded_at
+
+class RecentExercisesCache:
+    """
+    The exercises each user performed within the window, with their last time.
+    A user's entry is loaded from the history once, then kept up to date by
+    the history writes of this process (write-through), so the exercises to
+    exclude from a WOD are known without reading the database.
+    Exercises older than the window are dropped as they are read.
+    """
+    def __init__(
+        self,
+        max_users: int = RECENT_EXERCISES_CACHE_USERS,
+        window_days: int = RECENT_EXERCISES_WINDOW_DAYS,
+        ttl: float = RECENT_EXERCISES_CACHE_TTL
+    ):
+        self.max_users = max_users
+        self.window = timedelta(days=window_days)
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # Users being loaded: number of loads in progress and the writes recorded meanwhile
+        self._loading: Dict[str, Tuple[int, Dict[int, datetime]]] = {}
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+    
+    def _load(self, user_email: str, since: datetime) -> Dict[int, datetime]:
+        db = db_session()
+        try:
+            rows = db.execute(
+                select(UserExerciseHistoryModel.exercise_id, func.max(UserExerciseHistoryModel.performed_at)).where(
+                    UserExerciseHistoryModel.user_email == user_email,
+                    UserExerciseHistoryModel.performed_at >= since
+                ).group_by(UserExerciseHistoryModel.exercise_id)
+            )
+            return {exercise_id: performed_at for exercise_id, performed_at in rows}
+        finally:
+            release_session(db)
+    
+    def _store(self, user_email: str, entry: _Entry):
+        # Called with the lock held
+        self._entries[user_email] = entry
+        self._entries.move_to_end(user_email)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+    
+    def get(self, user_email: str, days_back: Optional[int] = None, now: Optional[datetime] = None) -> Optional[List[int]]:
+        """
+        IDs of the exercises the user performed in the last days_back days
+        (the whole window by default), None when that is beyond the window
+        """
+        now = now or datetime.utcnow()
+        look_back = self.window if days_back is None else timedelta(days=days_back)
+        if look_back > self.window:
+            return None
+        
+        with self._lock:
+            entry = self._entries.get(user_email)
+            if entry is not None and self.ttl and monotonic() - entry.loaded_at > self.ttl:
+                # Reloaded below, writes recorded meanwhile go to the load
+                del self._entries[user_email]
+                entry = None
+            if entry is not None:
+                self.counters["hits"] += 1
+                self._entries.move_to_end(user_email)
+                window_start = now - self.window
+                for exercise_id in [key for key, at in entry.performed_at.items() if at < window_start]:
+                    del entry.performed_at[exercise_id]
+                since = now - look_back
+                return [exercise_id for exercise_id, at in entry.performed_at.items() if at >= since]
+            self.counters["misses"] += 1
+            
+            loads, written = self._loading.get(user_email, (0, {}))
+            self._loading[user_email] = (loads + 1, written)
+        
+        loaded_at = monotonic()
+        try:
+            performed_at = self._load(user_email, now - self.window)
+        finally:
+            with self._lock:
+                loads, written = self._loading[user_email]
+                if loads == 1:
+                    del self._loading[user_email]
+                else:
+                    self._loading[user_email] = (loads - 1, written)
+        
+        with self._lock:
+            # History saved while loading may be missing from what was read
+            for exercise_id, at in written.items():
+                if performed_at.get(exercise_id, at) <= at:
+                    performed_at[exercise_id] = at
+            self._store(user_email, _Entry(performed_at, loaded_at))
+            since = now - look_back
+            return [exercise_id for exercise_id, at in performed_at.items() if at >= since]
+    
+    def record(self, user_email: str, exercise_ids: Iterable[int], performed_at: datetime):
+        """
+        Write-through of history saved (and committed) for the user.
+        Users without an entry are left to be loaded on their next read.
+        """
+        with self._lock:
+            entry = self._entries.get(user_email)
+            if entry is not None:
+                self._entries.move_to_end(user_email)
+                times = entry.performed_at
+            elif user_email in self._loading:
+                times = self._loading[user_email][1]
+            else:
+                return
+            for exercise_id in exercise_ids:
+                if times.get(exercise_id, performed_at) <= performed_at:
+                    times[exercise_id] = performed_at
+    
+    def invalidate(self, user_email: str):
+        with self._lock:
+            self._entries.pop(user_email, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {"users": len(self._entries), "max_users": self.max_users, **self.counters}
+
+recent_exercises_cache = RecentExercisesCache()
@@ -1,10 +1,10 @@
 from ..models_dto import UserSchema, UserResponseSchema, UserProfileSchema, UserProfileResponseSchema
 from ..models_db import UserModel
-from ..database import db_session
+from ..database import db_session, release_session
+from .password_hashing import password_verifier
 from typing import List, Optional
 import random
 import string
-import hashlib
 
 def generate_random_password(length=10):
     """Generate a random password of specified length"""
@@ -12,8 +12,8 @@ def generate_random_password(length=10):
     return ''.join(random.choice(chars) for _ in range(length))
 
 def hash_password(password):
-    """Hash a password using SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash a password with a salt, using the configured scheme (scrypt by default)"""
+    return password_verifier.hash(password)
 
 def create_user(user: UserSchema) -> UserResponseSchema:
     """
@@ -41,7 +41,7 @@ def create_user(user: UserSchema) -> UserResponseSchema:
         db.rollback()
         raise e
     finally:
-        db.close()
+        release_session(db)
     
     # Return response including the clear-text password (one-time reveal)
     response = UserResponseSchema(
@@ -72,7 +72,7 @@ def get_all_users() -> List[UserSchema]:
             for db_user in db_users
         ]
     finally:
-        db.close()
+        release_session(db)
 
 def update_user_profile(email: str, profile: UserProfileSchema) -> Optional[UserProfileResponseSchema]:
     """
@@ -107,7 +107,7 @@ def update_user_profile(email: str, profile: UserProfileSchema) -> Optional[User
         db.rollback()
         raise e
     finally:
-        db.close()
+        release_session(db)
 
 def get_user_profile(email: str) -> Optional[UserProfileResponseSchema]:
     """
@@ -128,4 +128,4 @@ def get_user_profile(email: str) -> Optional[UserProfileResponseSchema]:
             onboarded=user.onboarded
         )
     finally:
-        db.close()
+        release_session(db)
@@ -0,0 +1,106 @@
+import os
+import math
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Number of worker processes, 0 runs the computation inline in the calling thread
+WOD_ENGINE_WORKERS = int(os.getenv('WOD_ENGINE_WORKERS', str(os.cpu_count() or 1)))
+# Maximum number of computations running or waiting for a worker, 0 for no limit
+WOD_ENGINE_MAX_PENDING = int(os.getenv('WOD_ENGINE_MAX_PENDING', str(max(WOD_ENGINE_WORKERS, 1) * 4)))
+
+class WODEngineSaturated(Exception):
+    """
+    Raised when the engine already holds as many computations as it accepts
+    """
+    def __init__(self, retry_after: int):
+        super().__init__(f"WOD engine is saturated, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+class WODEngine:
+    """
+    Runs the CPU heavy part of WOD generation in a bounded pool of worker
+    processes, so it neither holds the GIL of the web worker nor queues
+    without limit. Callers block until their result is ready, other request
+    threads keep running meanwhile.
+    """
+    def __init__(self, workers: int = WOD_ENGINE_WORKERS, max_pending: int = WOD_ENGINE_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending) if max_pending > 0 else None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        # Moving average of the computation time, used to estimate Retry-After
+        self._average_duration = 3.0
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created on first use so importing the module never starts processes
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"Started WOD engine with {self.workers} worker processes")
+            return self._executor
+    
+    def retry_after(self) -> int:
+        """
+        Estimate in seconds when a slot should be free again
+        """
+        queued = self._pending / max(self.workers, 1)
+        return max(1, math.ceil(self._average_duration * queued))
+    
+    def run(self, fn: Callable, *args):
+        """
+        Run fn(*args) on the engine and wait for its result.
+        fn must be a module level function so it can be sent to a worker process.
+        Raises WODEngineSaturated instead of waiting when no slot is free.
+        """
+        if self._slots is not None and not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise WODEngineSaturated(self.retry_after())
+        
+        with self._lock:
+            self._pending += 1
+        start = perf_counter()
+        try:
+            if self.workers > 0:
+                return self._get_executor().submit(fn, *args).result()
+            return fn(*args)
+        finally:
+            duration = perf_counter() - start
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+                self._average_duration = 0.8 * self._average_duration + 0.2 * duration
+            if self._slots is not None:
+                self._slots.release()
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "average_duration_seconds": self._average_duration,
+            }
+    
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+wod_engine = WODEngine()
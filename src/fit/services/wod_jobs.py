@@ -0,0 +1,272 @@
+import os
+import uuid
+import logging
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Callable, Dict, Optional, Union
+from ..database import db_session, release_session
+from ..models_db import WODJobModel
+from ..models_dto import WodResponseSchema
+from .wod_engine import WODEngineSaturated
+from .instrumentation import RequestState, current_request_state, on_behalf_of
+
+logger = logging.getLogger(__name__)
+
+# Threads generating WODs, each one waits on the WOD engine or the coach most of the time
+WOD_JOB_WORKERS = int(os.getenv('WOD_JOB_WORKERS', str(max(os.cpu_count() or 1, 2) * 2)))
+# Jobs pending or running before new submissions are refused
+WOD_JOB_MAX_QUEUED = int(os.getenv('WOD_JOB_MAX_QUEUED', str(WOD_JOB_WORKERS * 8)))
+# Seconds a finished job stays available for polling
+WOD_JOB_TTL = float(os.getenv('WOD_JOB_TTL', '300'))
+# Seconds between reads of a job run by another process while a poll waits for it
+WOD_JOB_POLL_INTERVAL = float(os.getenv('WOD_JOB_POLL_INTERVAL', '0.5'))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class WODJobQueueFull(Exception):
+    """
+    Raised when too many jobs are already waiting
+    """
+    def __init__(self, retry_after: int):
+        super().__init__(f"WOD job queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+@dataclass
+class WODJob:
+    id: str
+    user_email: str
+    status: str = PENDING
+    result: Optional[WodResponseSchema] = None
+    error: Optional[str] = None
+    # HTTP status and Retry-After a synchronous caller should answer with on failure
+    error_status: int = 500
+    retry_after: Optional[int] = None
+    created_at: float = field(default_factory=monotonic)
+    finished_at: Optional[float] = None
+    _finished: threading.Event = field(default_factory=threading.Event, repr=False)
+    
+    @property
+    def finished(self) -> bool:
+        return self._finished.is_set()
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the job is done or failed, returns whether it finished
+        """
+        return self._finished.wait(timeout)
+
+class InMemoryWODJobStore:
+    """
+    Process local job store, finished jobs are purged once their TTL is over
+    """
+    def __init__(self, ttl: float = WOD_JOB_TTL):
+        self.ttl = ttl
+        self._jobs: Dict[str, WODJob] = {}
+        self._lock = threading.Lock()
+    
+    def add(self, job: WODJob):
+        with self._lock:
+            self._jobs[job.id] = job
+    
+    def update(self, job: WODJob):
+        # The stored job is the one being updated
+        pass
+    
+    def get(self, job_id: str) -> Optional[WODJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def purge_expired(self):
+        now = monotonic()
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished and now - job.finished_at > self.ttl
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+class DatabaseWODJobStore:
+    """
+    Job store on the wod_jobs table, so that a job created by one worker
+    process can be polled through any other. Finished jobs are purged once
+    their TTL is over, at most once per TTL by each process.
+    """
+    def __init__(self, ttl: float = WOD_JOB_TTL):
+        self.ttl = ttl
+        self._next_purge = 0.0
+    
+    def add(self, job: WODJob):
+        db = db_session()
+        try:
+            db.add(WODJobModel(id=job.id, user_email=job.user_email, status=job.status))
+            db.commit()
+        finally:
+            release_session(db)
+    
+    def update(self, job: WODJob):
+        db = db_session()
+        try:
+            db.query(WODJobModel).filter(WODJobModel.id == job.id).update({
+                "status": job.status,
+                "result": job.result.model_dump_json() if job.result is not None else None,
+                "error": job.error,
+                "finished_at": datetime.datetime.utcnow() if job.status in (DONE, FAILED) else None,
+            })
+            db.commit()
+        finally:
+            release_session(db)
+    
+    def get(self, job_id: str) -> Optional[WODJob]:
+        db = db_session()
+        try:
+            # Polls read the row again within a request's session
+            row = db.get(WODJobModel, job_id, populate_existing=True)
+            if not row:
+                return None
+            job = WODJob(
+                id=row.id,
+                user_email=row.user_email,
+                status=row.status,
+                result=WodResponseSchema.model_validate_json(row.result) if row.result is not None else None,
+                error=row.error
+            )
+        finally:
+            release_session(db)
+        
+        if job.status in (DONE, FAILED):
+            job._finished.set()
+        return job
+    
+    def purge_expired(self):
+        if monotonic() < self._next_purge:
+            return
+        self._next_purge = monotonic() + self.ttl
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.ttl)
+        db = db_session()
+        try:
+            db.query(WODJobModel).filter(WODJobModel.finished_at < cutoff).delete()
+            db.commit()
+        finally:
+            release_session(db)
+
+class WODJobManager:
+    """
+    Runs WOD generation as background jobs on a small pool of threads.
+    Clients either wait for the job (synchronous endpoint) or poll it, from
+    any process sharing the store. The jobs running in this process are
+    also kept in memory, so that waiting for them needs no polling.
+    """
+    def __init__(
+        self,
+        generate: Callable[[str], WodResponseSchema],
+        workers: int = WOD_JOB_WORKERS,
+        max_queued: int = WOD_JOB_MAX_QUEUED,
+        store: Optional[Union[DatabaseWODJobStore, InMemoryWODJobStore]] = None
+    ):
+        self.generate = generate
+        self.workers = workers
+        self.max_queued = max_queued
+        self.store = store or DatabaseWODJobStore()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running: Dict[str, WODJob] = {}
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="wod-job")
+            return self._executor
+    
+    def submit(self, user_email: str) -> WODJob:
+        """
+        Queue the generation of a WOD for the user and return the job right away
+        """
+        self.store.purge_expired()
+        with self._lock:
+            if self._queued >= self.max_queued:
+                raise WODJobQueueFull(retry_after=max(1, self._queued // max(self.workers, 1)))
+            self._queued += 1
+        
+        job = WODJob(id=uuid.uuid4().hex, user_email=user_email)
+        try:
+            self.store.add(job)
+            with self._lock:
+                self._running[job.id] = job
+            # Not copy_context(): the worker would also see the request's Flask context
+            self._get_executor().submit(self._execute, job, current_request_state())
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+                self._running.pop(job.id, None)
+            raise
+        return job
+    
+    def get(self, job_id: str) -> Optional[WODJob]:
+        with self._lock:
+            job = self._running.get(job_id)
+        return job or self.store.get(job_id)
+    
+    def wait(self, job: WODJob, timeout: float) -> WODJob:
+        """
+        Wait up to timeout seconds for the job to finish and return its
+        latest state. Jobs run by other processes are read again from the
+        store every WOD_JOB_POLL_INTERVAL seconds.
+        """
+        deadline = monotonic() + timeout
+        while not job.finished:
+            remaining = deadline - monotonic()
+            if remaining <= 0 or job.wait(min(WOD_JOB_POLL_INTERVAL, remaining)):
+                break
+            job = self.get(job.id) or job
+        return job
+    
+    def _save(self, job: WODJob):
+        try:
+            self.store.update(job)
+        except Exception:
+            logger.exception(f"Saving WOD job {job.id} failed")
+    
+    def _execute(self, job: WODJob, request_state: Optional[RequestState] = None):
+        with on_behalf_of(request_state):
+            self._run(job)
+    
+    def _run(self, job: WODJob):
+        job.status = RUNNING
+        self._save(job)
+        try:
+            job.result = self.generate(job.user_email)
+            job.status = DONE
+        except WODEngineSaturated as e:
+            job.error = "Too many workouts being generated, retry later"
+            job.error_status = 429
+            job.retry_after = e.retry_after
+            job.status = FAILED
+        except Exception as e:
+            logger.exception(f"WOD job {job.id} failed")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = monotonic()
+            self._save(job)
+            with self._lock:
+                self._queued -= 1
+                self._running.pop(job.id, None)
+            job._finished.set()
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {"workers": self.workers, "max_queued": self.max_queued, "queued": self._queued}
+    
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
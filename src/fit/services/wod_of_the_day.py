@@ -0,0 +1,255 @@
+import os
+import logging
+import threading
+import datetime
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from ..database import db_session, release_session
+from ..models_db import DailyWODModel
+from ..models_dto import WodResponseSchema
+from .fitness_coach_service import get_recently_active_users, history_entries, insert_exercise_history
+from .recent_exercises import recent_exercises_cache
+
+logger = logging.getLogger(__name__)
+
+# WODs of the day kept in memory in front of the daily_wods table
+WOD_OF_THE_DAY_MEMORY_ENTRIES = int(os.getenv('WOD_OF_THE_DAY_MEMORY_ENTRIES', '10000'))
+# Background pre-generation of the WODs of recently active users, off by default
+WOD_PREGEN_ENABLED = os.getenv('WOD_PREGEN_ENABLED', 'false').lower() == 'true'
+# UTC hours window "start-end" (end excluded) in which the pre-generation runs
+WOD_PREGEN_HOURS = os.getenv('WOD_PREGEN_HOURS', '2-5')
+# Users who trained in the last N days are warmed
+WOD_PREGEN_ACTIVE_DAYS = int(os.getenv('WOD_PREGEN_ACTIVE_DAYS', '3'))
+
+def utc_today() -> datetime.date:
+    return datetime.datetime.now(datetime.UTC).date()
+
+def seconds_until_midnight(now: Optional[datetime.datetime] = None) -> int:
+    """
+    Seconds left before the current WODs of the day expire
+    """
+    now = now or datetime.datetime.now(datetime.UTC)
+    midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time(), tzinfo=datetime.UTC)
+    return max(1, int((midnight - now).total_seconds()))
+
+class WODOfTheDayStore:
+    """
+    Stores one WOD per user and UTC day.
+    The daily_wods table is shared by every process, an LRU bounded copy is
+    kept in memory so repeated calls don't hit the database. The WODs of the
+    previous days are purged by the first WOD stored on a new day.
+    """
+    def __init__(self, max_memory_entries: int = WOD_OF_THE_DAY_MEMORY_ENTRIES):
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[Tuple[str, datetime.date], WodResponseSchema]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._purged_day: Optional[datetime.date] = None
+    
+    def _remember(self, key: Tuple[str, datetime.date], wod: WodResponseSchema):
+        with self._lock:
+            self._memory[key] = wod
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+    
+    def get(self, user_email: str, day: datetime.date) -> Optional[WodResponseSchema]:
+        key = (user_email, day)
+        with self._lock:
+            wod = self._memory.get(key)
+            if wod is not None:
+                self._memory.move_to_end(key)
+                return wod
+        
+        db = db_session()
+        try:
+            row = db.get(DailyWODModel, {"user_email": user_email, "day": day})
+            if not row:
+                return None
+            wod = WodResponseSchema.model_validate_json(row.payload)
+        finally:
+            release_session(db)
+        
+        self._remember(key, wod)
+        return wod
+    
+    def add(self, user_email: str, day: datetime.date, wod: WodResponseSchema, with_history: bool = False) -> WodResponseSchema:
+        """
+        Store the WOD of the day, unless another process stored one first,
+        and return the one that is kept.
+        With with_history its exercises are saved to the user's history in
+        the same transaction, so a WOD losing the race leaves no history.
+        """
+        self._purge_on_day_change(day)
+        
+        performed_at = datetime.datetime.utcnow()
+        db = db_session()
+        try:
+            db.add(DailyWODModel(user_email=user_email, day=day, payload=wod.model_dump_json()))
+            if with_history:
+                # Flushed first: the history is only written once the WOD of the day is claimed
+                db.flush()
+                insert_exercise_history(db, user_email, history_entries(wod), performed_at)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            stored = self.get(user_email, day)
+            if stored is not None:
+                return stored
+            raise
+        finally:
+            release_session(db)
+        
+        if with_history:
+            recent_exercises_cache.record(user_email, [ex.id for ex in wod.exercises], performed_at)
+        self._remember((user_email, day), wod)
+        return wod
+    
+    def _purge_on_day_change(self, day: datetime.date):
+        # Once per process and day, whether or not the pre-generation runs
+        if self._purged_day is not None and self._purged_day >= day:
+            return
+        try:
+            self.purge_before(day)
+            self._purged_day = day
+        except Exception as e:
+            logger.warning(f"Could not purge the WODs of the day before {day}: {e}")
+    
+    def clear_memory(self):
+        """
+        Forget the in-memory copies, the database keeps the WODs
+        """
+        with self._lock:
+            self._memory.clear()
+    
+    def purge_before(self, day: datetime.date):
+        """
+        Drop the WODs of the days before the given one
+        """
+        with self._lock:
+            for key in [key for key in self._memory if key[1] < day]:
+                del self._memory[key]
+        
+        db = db_session()
+        try:
+            db.query(DailyWODModel).filter(DailyWODModel.day < day).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            raise e
+        finally:
+            release_session(db)
+
+class WODOfTheDayService:
+    """
+    Memoizes WOD generation per user and UTC day: only the first call of the
+    day generates a workout (and records history), later ones reuse it.
+    `generate` is called with the user and the function storing the WOD in
+    place of the history stage, see WODService.generate_wod_response.
+    """
+    def __init__(
+        self,
+        generate: Callable[[str, Callable[[str, WodResponseSchema], WodResponseSchema]], WodResponseSchema],
+        store: Optional[WODOfTheDayStore] = None
+    ):
+        self.generate = generate
+        self.store = store or WODOfTheDayStore()
+        self._in_progress: Dict[Tuple[str, datetime.date], threading.Lock] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, user_email: str) -> Optional[WodResponseSchema]:
+        """
+        Get today's WOD of the user if it was already generated
+        """
+        return self.store.get(user_email, utc_today())
+    
+    def get_or_generate(self, user_email: str) -> WodResponseSchema:
+        """
+        Get today's WOD of the user, generating it on the first call of the day
+        """
+        day = utc_today()
+        wod = self.store.get(user_email, day)
+        if wod is not None:
+            return wod
+        
+        # Concurrent refreshes of the same user wait for a single generation, across
+        # processes the first WOD stored wins and only its exercises go to history
+        key = (user_email, day)
+        with self._lock:
+            generation_lock = self._in_progress.setdefault(key, threading.Lock())
+        try:
+            with generation_lock:
+                wod = self.store.get(user_email, day)
+                if wod is None:
+                    wod = self.generate(
+                        user_email,
+                        lambda email, generated: self.store.add(email, day, generated, with_history=True)
+                    )
+                return wod
+        finally:
+            with self._lock:
+                if self._in_progress.get(key) is generation_lock:
+                    del self._in_progress[key]
+
+def _parse_hours(hours: str) -> Tuple[int, int]:
+    start, end = hours.split("-")
+    return int(start), int(end)
+
+class WODPregenerator(threading.Thread):
+    """
+    Background thread generating today's WODs of recently active users
+    during off-peak hours, so their first call of the day is a cache hit.
+    WODs are generated one at a time to leave the engine to live traffic.
+    """
+    def __init__(
+        self,
+        wod_of_the_day: WODOfTheDayService,
+        hours: str = WOD_PREGEN_HOURS,
+        active_days: int = WOD_PREGEN_ACTIVE_DAYS,
+        check_interval: float = 300
+    ):
+        super().__init__(name="wod-pregenerator", daemon=True)
+        self.wod_of_the_day = wod_of_the_day
+        self.start_hour, self.end_hour = _parse_hours(hours)
+        self.active_days = active_days
+        self.check_interval = check_interval
+        self._stopped = threading.Event()
+    
+    def in_window(self, now: Optional[datetime.datetime] = None) -> bool:
+        hour = (now or datetime.datetime.now(datetime.UTC)).hour
+        if self.start_hour <= self.end_hour:
+            return self.start_hour <= hour < self.end_hour
+        # Window wrapping around midnight, e.g. 22-3
+        return hour >= self.start_hour or hour < self.end_hour
+    
+    def run_once(self) -> int:
+        """
+        Generate the missing WODs of the day, returns how many were generated
+        """
+        day = utc_today()
+        generated = 0
+        for user_email in get_recently_active_users(self.active_days):
+            if self._stopped.is_set() or not self.in_window():
+                break
+            if self.wod_of_the_day.store.get(user_email, day) is not None:
+                continue
+            try:
+                self.wod_of_the_day.get_or_generate(user_email)
+                generated += 1
+            except Exception as e:
+                logger.warning(f"Could not pre-generate the WOD of {user_email}: {e}")
+        return generated
+    
+    def run(self):
+        logger.info(f"WOD pre-generation scheduled between {self.start_hour}h and {self.end_hour}h UTC")
+        while not self._stopped.is_set():
+            if self.in_window():
+                try:
+                    generated = self.run_once()
+                    logger.info(f"Pre-generated {generated} WODs of the day")
+                except Exception as e:
+                    logger.warning(f"WOD pre-generation failed: {e}")
+            self._stopped.wait(self.check_interval)
+    
+    def stop(self):
+        self._stopped.set()
@@ -1,66 +1,214 @@
 import os
-import requests
 import logging
-from typing import List, Tuple
-from ..services.fitness_coach_service import request_wod as legacy_request_wod, get_recent_exercises
-from ..models_db import ExerciseModel, MuscleGroupModel
-from ..database import db_session
+import datetime
+import random
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+from ..services.fitness_coach_service import (
+    get_recent_exercises, calculate_intensity, generate_local_wod, select_wod_exercises, save_exercise_history_batch,
+    history_entries
+)
+from ..models_dto import Exercise, WodResponseSchema, WodExerciseSchema, MuscleGroupImpact
+from .catalog_cache import get_catalog, normalize_name
+from .coach_client import CoachReplicaPool
+from .coach_batcher import CoachBatcher
+from .instrumentation import wod_stage_seconds
 
 logger = logging.getLogger(__name__)
 
+# Stages of the WOD pipeline, each runs once per generated WOD
+EXCLUSIONS = "exclusions"
+GENERATION = "generation"
+ENRICHMENT = "enrichment"
+HISTORY = "history"
+STAGES = (EXCLUSIONS, GENERATION, ENRICHMENT, HISTORY)
+
+class StageTimings:
+    """
+    Seconds spent in each stage of one WOD generation
+    """
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+    
+    @contextmanager
+    def stage(self, name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + perf_counter() - start
+
+class WODPipelineStats:
+    """
+    Per-stage timing counters of the WODs generated by this process, and
+    which generator produced them
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self.sources: Dict[str, int] = {}
+            self.stages = {name: {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0} for name in STAGES}
+    
+    def record(self, source: str, timings: StageTimings):
+        with self._lock:
+            self.sources[source] = self.sources.get(source, 0) + 1
+            for name, seconds in timings.seconds.items():
+                stage = self.stages[name]
+                stage["count"] += 1
+                stage["total_seconds"] += seconds
+                stage["max_seconds"] = max(stage["max_seconds"], seconds)
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "wods": sum(self.sources.values()),
+                "sources": dict(self.sources),
+                "stages": {
+                    name: {**stage, "mean_seconds": stage["total_seconds"] / stage["count"] if stage["count"] else 0.0}
+                    for name, stage in self.stages.items()
+                },
+            }
+
 class WODService:
+    """
+    Generates WODs in four stages, each run exactly once and handing its
+    result to the next one:
+    1. exclusions: the exercises the user did recently
+    2. generation: exercises from the coach microservice (strangler fig) or
+       the local generator, which is also the fallback when the coach fails
+    3. enrichment: muscle group impacts and suggested weight and reps
+    4. history: the workout saved to the user's history in one insert
+    """
     def __init__(self):
-        self.coach_service_url = os.getenv('COACH_SERVICE_URL', 'http://localhost:5001')
         self.use_microservice = os.getenv('USE_COACH_MICROSERVICE', 'false').lower() == 'true'
+        # Load balanced over the replicas of COACH_SERVICE_URLS (or the single COACH_SERVICE_URL)
+        self.coach_client = CoachReplicaPool.from_env()
+        # Concurrent WOD requests share /generate-wod/batch calls
+        self.coach_batcher = CoachBatcher(lambda wod_requests: self.coach_client.generate_wod_batch(wod_requests))
+        self.stats = WODPipelineStats()
     
-    def request_wod(self, user_email: str) -> List[Tuple[ExerciseModel, List[Tuple[MuscleGroupModel, bool]]]]:
+    def generate_wod_response(
+        self,
+        user_email: str,
+        save: Optional[Callable[[str, WodResponseSchema], WodResponseSchema]] = None
+    ) -> WodResponseSchema:
         """
-        Generate WOD using strangler fig pattern
+        Generate a WOD for the user, save it to their history and return it.
+        `save` replaces the history stage, it stores the WOD and returns the one to serve.
         """
+        timings = StageTimings()
+        
+        with timings.stage(EXCLUSIONS):
+            recent_exercise_ids = get_recent_exercises(user_email)
+        
+        with timings.stage(GENERATION):
+            exercises, source = self._generate(user_email, recent_exercise_ids)
+        
+        with timings.stage(ENRICHMENT):
+            wod_exercises = [self._enrich(exercise) for exercise in exercises]
+        
+        wod = WodResponseSchema(
+            exercises=wod_exercises,
+            generated_at=datetime.datetime.now(datetime.UTC).isoformat()
+        )
+        with timings.stage(HISTORY):
+            wod = (save or self.save_history)(user_email, wod)
+        
+        self.stats.record(source, timings)
+        for name, seconds in timings.seconds.items():
+            wod_stage_seconds.observe(seconds, stage=name)
+        logger.debug(f"WOD of {user_email} from {source}: " + ", ".join(
+            f"{name} {seconds * 1000:.1f}ms" for name, seconds in timings.seconds.items()
+        ))
+        return wod
+    
+    @staticmethod
+    def save_history(user_email: str, wod: WodResponseSchema) -> WodResponseSchema:
+        # The suggestions returned are the ones saved
+        save_exercise_history_batch(user_email, history_entries(wod))
+        return wod
+    
+    def _generate(self, user_email: str, recent_exercise_ids: Sequence[int]) -> Tuple[List[Exercise], str]:
+        """
+        Pick the exercises of the WOD, returns them and the generator that picked them
+        """
+        excluded_ids = set(recent_exercise_ids)
         if self.use_microservice:
             try:
                 logger.info(f"Attempting to use coach microservice for user: {user_email}")
-                return self._request_wod_microservice(user_email)
+                return self._generate_with_coach(user_email, excluded_ids), "coach"
             except Exception as e:
                 logger.warning(f"Coach microservice failed: {e}. Falling back to legacy.")
-                return legacy_request_wod(user_email)
-        else:
-            logger.info("Using legacy WOD generation")
-            return legacy_request_wod(user_email)
+                return generate_local_wod(excluded_ids), "local_fallback"
+        
+        logger.info("Using legacy WOD generation")
+        return generate_local_wod(excluded_ids), "local"
     
-    def _request_wod_microservice(self, user_email: str) -> List[Tuple[ExerciseModel, List[Tuple[MuscleGroupModel, bool]]]]:
+    def _generate_with_coach(self, user_email: str, excluded_ids: Set[int]) -> List[Exercise]:
         """
-        Call coach microservice for WOD generation
+        Ask the coach microservice for the exercises, avoiding the excluded ones by name
         """
-        recent_exercise_ids = get_recent_exercises(user_email)
-        excluded_exercises = self._get_exercise_names(recent_exercise_ids)
-        
-        payload = {
-            "user_email": user_email,
-            "excluded_exercises": excluded_exercises
-        }
+        excluded_exercises = self._get_exercise_names(excluded_ids)
+        if self.coach_batcher.window > 0:
+            coach_wod = self.coach_batcher.generate_wod(user_email, excluded_exercises)
+        else:
+            coach_wod = self.coach_client.generate_wod(user_email, excluded_exercises)
+        logger.info(f"Coach microservice returned WOD with {len(coach_wod.get('exercises', []))} exercises")
         
-        response = requests.post(
-            f"{self.coach_service_url}/generate-wod",
-            json=payload,
-            timeout=10
+        # The coach did the heavy lifting, only map its picks to the catalog
+        exercises = self._map_coach_exercises(coach_wod.get("exercises", []))
+        if len(exercises) < 6:
+            # Some templates are not in our catalog, complete the workout with random exercises
+            exercises = select_wod_exercises(excluded_ids, already_selected=exercises)
+        return exercises
+    
+    def _enrich(self, exercise: Exercise) -> WodExerciseSchema:
+        """
+        Attach the muscle group impacts and the weight and reps suggestions to an exercise
+        """
+        intensity = calculate_intensity(exercise.difficulty)
+        return WodExerciseSchema(
+            id=exercise.id,
+            name=exercise.name,
+            description=exercise.description,
+            difficulty=exercise.difficulty,
+            muscle_groups=[
+                MuscleGroupImpact(
+                    id=mg.id,
+                    name=mg.name,
+                    body_part=mg.body_part,
+                    is_primary=mg.is_primary,
+                    # Higher intensity for primary muscle groups
+                    intensity=intensity * (1.2 if mg.is_primary else 0.8)
+                )
+                # The catalog already carries the muscle groups and whether they are primary
+                for mg in exercise.muscle_groups
+            ],
+            suggested_weight=random.uniform(5.0, 50.0),  # Random weight between 5 and 50 kg
+            suggested_reps=random.randint(8, 15)  # Random reps between 8 and 15
         )
-        response.raise_for_status()
-        
-        coach_wod = response.json()
-        logger.info(f"Coach microservice returned WOD with {len(coach_wod.get('exercises', []))} exercises")
-
-        # For now, still use legacy to get proper database objects
-        return legacy_request_wod(user_email)
     
-    def _get_exercise_names(self, exercise_ids: List[int]) -> List[str]:
+    def _map_coach_exercises(self, coach_exercises: List[dict]) -> List[Exercise]:
+        """
+        Find the catalog exercises matching the coach templates.
+        Templates are matched by name, their IDs belong to the coach and differ from ours.
+        """
+        catalog = get_catalog()
+        exercises = []
+        for template in coach_exercises:
+            exercise = catalog.by_name.get(normalize_name(template.get("name") or ""))
+            if exercise is None:
+                logger.info(f"Coach exercise {template.get('name')!r} is not in the catalog")
+            elif exercise not in exercises:
+                exercises.append(exercise)
+        return exercises
+    
+    def _get_exercise_names(self, exercise_ids: Set[int]) -> List[str]:
         """Get exercise names from IDs"""
-        if not exercise_ids:
-            return []
-            
-        db = db_session()
-        try:
-            exercises = db.query(ExerciseModel).filter(ExerciseModel.id.in_(exercise_ids)).all()
-            return [ex.name for ex in exercises]
-        finally:
-            db.close()
\ No newline at end of file
+        catalog = get_catalog()
+        return [catalog.by_id[exercise_id].name for exercise_id in exercise_ids if exercise_id in catalog.by_id]
@@ -1,15 +1,40 @@
 import pytest
 import os
 import tempfile
-from src.fit.app import app
-from src.fit.database import init_db, db_session
-from src.fit.models_db import Base
+
+# Run the test suite against a throwaway SQLite database unless one is provided
+_test_db_fd, _test_db_path = tempfile.mkstemp(suffix=".db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_test_db_path}")
+# Compute WODs inline, tests replace the heavy computation with a mock
+os.environ.setdefault("WOD_ENGINE_WORKERS", "0")
+# Cheap password hashes, the cost is measured by benchmarks/bench_password_hashing.py
+os.environ.setdefault("PASSWORD_SCRYPT_N", "1024")
+
+from src.fit.app import create_app
+from src.fit.database import init_db, db_session, engine
+from src.fit.models_db import Base, MuscleGroupModel, ExerciseModel, exercise_muscle_groups
+from src.fit.services.catalog_cache import bump_catalog_version
+from src.fit.services.recent_exercises import recent_exercises_cache
+from src.fit.services.auth_service import claims_cache
+from src.fit.blueprints.fitness import wod_of_the_day
+
+@pytest.fixture(autouse=True)
+def database():
+    # Give every test fresh tables and empty in-process caches
+    init_db()
+    bump_catalog_version()
+    wod_of_the_day.store.clear_memory()
+    recent_exercises_cache.clear()
+    claims_cache.clear()
+    yield
+    db_session.remove()
+    Base.metadata.drop_all(bind=engine)
 
 @pytest.fixture
 def client():
     # Create a temporary file to use as our database
     db_fd, db_path = tempfile.mkstemp()
-    app.config['TESTING'] = True
+    app = create_app({'TESTING': True})
     
     with app.test_client() as client:
         with app.app_context():
@@ -29,4 +54,77 @@ def db():
     
     # Teardown
     db.close()
-    Base.metadata.drop_all(bind=db.get_bind()) 
\ No newline at end of file
+    Base.metadata.drop_all(bind=db.get_bind())
+
+@pytest.fixture
+def seed_catalog():
+    """
+    Factory seeding a catalog of exercises, each linked to a primary
+    and a secondary muscle group
+    """
+    def seed(exercise_count: int = 10, muscle_group_count: int = 4):
+        db = db_session()
+        try:
+            db.add_all([
+                MuscleGroupModel(id=i, name=f"Muscle {i}", body_part=f"Part {i % 2}", description=f"Muscle group {i}")
+                for i in range(1, muscle_group_count + 1)
+            ])
+            db.add_all([
+                ExerciseModel(id=i, name=f"Exercise {i}", description=f"Exercise {i}", difficulty=i % 5 + 1, equipment="None", instructions="Do it")
+                for i in range(1, exercise_count + 1)
+            ])
+            db.flush()
+            db.execute(exercise_muscle_groups.insert(), [
+                {"exercise_id": i, "muscle_group_id": (i + offset) % muscle_group_count + 1, "is_primary": offset == 0}
+                for i in range(1, exercise_count + 1)
+                for offset in (0, 1)
+            ])
+            db.commit()
+        finally:
+            db.close()
+        bump_catalog_version()
+    
+    return seed
+
+@pytest.fixture
+def postgres_engine():
+    """
+    Engine of an empty PostgreSQL database given by TEST_POSTGRES_URL, which
+    is wiped before and after the test; the test is skipped without one
+    """
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    from sqlalchemy import text
+    from src.fit.database import create_db_engine
+    
+    pg_engine = create_db_engine(url)
+    def reset():
+        with pg_engine.begin() as connection:
+            connection.execute(text("DROP SCHEMA public CASCADE"))
+            connection.execute(text("CREATE SCHEMA public"))
+    
+    reset()
+    yield pg_engine
+    reset()
+    pg_engine.dispose()
+
+@pytest.fixture
+def count_queries():
+    """
+    Count the SQL statements executed while the returned counter is active
+    """
+    from sqlalchemy import event
+    
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def pytest_sessionfinish(session, exitstatus):
+    engine.dispose()
+    os.close(_test_db_fd)
+    os.unlink(_test_db_path)
@@ -0,0 +1,28 @@
+from unittest.mock import patch
+import pytest
+from src.fit import app as app_module
+
+
+@pytest.mark.parametrize("debug, run_main, started", [
+    ("false", None, True),
+    ("true", None, False),
+    ("true", "true", True),
+])
+def test_run_app_starts_the_background_jobs_in_the_serving_process(monkeypatch, debug, run_main, started):
+    monkeypatch.setenv("FLASK_DEBUG", debug)
+    if run_main:
+        monkeypatch.setenv("WERKZEUG_RUN_MAIN", run_main)
+    else:
+        monkeypatch.delenv("WERKZEUG_RUN_MAIN", raising=False)
+
+    with patch("src.fit.services.wod_of_the_day.WOD_PREGEN_ENABLED", True), \
+            patch("src.fit.services.wod_of_the_day.WODPregenerator") as pregenerator, \
+            patch("src.fit.services.history_storage.HISTORY_MAINTENANCE_ENABLED", True), \
+            patch("src.fit.services.history_storage.HistoryMaintenance") as maintenance, \
+            patch("src.fit.services.fitness_data_init.init_fitness_data"), \
+            patch("flask.Flask.run") as run:
+        app_module.run_app()
+
+    run.assert_called_once()
+    assert pregenerator.return_value.start.called == started
+    assert maintenance.return_value.start.called == started
@@ -0,0 +1,86 @@
+import datetime
+from unittest.mock import patch
+import jwt
+import pytest
+from flask import g, jsonify
+from src.fit.app import create_app
+from src.fit.services.auth_service import (
+    ClaimsCache, claims_cache, create_access_token, jwt_required, admin_required, SECRET_KEY
+)
+
+
+@pytest.fixture
+def app():
+    app = create_app({'TESTING': True})
+
+    @app.route("/test/claims")
+    @jwt_required
+    def claims():
+        return jsonify(dict(g.claims))
+
+    @app.route("/test/admin")
+    @admin_required
+    def admin():
+        return jsonify({"user": g.user_email})
+
+    @app.route("/test/public")
+    def public():
+        return jsonify({"claims": g.claims is not None, "error": g.auth_error})
+
+    return app
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+def test_token_is_verified_once(app):
+    client = app.test_client()
+    token = create_access_token({"sub": "user@test.com", "role": "user"})
+
+    with patch("src.fit.services.auth_service.jwt.decode", wraps=jwt.decode) as decode:
+        responses = [client.get("/test/claims", headers=bearer(token)) for _ in range(5)]
+
+    assert decode.call_count == 1
+    assert all(response.status_code == 200 for response in responses)
+    assert responses[-1].get_json()["sub"] == "user@test.com"
+    assert claims_cache.stats()["hits"] == 4
+
+def test_cached_claims_expire_with_the_token(app):
+    client = app.test_client()
+    token = create_access_token({"sub": "user@test.com"}, datetime.timedelta(minutes=5))
+    assert client.get("/test/claims", headers=bearer(token)).status_code == 200
+
+    later = datetime.datetime.now(datetime.UTC).timestamp() + 600
+    with patch("src.fit.services.auth_service.time", return_value=later), \
+            patch("jwt.api_jwt.datetime") as jwt_datetime:
+        jwt_datetime.now.return_value = datetime.datetime.fromtimestamp(later, datetime.UTC)
+        response = client.get("/test/claims", headers=bearer(token))
+
+    assert response.status_code == 401
+    assert response.get_json()["error"] == "Token expired"
+
+def test_rejected_requests(app):
+    client = app.test_client()
+    user_token = create_access_token({"sub": "user@test.com", "role": "user"})
+    forged = jwt.encode({"sub": "admin@test.com", "role": "admin"}, "not-the-secret", algorithm="HS256")
+
+    assert client.get("/test/claims").status_code == 401
+    assert client.get("/test/claims", headers={"Authorization": " "}).status_code == 401
+    assert client.get("/test/claims", headers={"Authorization": f"Token {user_token}"}).status_code == 401
+    assert client.get("/test/admin", headers=bearer(forged)).status_code == 401
+    assert client.get("/test/admin", headers=bearer(user_token)).status_code == 403
+    admin_token = jwt.encode({"sub": "admin@test.com", "role": "admin"}, SECRET_KEY, algorithm="HS256")
+    assert client.get("/test/admin", headers=bearer(admin_token)).get_json() == {"user": "admin@test.com"}
+
+    # Public endpoints see the outcome without being refused
+    assert client.get("/test/public", headers=bearer(forged)).get_json() == {"claims": False, "error": "Invalid token"}
+
+def test_claims_cache_is_bounded():
+    cache = ClaimsCache(max_entries=2)
+    for token in ("a", "b", "c"):
+        cache.put(token, {"sub": token})
+
+    assert cache.get("a") is None
+    assert cache.get("c")["sub"] == "c"
+    assert cache.stats()["entries"] == 2
+    with pytest.raises(TypeError):
+        cache.get("c")["sub"] = "someone else"
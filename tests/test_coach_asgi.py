@@ -0,0 +1,58 @@
+import asyncio
+import json
+from time import perf_counter
+from unittest.mock import patch
+from src.coach.app import asgi_app
+
+
+async def call(method, path, body=b""):
+    """
+    Send one request through the ASGI app and return (status, decoded JSON)
+    """
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi_app({"type": "http", "method": method, "path": path}, receive, send)
+    return sent[0]["status"], json.loads(sent[1]["body"])
+
+def test_generate_wod_excludes_exercises():
+    body = json.dumps({"user_email": "user@test.com", "excluded_exercises": ["push-ups", "Plank"]}).encode()
+    with patch("src.coach.app.simulated_latency", return_value=0):
+        status, wod = asyncio.run(call("POST", "/generate-wod", body))
+
+    assert status == 200
+    assert wod["user_email"] == "user@test.com"
+    assert {ex["name"] for ex in wod["exercises"]} == {"Squats", "Pull-ups", "Burpees", "Lunges"}
+
+def test_rejects_bad_requests():
+    async def scenario():
+        return [
+            await call("POST", "/generate-wod", b"not json"),
+            await call("GET", "/generate-wod"),
+            await call("GET", "/nope"),
+            await call("GET", "/health"),
+        ]
+
+    statuses = [status for status, _ in asyncio.run(scenario())]
+    assert statuses == [400, 405, 404, 200]
+
+def test_latency_does_not_serialize_requests():
+    body = json.dumps({"user_email": "user@test.com"}).encode()
+
+    async def scenario():
+        return await asyncio.gather(*(call("POST", "/generate-wod", body) for _ in range(500)))
+
+    with patch("src.coach.app.simulated_latency", return_value=0.2):
+        start = perf_counter()
+        responses = asyncio.run(scenario())
+        elapsed = perf_counter() - start
+
+    assert all(status == 200 for status, _ in responses)
+    # 500 requests waiting 0.2s each, overlapped on a single thread
+    assert elapsed < 2
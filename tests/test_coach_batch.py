@@ -0,0 +1,86 @@
+import threading
+from unittest.mock import patch
+import pytest
+from src.coach.app import app as coach_app, MAX_BATCH_SIZE
+from src.fit.services.coach_batcher import CoachBatcher
+
+
+def echo_batch(calls):
+    """
+    A fake batch call answering every request with its own user
+    """
+    def generate_batch(wod_requests):
+        calls.append(len(wod_requests))
+        return [{"user_email": item["user_email"]} for item in wod_requests]
+    return generate_batch
+
+def run_concurrently(batcher, users):
+    results = {}
+    start = threading.Barrier(len(users))
+
+    def request(user):
+        start.wait()
+        try:
+            results[user] = batcher.generate_wod(user, [])
+        except Exception as e:
+            results[user] = e
+
+    threads = [threading.Thread(target=request, args=(user,)) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_concurrent_requests_share_a_batch_call():
+    calls = []
+    batcher = CoachBatcher(echo_batch(calls), window=0.2, max_size=50)
+    users = [f"user{i}@test.com" for i in range(20)]
+
+    results = run_concurrently(batcher, users)
+
+    assert calls == [20]
+    assert all(results[user] == {"user_email": user} for user in users)
+    assert batcher.stats()["largest_batch"] == 20
+
+def test_full_batch_is_sent_without_waiting():
+    calls = []
+    batcher = CoachBatcher(echo_batch(calls), window=30, max_size=5)
+
+    results = run_concurrently(batcher, [f"user{i}@test.com" for i in range(10)])
+
+    assert calls == [5, 5]
+    assert len(results) == 10
+
+def test_batch_failure_reaches_every_caller():
+    batcher = CoachBatcher(lambda wod_requests: 1 / 0, window=0.2)
+
+    results = run_concurrently(batcher, ["a@test.com", "b@test.com"])
+
+    assert all(isinstance(error, ZeroDivisionError) for error in results.values())
+
+@pytest.fixture
+def coach_client():
+    with patch("src.coach.app.time.sleep") as sleep:
+        yield coach_app.test_client(), sleep
+
+def test_coach_batch_endpoint(coach_client):
+    client, sleep = coach_client
+    response = client.post("/generate-wod/batch", json={"requests": [
+        {"user_email": "a@test.com", "excluded_exercises": ["Plank"]},
+        {"user_email": "b@test.com"},
+    ]})
+
+    assert response.status_code == 200
+    wods = response.get_json()["wods"]
+    assert [wod["user_email"] for wod in wods] == ["a@test.com", "b@test.com"]
+    assert "Plank" not in [ex["name"] for ex in wods[0]["exercises"]]
+    # The latency is paid once per batch
+    sleep.assert_called_once()
+
+def test_coach_batch_endpoint_validation(coach_client):
+    client, _ = coach_client
+    too_many = {"requests": [{"user_email": "a@test.com"}] * (MAX_BATCH_SIZE + 1)}
+
+    assert client.post("/generate-wod/batch", json={"requests": "a@test.com"}).status_code == 400
+    assert client.post("/generate-wod/batch", json=too_many).status_code == 400
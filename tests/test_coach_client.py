@@ -0,0 +1,52 @@
+from unittest.mock import patch
+import pytest
+import requests
+from src.fit.services.coach_client import CircuitBreaker, CoachClient, CoachUnavailable, CLOSED, OPEN, HALF_OPEN
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+    for _ in range(3):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.stats()["short_circuited"] == 1
+
+def test_breaker_half_opens_with_a_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.stats()["closed"] == 1
+
+def test_client_short_circuits_when_coach_is_down():
+    # Nothing listens on port 1, connections are refused right away
+    client = CoachClient("http://127.0.0.1:1", breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            client.generate_wod("user@test.com", [])
+
+    with patch.object(client.session, "post") as post:
+        with pytest.raises(CoachUnavailable):
+            client.generate_wod("user@test.com", [])
+        post.assert_not_called()
+
+    assert client.stats()["breaker"]["state"] == OPEN
@@ -0,0 +1,60 @@
+import threading
+from unittest.mock import patch
+import pytest
+from werkzeug.serving import make_server
+from src.coach.app import app as coach_app
+from src.fit.services.coach_client import CoachReplicaPool, CoachUnavailable
+
+
+@pytest.fixture
+def coach_url():
+    """
+    Run a coach replica on a free port, without its simulated latency
+    """
+    server = make_server("127.0.0.1", 0, coach_app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    with patch("src.coach.app.time.sleep"):
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_port}"
+        server.shutdown()
+    thread.join()
+
+def test_routes_around_unhealthy_replica(coach_url):
+    # Nothing listens on port 1
+    pool = CoachReplicaPool([coach_url, "http://127.0.0.1:1"], health_interval=0)
+    try:
+        pool.check_health()
+        live, dead = pool.replicas
+        assert live.healthy and not dead.healthy
+
+        for _ in range(5):
+            wod = pool.generate_wod("user@test.com", ["Push-ups"])
+            assert "Push-ups" not in [ex["name"] for ex in wod["exercises"]]
+        assert (live.requests, dead.requests) == (5, 0)
+
+        # Readmitted once its health check passes again
+        with patch.object(dead.client, "health", return_value=True):
+            pool.check_health()
+        assert dead.healthy
+    finally:
+        pool.close()
+
+def test_retries_unreachable_replica(coach_url):
+    pool = CoachReplicaPool(["http://127.0.0.1:1", coach_url], health_interval=0)
+    try:
+        with patch("src.fit.services.coach_client.random.sample", side_effect=lambda replicas, k: replicas):
+            assert pool.generate_wod("user@test.com", [])["exercises"]
+        assert [replica.outstanding for replica in pool.replicas] == [0, 0]
+    finally:
+        pool.close()
+
+def test_prefers_least_outstanding_replica():
+    pool = CoachReplicaPool(["http://coach-1", "http://coach-2"], health_interval=0)
+    busy, idle = pool.replicas
+    busy.outstanding = 3
+
+    assert pool._choose([]) is idle
+
+    busy.healthy = idle.healthy = False
+    with pytest.raises(CoachUnavailable):
+        pool._choose([])
@@ -0,0 +1,52 @@
+import pytest
+from src.coach.app import TemplateIndex, build_wod
+
+
+def make_templates(count, muscle_group_count=10):
+    return [
+        {
+            "id": i,
+            "name": f"Exercise {i}",
+            "muscle_groups": [f"group {i % muscle_group_count}", f"group {(i + 1) % muscle_group_count}"],
+            "equipment": "kettlebell" if i % 3 == 0 else "bodyweight",
+        }
+        for i in range(count)
+    ]
+
+@pytest.fixture
+def index():
+    return TemplateIndex(make_templates(100))
+
+def test_excludes_names_ignoring_case_and_spaces(index):
+    excluded = [f"  exercise   {i}" for i in range(90)] + ["EXERCISE 95", "not a template"]
+
+    for _ in range(20):
+        names = {template["name"] for template in index.select(excluded, count=6)}
+        assert len(names) == 6
+        assert names <= {f"Exercise {i}" for i in (90, 91, 92, 93, 94, 96, 97, 98, 99)}
+
+def test_returns_what_is_left(index):
+    excluded = [f"Exercise {i}" for i in range(97)]
+
+    assert {t["name"] for t in index.select(excluded, count=6)} == {"Exercise 97", "Exercise 98", "Exercise 99"}
+
+def test_covers_distinct_muscle_groups(index):
+    for _ in range(20):
+        templates = index.select(["Exercise 1", "Exercise 2"], count=6, cover_muscle_groups=6)
+        covered = {group for template in templates for group in template["muscle_groups"]}
+        assert len(templates) == 6
+        assert len(covered) >= 6
+
+def test_filters_equipment(index):
+    templates = index.select(count=10, equipment=["kettlebell"], cover_muscle_groups=3)
+
+    assert len(templates) == 10
+    assert {template["equipment"] for template in templates} == {"kettlebell"}
+
+def test_build_wod_validates_constraints():
+    assert len(build_wod({"user_email": "a@test.com", "count": 3})["exercises"]) == 3
+
+    for body in ({"count": 0}, {"count": "6"}, {"cover_muscle_groups": -1}, {"equipment": "bodyweight"},
+                 {"excluded_exercises": "Plank"}):
+        with pytest.raises(ValueError):
+            build_wod(body)
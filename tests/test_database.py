@@ -0,0 +1,134 @@
+import json
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, event, insert, inspect, select, text
+from sqlalchemy.exc import IntegrityError, TimeoutError as PoolTimeoutError
+from src.fit.app import create_app
+from src.fit import database
+from src.fit.database import engine, MeteredQueuePool, pool_metrics, get_pool_metrics, DB_MAX_OVERFLOW
+from src.fit.services.user_service import get_user_profile, get_all_users
+from src.fit.db_migrations import create_missing_indexes, _invalid_indexes
+from src.fit.models_db import Base, UserModel, ExerciseModel, UserExerciseHistoryModel
+from src.fit.services.fitness_coach_service import get_recent_exercises
+
+RECENT_EXERCISES_INDEX = "ix_user_exercise_history_user_performed_exercise"
+
+
+@pytest.fixture
+def checkouts():
+    count = []
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        count.append(connection_record)
+    
+    event.listen(engine, "checkout", on_checkout)
+    yield count
+    event.remove(engine, "checkout", on_checkout)
+
+def test_request_reuses_one_connection(checkouts):
+    app = create_app({'TESTING': True})
+
+    with app.test_request_context():
+        get_user_profile("nobody@test.com")
+        get_all_users()
+        get_recent_exercises("nobody@test.com")
+        assert len(checkouts) == 1
+
+    # Outside of a request each unit of work releases its connection
+    get_user_profile("nobody@test.com")
+    get_all_users()
+    assert len(checkouts) == 3
+
+def test_pool_timeouts_are_counted(tmp_path):
+    metered_engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=MeteredQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05
+    )
+    pool_metrics.reset()
+    try:
+        with metered_engine.connect():
+            with pytest.raises(PoolTimeoutError):
+                metered_engine.connect()
+        
+        metrics = pool_metrics.snapshot()
+        assert metrics["checkouts"] == 1
+        assert metrics["timeouts"] == 1
+        assert metrics["max_wait_seconds"] >= 0.05
+    finally:
+        metered_engine.dispose()
+        pool_metrics.reset()
+
+def test_pool_metrics_report_the_configured_pool(tmp_path, monkeypatch):
+    metered_engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=MeteredQueuePool,
+        pool_size=2,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=1
+    )
+    monkeypatch.setattr(database, "_engine", metered_engine)
+    try:
+        metrics = get_pool_metrics()
+    finally:
+        metered_engine.dispose()
+
+    assert metrics["pool"] == "MeteredQueuePool"
+    assert metrics["size"] == 2
+    assert metrics["max_overflow"] == DB_MAX_OVERFLOW
+
+def test_db_metrics_endpoint():
+    client = create_app({'TESTING': True}).test_client()
+
+    data = json.loads(client.get('/metrics/db').data)
+
+    assert {"pool", "checkouts", "timeouts", "total_wait_seconds"} <= set(data)
+
+def test_recent_exercises_use_covering_index():
+    query = select(UserExerciseHistoryModel.exercise_id).where(
+        UserExerciseHistoryModel.user_email == "user@test.com",
+        UserExerciseHistoryModel.performed_at >= datetime(2025, 1, 1)
+    ).distinct()
+    compiled = query.compile(engine, compile_kwargs={"literal_binds": True})
+
+    with engine.connect() as connection:
+        plan = " ".join(row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+
+    assert f"USING COVERING INDEX {RECENT_EXERCISES_INDEX}" in plan
+
+def test_missing_indexes_are_created_on_existing_tables():
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP INDEX {RECENT_EXERCISES_INDEX}"))
+
+    assert create_missing_indexes(engine) == [RECENT_EXERCISES_INDEX]
+    assert create_missing_indexes(engine) == []
+    index_names = {index["name"] for index in inspect(engine).get_indexes("user_exercise_history")}
+    assert RECENT_EXERCISES_INDEX in index_names
+
+def test_missing_indexes_are_built_concurrently_on_postgres(postgres_engine):
+    # An unpartitioned history table, as created before partitioning
+    Base.metadata.create_all(bind=postgres_engine)
+    with postgres_engine.begin() as connection:
+        connection.execute(text(f"DROP INDEX {RECENT_EXERCISES_INDEX}"))
+        connection.execute(insert(UserModel).values(email="a@test.com", name="A", role="user", password_hash="x"))
+        connection.execute(insert(ExerciseModel).values(id=1, name="Squat", difficulty=1))
+        connection.execute(insert(UserExerciseHistoryModel), [
+            {"user_email": "a@test.com", "exercise_id": 1, "performed_at": datetime(2025, 1, day)} for day in (1, 2)
+        ])
+    # An interrupted concurrent build leaves an invalid index behind
+    with postgres_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        with pytest.raises(IntegrityError):
+            connection.execute(text(
+                f"CREATE UNIQUE INDEX CONCURRENTLY {RECENT_EXERCISES_INDEX} ON user_exercise_history (user_email)"
+            ))
+    assert _invalid_indexes(postgres_engine, "user_exercise_history") == [RECENT_EXERCISES_INDEX]
+
+    assert create_missing_indexes(postgres_engine) == [RECENT_EXERCISES_INDEX]
+    assert _invalid_indexes(postgres_engine, "user_exercise_history") == []
+    assert create_missing_indexes(postgres_engine) == []
+
+    # The models' indexes still create inside a transaction
+    assert not any(index.dialect_options["postgresql"]["concurrently"] for index in UserExerciseHistoryModel.__table__.indexes)
+    Base.metadata.drop_all(bind=postgres_engine)
+    Base.metadata.create_all(bind=postgres_engine)
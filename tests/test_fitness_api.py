@@ -0,0 +1,133 @@
+import unittest
+import json
+import pytest
+from src.fit.app import create_app
+from src.fit.database import db_session
+from src.fit.models_db import ExerciseModel
+from src.fit.services.catalog_cache import get_catalog, bump_catalog_version
+
+
+class TestFitnessAPI(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _fixtures(self, seed_catalog, count_queries):
+        self.seed_catalog = seed_catalog
+        self.queries = count_queries
+
+    def setUp(self):
+        self.app = create_app({'TESTING': True})
+        self.client = self.app.test_client()
+
+    def test_get_exercises_includes_muscle_groups(self):
+        self.seed_catalog(exercise_count=3)
+
+        response = self.client.get('/fitness/exercises')
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual([ex['id'] for ex in data], [1, 2, 3])
+        for exercise in data:
+            self.assertEqual(len(exercise['muscle_groups']), 2)
+            self.assertEqual(sum(mg['is_primary'] for mg in exercise['muscle_groups']), 1)
+
+    def test_get_exercises_query_count_does_not_grow_with_catalog(self):
+        self.seed_catalog(exercise_count=50)
+
+        self.queries.clear()
+        response = self.client.get('/fitness/exercises')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.data)), 50)
+        self.assertLessEqual(len(self.queries), 2)
+
+    def test_get_exercises_by_muscle_group_keeps_all_muscle_groups(self):
+        self.seed_catalog(exercise_count=8, muscle_group_count=4)
+
+        self.queries.clear()
+        response = self.client.get('/fitness/exercises?muscle_group_id=2')
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertTrue(data)
+        for exercise in data:
+            self.assertIn(2, [mg['id'] for mg in exercise['muscle_groups']])
+            self.assertEqual(len(exercise['muscle_groups']), 2)
+        self.assertLessEqual(len(self.queries), 2)
+
+    def test_get_exercise_by_id(self):
+        self.seed_catalog(exercise_count=3)
+
+        response = self.client.get('/fitness/exercises/2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['name'], 'Exercise 2')
+
+        response = self.client.get('/fitness/exercises/99')
+        self.assertEqual(response.status_code, 404)
+
+    def test_catalog_is_served_from_memory_until_version_bump(self):
+        self.seed_catalog(exercise_count=3)
+        self.client.get('/fitness/exercises')
+
+        self.queries.clear()
+        self.assertEqual(self.client.get('/fitness/exercises').status_code, 200)
+        self.assertEqual(self.client.get('/fitness/exercises/1').status_code, 200)
+        self.assertEqual(self.client.get('/fitness/exercises?muscle_group_id=1').status_code, 200)
+        self.assertEqual(self.queries, [])
+
+        db = db_session()
+        db.add(ExerciseModel(id=4, name="Exercise 4", difficulty=1))
+        db.commit()
+        db.close()
+        self.assertEqual(self.client.get('/fitness/exercises/4').status_code, 404)
+
+        bump_catalog_version()
+        self.assertEqual(self.client.get('/fitness/exercises/4').status_code, 200)
+
+    def test_catalog_indexes(self):
+        self.seed_catalog(exercise_count=6, muscle_group_count=4)
+
+        catalog = get_catalog()
+
+        self.assertEqual(len(catalog.exercises), 6)
+        self.assertEqual(sorted(catalog.muscle_groups), [1, 2, 3, 4])
+        self.assertEqual(catalog.by_id[5].name, "Exercise 5")
+        self.assertEqual(
+            sorted(catalog.by_body_part),
+            sorted({mg.body_part for mg in catalog.muscle_groups.values()})
+        )
+        for body_part, exercises in catalog.by_body_part.items():
+            self.assertEqual(len(exercises), len({ex.id for ex in exercises}))
+        with self.assertRaises(TypeError):
+            catalog.by_id[7] = catalog.by_id[5]
+
+    def test_get_exercises_etag_and_not_modified(self):
+        self.seed_catalog(exercise_count=3)
+
+        response = self.client.get('/fitness/exercises')
+        etag = response.headers['ETag']
+        self.assertFalse(etag.startswith('W/'))
+
+        response = self.client.get('/fitness/exercises', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+
+        # As sent back by clients behind a proxy that weakened the ETag
+        response = self.client.get('/fitness/exercises', headers={'If-None-Match': f'W/{etag}'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+
+        response = self.client.get('/fitness/exercises/1', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+        db = db_session()
+        db.add(ExerciseModel(id=4, name="Exercise 4", difficulty=1))
+        db.commit()
+        db.close()
+        bump_catalog_version()
+
+        response = self.client.get('/fitness/exercises', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(len(json.loads(response.data)), 4)
+
+if __name__ == '__main__':
+    unittest.main()
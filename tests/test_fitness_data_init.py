@@ -0,0 +1,59 @@
+import hashlib
+from sqlalchemy import text
+from src.fit.database import db_session, engine
+from src.fit.models_db import ExerciseModel, SeedVersionModel, UserModel, UserExerciseHistoryModel
+from src.fit.services.fitness_data_init import init_fitness_data, catalog_seed_path, split_sql_statements, CATALOG_SEED
+
+
+def catalog_ids():
+    with engine.connect() as connection:
+        return dict(connection.execute(text("SELECT name, id FROM exercises")).all())
+
+def test_split_sql_statements():
+    script = (
+        "-- comment; not a statement\n"
+        "INSERT INTO t VALUES ('a;b', 'c--d'); -- trailing; comment\n"
+        "\n"
+        "DELETE FROM t -- until the end; of the line\n"
+        "WHERE id = 1"
+    )
+
+    assert split_sql_statements(script) == ["INSERT INTO t VALUES ('a;b', 'c--d')", "DELETE FROM t \nWHERE id = 1"]
+
+def test_seed_is_applied_once(count_queries):
+    assert init_fitness_data()
+    ids = catalog_ids()
+    assert len(ids) == 20
+
+    count_queries.clear()
+    assert init_fitness_data()
+
+    # A restart only reads the checksum
+    assert len(count_queries) == 1
+    assert catalog_ids() == ids
+
+def test_changed_seed_is_upserted_without_touching_history(tmp_path):
+    assert init_fitness_data()
+    ids = catalog_ids()
+    db = db_session()
+    db.add(UserModel(email="user@test.com", name="User", role="user", password_hash="x"))
+    db.add(UserExerciseHistoryModel(user_email="user@test.com", exercise_id=ids["Squats"]))
+    db.commit()
+    db.close()
+
+    with open(catalog_seed_path()) as f:
+        script = f.read()
+    changed = tmp_path / "seed.sql"
+    changed.write_text(script.replace(
+        "'A compound exercise primarily for the quadriceps and glutes', 3",
+        "'The king of leg exercises', 4"
+    ))
+    assert init_fitness_data(str(changed))
+
+    db = db_session()
+    squats = db.get(ExerciseModel, ids["Squats"])
+    assert (squats.description, squats.difficulty) == ("The king of leg exercises", 4)
+    assert db.query(UserExerciseHistoryModel).count() == 1
+    assert db.get(SeedVersionModel, CATALOG_SEED).checksum == hashlib.sha256(changed.read_bytes()).hexdigest()
+    db.close()
+    assert catalog_ids() == ids
@@ -0,0 +1,147 @@
+import datetime
+from sqlalchemy import func, insert, select, text
+from src.fit.database import Base, db_session, engine
+from src.fit.models_db import UserModel, ExerciseModel, UserExerciseHistoryModel, UserExerciseAggregateModel
+from src.fit.services.history_storage import (
+    RollingHistoryStorage, PartitionedHistoryStorage, HistoryMaintenance, partition_start
+)
+from src.fit.services.fitness_coach_service import get_recent_exercises, save_exercise_history
+
+NOW = datetime.datetime(2025, 6, 18, 12, 0)
+
+
+def add_history(user_email, exercise_id, days_ago, weight=10.0, reps=10):
+    db = db_session()
+    db.execute(insert(UserExerciseHistoryModel).values(
+        user_email=user_email,
+        exercise_id=exercise_id,
+        performed_at=NOW - datetime.timedelta(days=days_ago),
+        suggested_weight=weight,
+        suggested_reps=reps
+    ))
+    db.commit()
+    db.close()
+
+def test_partitions_are_aligned_on_mondays():
+    assert partition_start(datetime.date(2025, 6, 18)) == datetime.date(2025, 6, 16)
+    assert partition_start(datetime.date(2025, 6, 16)) == datetime.date(2025, 6, 16)
+    assert partition_start(datetime.date(2025, 6, 15)) == datetime.date(2025, 6, 9)
+
+def test_retention_rolls_old_history_up():
+    storage = RollingHistoryStorage(engine, partition_days=7, retention_days=30)
+    add_history("a@test.com", 1, days_ago=100, weight=20.0, reps=5)
+    add_history("a@test.com", 1, days_ago=50, weight=10.0, reps=10)
+    add_history("a@test.com", 2, days_ago=40)
+    add_history("a@test.com", 1, days_ago=1)
+    add_history("b@test.com", 1, days_ago=2)
+
+    result = storage.run_retention(NOW)
+
+    assert result["rows"] == 3
+    assert result["boundary"] == "2025-05-19T00:00:00"
+    db = db_session()
+    remaining = db.query(UserExerciseHistoryModel.performed_at).all()
+    aggregates = {(row.user_email, row.exercise_id): row for row in db.query(UserExerciseAggregateModel)}
+    db.close()
+    assert len(remaining) == 2
+    assert set(aggregates) == {("a@test.com", 1), ("a@test.com", 2)}
+    squats = aggregates[("a@test.com", 1)]
+    assert (squats.times_performed, squats.total_reps, squats.total_volume) == (2, 15, 200.0)
+    assert squats.first_performed_at == NOW - datetime.timedelta(days=100)
+    assert squats.last_performed_at == NOW - datetime.timedelta(days=50)
+
+    # Nothing left to roll up, and later runs add to the aggregates
+    assert storage.run_retention(NOW)["rows"] == 0
+    add_history("a@test.com", 1, days_ago=200, weight=1.0, reps=1)
+    storage.run_retention(NOW)
+    db = db_session()
+    squats = db.get(UserExerciseAggregateModel, ("a@test.com", 1))
+    assert (squats.times_performed, squats.total_reps, squats.total_volume) == (3, 16, 201.0)
+    assert squats.first_performed_at == NOW - datetime.timedelta(days=200)
+    db.close()
+
+def test_retention_keeps_the_wod_window():
+    storage = RollingHistoryStorage(engine, partition_days=7, retention_days=0)
+    save_exercise_history("a@test.com", 3, 10.0, 10)
+
+    storage.run_retention()
+
+    assert get_recent_exercises("a@test.com") == [3]
+
+def test_maintenance_run():
+    add_history("a@test.com", 1, days_ago=400)
+
+    result = HistoryMaintenance(RollingHistoryStorage(engine)).run_once()
+
+    assert result["created_partitions"] == []
+    assert result["rows"] == 1
+
+def prepare_postgres(postgres_engine) -> PartitionedHistoryStorage:
+    storage = PartitionedHistoryStorage(postgres_engine, partition_days=7, retention_days=30, partitions_ahead=2)
+    storage.prepare()
+    Base.metadata.create_all(bind=postgres_engine)
+    with postgres_engine.begin() as connection:
+        connection.execute(insert(UserModel).values(email="a@test.com", name="A", role="user", password_hash="x"))
+        connection.execute(insert(ExerciseModel).values(id=1, name="Squat", difficulty=1))
+    return storage
+
+def partition_rows(connection, storage):
+    return {
+        name: connection.execute(text(f"SELECT COUNT(*) FROM {name}")).scalar()
+        for name, _ in storage._partitions(connection)
+    }
+
+def test_partitions_are_created_on_every_start(postgres_engine):
+    storage = prepare_postgres(postgres_engine)
+    with postgres_engine.connect() as connection:
+        partitions = sorted(name for name, end in storage._partitions(connection) if end is not None)
+    assert len(partitions) == 3
+
+    with postgres_engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE {partitions[-1]}"))
+    storage.prepare()
+
+    with postgres_engine.connect() as connection:
+        assert sorted(name for name, end in storage._partitions(connection) if end is not None) == partitions
+
+def test_new_partitions_take_the_rows_of_the_default_partition(postgres_engine):
+    storage = prepare_postgres(postgres_engine)
+    later = datetime.datetime.utcnow() + datetime.timedelta(days=60)
+    with postgres_engine.begin() as connection:
+        connection.execute(insert(UserExerciseHistoryModel), [
+            {"user_email": "a@test.com", "exercise_id": 1, "performed_at": later + datetime.timedelta(days=days)}
+            for days in (0, 7, 400)
+        ])
+
+    created = storage.ensure_partitions(later.date())
+
+    assert storage.partition_name(partition_start(later.date())) in created
+    with postgres_engine.connect() as connection:
+        rows = partition_rows(connection, storage)
+        assert rows[storage.DEFAULT_PARTITION] == 1
+        assert rows[storage.partition_name(partition_start(later.date()))] == 1
+        assert rows[storage.partition_name(partition_start((later + datetime.timedelta(days=7)).date()))] == 1
+        assert connection.execute(select(func.count()).select_from(UserExerciseHistoryModel)).scalar() == 3
+        # The default partition is attached again
+        assert storage.DEFAULT_PARTITION in rows
+
+def test_retention_drops_expired_partitions_on_postgres(postgres_engine):
+    storage = prepare_postgres(postgres_engine)
+    today = datetime.datetime.utcnow().date()
+    with postgres_engine.begin() as connection:
+        storage._create_partitions(connection, today - datetime.timedelta(days=60), today)
+        connection.execute(insert(UserExerciseHistoryModel), [
+            {"user_email": "a@test.com", "exercise_id": 1, "performed_at": datetime.datetime.utcnow() - datetime.timedelta(days=days),
+             "suggested_weight": 10.0, "suggested_reps": 10}
+            for days in (50, 45, 1)
+        ])
+
+    result = storage.run_retention()
+
+    assert result["rows"] == 2
+    with postgres_engine.connect() as connection:
+        assert connection.execute(select(func.count()).select_from(UserExerciseHistoryModel)).scalar() == 1
+        squats = connection.execute(select(UserExerciseAggregateModel)).one()
+        assert (squats.times_performed, squats.total_reps, squats.total_volume) == (2, 20, 200.0)
+        boundary = datetime.datetime.fromisoformat(result["boundary"])
+        assert all(end is None or end > boundary for _, end in storage._partitions(connection))
@@ -0,0 +1,130 @@
+import os
+import time
+import datetime
+import jwt
+from unittest.mock import MagicMock, patch
+import pytest
+from flask import jsonify
+from src.fit.app import create_app
+from src.fit.services import instrumentation
+from src.fit.models_db import UserModel
+from src.fit.services.instrumentation import (
+    Histogram, SlowRequestProfiler, registry, http_request_seconds, db_queries_per_request, db_query_seconds,
+    coach_request_seconds
+)
+from src.fit.services.coach_client import CoachClient
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    registry.reset()
+    yield
+    registry.reset()
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_seconds", "Test", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, route='/a"b')
+
+    assert histogram.render() == [
+        "# HELP test_seconds Test",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{route="/a\\"b",le="0.1"} 2',
+        'test_seconds_bucket{route="/a\\"b",le="1.0"} 3',
+        'test_seconds_bucket{route="/a\\"b",le="+Inf"} 4',
+        'test_seconds_sum{route="/a\\"b"} 3.65',
+        'test_seconds_count{route="/a\\"b"} 4',
+    ]
+
+def test_requests_and_their_queries_are_measured(seed_catalog):
+    seed_catalog(exercise_count=3)
+    client = create_app({'TESTING': True}).test_client()
+
+    for exercise_id in (1, 2, 99):
+        client.get(f"/fitness/exercises/{exercise_id}")
+    client.get("/no/such/route")
+
+    route = "/fitness/exercises/<int:exercise_id>"
+    assert http_request_seconds.snapshot(method="GET", route=route, status=200)["count"] == 2
+    assert http_request_seconds.snapshot(method="GET", route=route, status=404)["count"] == 1
+    assert http_request_seconds.snapshot(method="GET", route="unmatched", status=404)["count"] == 1
+    queries = db_queries_per_request.snapshot(route=route)
+    assert queries["count"] == 3
+    # The catalog is loaded once, then served from memory
+    assert queries["sum"] >= 1
+
+    body = client.get("/metrics")
+    assert body.mimetype == "text/plain"
+    text = body.get_data(as_text=True)
+    assert f'fit_http_request_duration_seconds_count{{method="GET",route="{route}",status="200"}} 2' in text
+    assert f'fit_db_queries_per_request_count{{route="{route}"}} 3' in text
+    assert "# TYPE fit_db_query_duration_seconds histogram" in text
+    assert "# TYPE fit_db_pool_checkouts gauge" in text
+
+def test_queries_of_the_wod_job_count_towards_the_waiting_request(seed_catalog, db, count_queries):
+    seed_catalog(exercise_count=12)
+    db.add(UserModel(email="user@test.com", name="Test User", role="user", password_hash="x"))
+    db.commit()
+    now = datetime.datetime.now(datetime.UTC)
+    token = jwt.encode(
+        {"sub": "user@test.com", "name": "Test User", "role": "user", "iss": "fit-api", "iat": now, "exp": now + datetime.timedelta(days=1)},
+        "fit-secret-key", algorithm="HS256"
+    )
+    client = create_app({'TESTING': True}).test_client()
+    background = db_query_seconds.snapshot(route="background")["count"]
+    count_queries.clear()
+
+    with patch('src.fit.services.fitness_coach_service.heavy_computation'):
+        response = client.get("/fitness/wod", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    # The WOD is generated on a job worker thread while the request waits
+    queries = db_queries_per_request.snapshot(route="/fitness/wod")
+    assert queries["count"] == 1
+    assert queries["sum"] == len(count_queries) > 1
+    assert db_query_seconds.snapshot(route="/fitness/wod")["count"] == len(count_queries)
+    assert db_query_seconds.snapshot(route="background")["count"] == background
+
+def test_coach_calls_are_timed():
+    client = CoachClient("http://coach")
+    response = MagicMock()
+    response.json.return_value = {"exercises": []}
+
+    with patch.object(client.session, "post", return_value=response):
+        client.generate_wod("user@test.com", [])
+    with patch.object(client.session, "post", side_effect=ConnectionError("down")):
+        with pytest.raises(ConnectionError):
+            client.generate_wod("user@test.com", [])
+
+    assert coach_request_seconds.snapshot(path="/generate-wod", outcome="ok")["count"] == 1
+    assert coach_request_seconds.snapshot(path="/generate-wod", outcome="error")["count"] == 1
+
+def test_slow_requests_dump_folded_stacks(tmp_path, monkeypatch):
+    profiler = SlowRequestProfiler(threshold=0.02, interval=0.001, directory=str(tmp_path))
+    monkeypatch.setattr(instrumentation, "slow_request_profiler", profiler)
+    app = create_app({'TESTING': True})
+
+    def busy_wait(seconds):
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            pass
+
+    @app.route("/test/slow")
+    def slow():
+        busy_wait(0.1)
+        return jsonify({})
+
+    @app.route("/test/fast")
+    def fast():
+        return jsonify({})
+
+    client = app.test_client()
+    client.get("/test/fast")
+    client.get("/test/slow")
+
+    dumps = os.listdir(tmp_path)
+    assert len(dumps) == 1 and "-GET-test_slow-" in dumps[0]
+    stacks = (tmp_path / dumps[0]).read_text().splitlines()
+    assert stacks
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in stacks)
+    assert any(line.startswith("request;") and "busy_wait" in line for line in stacks)
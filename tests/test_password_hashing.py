@@ -0,0 +1,102 @@
+import hashlib
+import threading
+import pytest
+from src.fit.database import db_session
+from src.fit.models_db import UserModel
+from src.fit.services.password_hashing import (
+    PasswordVerifier, PasswordVerifierBusy, ScryptHasher, Pbkdf2Hasher, password_verifier
+)
+from src.fit.app import create_app
+
+
+@pytest.mark.parametrize("hasher", [ScryptHasher(n=1024), Pbkdf2Hasher(iterations=1000)])
+def test_salted_hashes(hasher):
+    encoded = hasher.hash("s3cret")
+
+    assert encoded.startswith(f"{hasher.algorithm}$")
+    assert encoded != hasher.hash("s3cret")
+    assert hasher.verify("s3cret", encoded)
+    assert not hasher.verify("S3cret", encoded)
+    assert not hasher.verify("s3cret", f"{hasher.algorithm}$garbage")
+
+def test_outdated_hashes_are_upgraded():
+    verifier = PasswordVerifier(ScryptHasher(n=2048), workers=0)
+    legacy = hashlib.sha256(b"s3cret").hexdigest()
+
+    for encoded in (legacy, ScryptHasher(n=1024).hash("s3cret"), Pbkdf2Hasher(iterations=1000).hash("s3cret")):
+        valid, new_hash = verifier.verify("s3cret", encoded)
+        assert valid
+        assert new_hash.startswith("scrypt$n=2048,")
+        assert verifier.verify("s3cret", new_hash) == (True, None)
+    assert verifier.verify("wrong", legacy) == (False, None)
+    assert verifier.verify("s3cret", "bcrypt$unknown") == (False, None)
+
+MALFORMED_HASHES = [
+    "scrypt$x=1$YWJj$YWJj",
+    "scrypt$n=1024,r=-1,p=1$YWJj$YWJj",
+    f"scrypt$n={2 ** 64},r=8,p=1$YWJj$YWJj",
+    "scrypt$n=1024,r=8,p=1$YWJj",
+    "scrypt$n=1024,r=8,p=1$!!$YWJj",
+    "pbkdf2_sha256$abc$YWJj$YWJj",
+    "pbkdf2_sha256$0$YWJj$YWJj",
+    "pbkdf2_sha256$99999999999999999999$YWJj$YWJj",
+    "pbkdf2_sha256",
+    "",
+]
+
+@pytest.mark.parametrize("encoded", MALFORMED_HASHES)
+def test_malformed_hashes_do_not_verify(encoded):
+    verifier = PasswordVerifier(ScryptHasher(n=1024), workers=0)
+
+    assert verifier.verify("s3cret", encoded) == (False, None)
+
+def test_login_with_a_malformed_stored_hash_is_refused():
+    db = db_session()
+    db.add(UserModel(email="broken@test.com", name="Broken", role="user", password_hash="scrypt$x=1$YWJj$YWJj"))
+    db.commit()
+    db.close()
+    client = create_app({'TESTING': True}).test_client()
+
+    assert client.post('/oauth/token', json={"email": "broken@test.com", "password": "s3cret"}).status_code == 401
+
+def test_legacy_hash_is_replaced_on_login():
+    db = db_session()
+    db.add(UserModel(email="old@test.com", name="Old", role="user", password_hash=hashlib.sha256(b"s3cret").hexdigest()))
+    db.commit()
+    db.close()
+    client = create_app({'TESTING': True}).test_client()
+
+    assert client.post('/oauth/token', json={"email": "old@test.com", "password": "wrong"}).status_code == 401
+    assert client.post('/oauth/token', json={"email": "old@test.com", "password": "s3cret"}).status_code == 200
+    db = db_session()
+    stored = db.get(UserModel, "old@test.com").password_hash
+    db.close()
+    assert stored.startswith("scrypt$")
+    assert client.post('/oauth/token', json={"email": "old@test.com", "password": "s3cret"}).status_code == 200
+    assert client.post('/oauth/token', json={"email": "nobody@test.com", "password": "s3cret"}).status_code == 401
+
+def test_busy_verifier_refuses_logins(monkeypatch):
+    verifier = PasswordVerifier(ScryptHasher(n=1024), workers=1, max_pending=1)
+    release = threading.Event()
+    monkeypatch.setattr(verifier, "_verify", lambda password, encoded: release.wait(5))
+    first = threading.Thread(target=verifier.verify, args=("a", "b"))
+    first.start()
+    try:
+        monkeypatch.setattr("src.fit.services.auth_service.password_verifier", verifier)
+        db = db_session()
+        db.add(UserModel(email="user@test.com", name="User", role="user", password_hash=password_verifier.hash("x")))
+        db.commit()
+        db.close()
+
+        response = create_app({'TESTING': True}).test_client().post(
+            '/oauth/token', json={"email": "user@test.com", "password": "x"}
+        )
+
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+        with pytest.raises(PasswordVerifierBusy):
+            verifier.verify("a", "b")
+    finally:
+        release.set()
+        first.join()
+        verifier.shutdown()
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+from src.fit.services.fitness_coach_service import get_recent_exercises, save_exercise_history_batch
+from src.fit.services.recent_exercises import RecentExercisesCache, recent_exercises_cache
+
+
+def test_hot_path_reads_no_history(count_queries):
+    save_exercise_history_batch("user@test.com", [(1, 10.0, 10), (2, 10.0, 10)])
+    assert sorted(get_recent_exercises("user@test.com")) == [1, 2]
+    count_queries.clear()
+
+    # Written through to the cached entry
+    save_exercise_history_batch("user@test.com", [(3, 10.0, 10)])
+    recent = get_recent_exercises("user@test.com")
+
+    assert sorted(recent) == [1, 2, 3]
+    assert not [statement for statement in count_queries if statement.startswith("SELECT")]
+    assert recent_exercises_cache.stats()["hits"] == 1
+
+def test_longer_look_back_reads_history(count_queries):
+    save_exercise_history_batch("user@test.com", [(1, 10.0, 10)])
+    get_recent_exercises("user@test.com")
+    count_queries.clear()
+
+    assert get_recent_exercises("user@test.com", days_back=7) == [1]
+    assert count_queries
+
+def test_entries_expire_with_the_window():
+    cache = RecentExercisesCache(window_days=3, ttl=0)
+    now = datetime.utcnow()
+    assert cache.get("user@test.com", now=now) == []
+
+    cache.record("user@test.com", [1], now - timedelta(days=2))
+    cache.record("user@test.com", [2], now)
+
+    assert sorted(cache.get("user@test.com", now=now)) == [1, 2]
+    assert cache.get("user@test.com", days_back=1, now=now) == [2]
+    assert cache.get("user@test.com", now=now + timedelta(days=2)) == [2]
+
+def test_least_recently_used_users_are_evicted():
+    cache = RecentExercisesCache(max_users=2, ttl=0)
+    for user in ("a@test.com", "b@test.com"):
+        cache.get(user)
+    cache.get("a@test.com")
+    cache.get("c@test.com")
+
+    cache.record("b@test.com", [1], datetime.utcnow())
+
+    assert cache.stats()["users"] == 2
+    assert cache.stats()["evictions"] == 1
+    # b was evicted, its write is left to its next load
+    assert cache.get("b@test.com") == []
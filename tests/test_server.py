@@ -0,0 +1,23 @@
+from src.fit import server
+
+
+def test_server_settings_can_be_overridden():
+    fit_server = server.FitServer({"workers": 3, "threads": 4, "bind": "127.0.0.1:0"})
+
+    assert fit_server.cfg.workers == 3
+    assert fit_server.cfg.threads == 4
+    assert fit_server.cfg.worker_class_str == "gthread"
+    assert fit_server.cfg.preload_app == server.WEB_PRELOAD
+
+def test_background_jobs_run_in_a_single_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(server.tempfile, "gettempdir", lambda: str(tmp_path))
+
+    first = server._claim_background_jobs("0.0.0.0:5000")
+    assert first is not None
+    assert server._claim_background_jobs("0.0.0.0:5000") is None
+
+    # Released when the worker holding it exits, its replacement takes over
+    first.close()
+    replacement = server._claim_background_jobs("0.0.0.0:5000")
+    assert replacement is not None
+    replacement.close()
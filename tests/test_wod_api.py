@@ -0,0 +1,269 @@
+import threading
+import unittest
+from unittest.mock import patch
+import json
+import datetime
+import jwt
+import pytest
+from src.fit.app import create_app
+from src.fit.database import db_session
+from src.fit.models_db import UserModel, UserExerciseHistoryModel, DailyWODModel
+from src.fit.services.wod_engine import WODEngine
+from src.fit.services.wod_jobs import WODJobManager, DatabaseWODJobStore
+from src.fit.services.fitness_coach_service import save_exercise_history_batch
+from src.fit.services.wod_of_the_day import WODPregenerator, WODOfTheDayService, WODOfTheDayStore, utc_today
+from src.fit.blueprints.fitness import wod_of_the_day, wod_service
+
+
+class TestWodAPI(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _fixtures(self, seed_catalog, count_queries):
+        seed_catalog(exercise_count=12)
+        self.queries = count_queries
+
+    def _token(self, email):
+        token_data = {
+            "sub": email,
+            "name": "Test User",
+            "role": "user",
+            "iss": "fit-api",
+            "iat": datetime.datetime.now(datetime.UTC),
+            "exp": datetime.datetime.now(datetime.UTC) + datetime.timedelta(days=30)
+        }
+        return {'Authorization': f'Bearer {jwt.encode(token_data, "fit-secret-key", algorithm="HS256")}'}
+
+    def setUp(self):
+        self.app = create_app({'TESTING': True})
+        self.client = self.app.test_client()
+
+        db = db_session()
+        db.add(UserModel(email="user@test.com", name="Test User", role="user", password_hash="x"))
+        db.commit()
+        db.close()
+
+        self.headers = self._token("user@test.com")
+
+        # Skip the simulated AI model processing
+        patcher = patch('src.fit.services.fitness_coach_service.heavy_computation')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _history(self):
+        db = db_session()
+        try:
+            return [row.exercise_id for row in db.query(UserExerciseHistoryModel).all()]
+        finally:
+            db.close()
+
+    def test_get_wod_records_history(self):
+        response = self.client.get('/fitness/wod', headers=self.headers)
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(len(data['exercises']), 6)
+        self.assertEqual(sorted(ex['id'] for ex in data['exercises']), sorted(self._history()))
+        for exercise in data['exercises']:
+            self.assertEqual(len(exercise['muscle_groups']), 2)
+
+    def test_get_wod_writes_history_in_one_insert(self):
+        self.queries.clear()
+        response = self.client.get('/fitness/wod', headers=self.headers)
+
+        self.assertEqual(response.status_code, 200)
+        inserts = [q for q in self.queries if q.lstrip().upper().startswith('INSERT INTO USER_EXERCISE_HISTORY')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(len(self._history()), 6)
+
+    def test_get_wod_avoids_recent_exercises(self):
+        save_exercise_history_batch("user@test.com", [(exercise_id, 10.0, 10) for exercise_id in range(1, 7)])
+
+        data = json.loads(self.client.get('/fitness/wod', headers=self.headers).data)
+
+        self.assertFalse({ex['id'] for ex in data['exercises']} & set(range(1, 7)))
+
+    def test_get_wod_is_the_same_all_day(self):
+        first = self.client.get('/fitness/wod', headers=self.headers)
+        second = self.client.get('/fitness/wod', headers=self.headers)
+
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(len(self._history()), 6)
+        max_age = int(second.headers['Cache-Control'].split('max-age=')[1])
+        self.assertTrue(0 < max_age <= 24 * 3600)
+
+        # Other processes read it from the database
+        wod_of_the_day.store.clear_memory()
+        third = self.client.get('/fitness/wod', headers=self.headers)
+        self.assertEqual(json.loads(first.data), json.loads(third.data))
+
+    def test_concurrent_processes_record_the_history_of_one_wod(self):
+        # Two processes share the database, not their memory nor their locks
+        other_process = WODOfTheDayService(wod_service.generate_wod_response, WODOfTheDayStore())
+
+        def generate_while_the_other_process_wins(user_email, save):
+            def save_second(email, wod):
+                other_process.get_or_generate(email)
+                return save(email, wod)
+            return wod_service.generate_wod_response(user_email, save_second)
+
+        first_process = WODOfTheDayService(generate_while_the_other_process_wins, WODOfTheDayStore())
+        wod = first_process.get_or_generate("user@test.com")
+
+        self.assertEqual(wod, other_process.get("user@test.com"))
+        self.assertEqual(sorted(self._history()), sorted(ex.id for ex in wod.exercises))
+
+    def test_wods_of_previous_days_are_purged(self):
+        db = db_session()
+        db.add(DailyWODModel(user_email="user@test.com", day=utc_today() - datetime.timedelta(days=1), payload="{}"))
+        db.commit()
+        db.close()
+
+        WODOfTheDayService(wod_service.generate_wod_response, WODOfTheDayStore()).get_or_generate("user@test.com")
+
+        db = db_session()
+        days = [row.day for row in db.query(DailyWODModel)]
+        db.close()
+        self.assertEqual(days, [utc_today()])
+
+    def test_pregenerator_warms_active_users(self):
+        save_exercise_history_batch("user@test.com", [(1, 10.0, 10)])
+        pregenerator = WODPregenerator(wod_of_the_day, hours="0-24")
+
+        self.assertEqual(pregenerator.run_once(), 1)
+        self.assertEqual(pregenerator.run_once(), 0)
+        self.assertIsNotNone(wod_of_the_day.get("user@test.com"))
+
+    def test_get_wod_from_coach_microservice(self):
+        coach_wod = {"exercises": [
+            {"id": 1, "name": "exercise 3"},
+            {"id": 2, "name": "Exercise 5"},
+            {"id": 3, "name": "Burpees"},
+        ]}
+        with patch.object(wod_service, 'use_microservice', True), \
+                patch.object(wod_service.coach_client, 'generate_wod_batch', return_value=[coach_wod]), \
+                patch('src.fit.services.fitness_coach_service.wod_engine') as engine:
+            response = self.client.get('/fitness/wod', headers=self.headers)
+
+        self.assertEqual(response.status_code, 200)
+        ids = [ex['id'] for ex in json.loads(response.data)['exercises']]
+        # Coach picks mapped by name, completed with catalog exercises
+        self.assertEqual(ids[:2], [3, 5])
+        self.assertEqual(len(set(ids)), 6)
+        self.assertEqual(sorted(ids), sorted(self._history()))
+        # No local heavy computation
+        engine.run.assert_not_called()
+
+    def test_wod_pipeline_runs_each_stage_once(self):
+        wod_service.stats.reset()
+        coach_wod = {"exercises": [{"name": f"Exercise {i}"} for i in range(1, 7)]}
+        with patch.object(wod_service, 'use_microservice', True), \
+                patch.object(wod_service.coach_client, 'generate_wod_batch', return_value=[coach_wod]) as coach, \
+                patch('src.fit.services.fitness_coach_service.wod_engine') as engine:
+            response = self.client.get('/fitness/wod', headers=self.headers)
+
+        self.assertEqual(response.status_code, 200)
+        coach.assert_called_once()
+        engine.run.assert_not_called()
+        history_reads = [q for q in self.queries if q.startswith('SELECT') and 'FROM user_exercise_history' in q]
+        history_writes = [q for q in self.queries if q.startswith('INSERT INTO user_exercise_history')]
+        self.assertEqual((len(history_reads), len(history_writes)), (1, 1))
+
+        metrics = json.loads(self.client.get('/metrics/wod').data)
+        self.assertEqual(metrics["sources"], {"coach": 1})
+        self.assertEqual({name: stage["count"] for name, stage in metrics["stages"].items()},
+                         {"exclusions": 1, "generation": 1, "enrichment": 1, "history": 1})
+
+        # History keeps the suggestions that were returned
+        db = db_session()
+        saved = {(row.exercise_id, row.suggested_reps) for row in db.query(UserExerciseHistoryModel)}
+        db.close()
+        returned = {(ex['id'], ex['suggested_reps']) for ex in json.loads(response.data)['exercises']}
+        self.assertEqual(saved, returned)
+
+    def test_get_wod_saturated_engine(self):
+        engine = WODEngine(workers=0, max_pending=1)
+        started, release = threading.Event(), threading.Event()
+
+        def blocking():
+            started.set()
+            release.wait(5)
+
+        # Another computation holds the only slot
+        holder = threading.Thread(target=engine.run, args=(blocking,))
+        holder.start()
+        started.wait(5)
+        try:
+            with patch('src.fit.services.fitness_coach_service.wod_engine', engine):
+                response = self.client.get('/fitness/wod', headers=self.headers)
+        finally:
+            release.set()
+            holder.join()
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers['Retry-After']), 1)
+        self.assertEqual(self._history(), [])
+
+    def test_wod_job_long_poll(self):
+        response = self.client.post('/fitness/wod/jobs', headers=self.headers)
+
+        self.assertEqual(response.status_code, 202)
+        job = json.loads(response.data)
+        self.assertEqual(response.headers['Location'], f"/fitness/wod/jobs/{job['id']}")
+
+        response = self.client.get(f"/fitness/wod/jobs/{job['id']}?wait=5", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['status'], 'done')
+        self.assertEqual(len(data['result']['exercises']), 6)
+
+    def test_wod_job_is_private(self):
+        job = json.loads(self.client.post('/fitness/wod/jobs', headers=self.headers).data)
+
+        response = self.client.get(f"/fitness/wod/jobs/{job['id']}", headers=self._token("other@test.com"))
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get(f"/fitness/wod/jobs/{job['id']}?wait=5", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_wod_job_is_polled_through_another_process(self):
+        release = threading.Event()
+
+        def generate(user_email):
+            release.wait(5)
+            return wod_of_the_day.get_or_generate(user_email)
+
+        # Each worker process has its own manager, sharing only the database
+        creator = WODJobManager(generate, workers=1, store=DatabaseWODJobStore())
+        self.addCleanup(creator.shutdown)
+        poller = WODJobManager(wod_of_the_day.get_or_generate, workers=1, store=DatabaseWODJobStore())
+        job = creator.submit("user@test.com")
+
+        polled = poller.get(job.id)
+        self.assertEqual(polled.user_email, "user@test.com")
+        self.assertIn(polled.status, ('pending', 'running'))
+        self.assertIsNot(polled, job)
+
+        # Finish the job while the long poll reads it again and again
+        timer = threading.Timer(0.2, release.set)
+        timer.start()
+        self.addCleanup(timer.cancel)
+        with patch('src.fit.blueprints.fitness.wod_jobs', poller):
+            response = self.client.get(f"/fitness/wod/jobs/{job.id}?wait=5", headers=self.headers)
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['status'], 'done')
+        self.assertEqual([ex['id'] for ex in data['result']['exercises']], [ex.id for ex in job.result.exercises])
+
+    def test_wod_job_queue_full(self):
+        with patch('src.fit.blueprints.fitness.wod_jobs.max_queued', 0):
+            response = self.client.post('/fitness/wod/jobs', headers=self.headers)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+
+    def test_get_wod_requires_token(self):
+        response = self.client.get('/fitness/wod')
+        self.assertEqual(response.status_code, 401)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import threading
+import pytest
+from src.fit.services.fitness_coach_service import heavy_computation
+from src.fit.services.wod_engine import WODEngine, WODEngineSaturated
+
+
+def test_runs_in_worker_process():
+    engine = WODEngine(workers=1, max_pending=2)
+    try:
+        assert engine.run(heavy_computation, 0) is None
+        assert engine.stats()["completed"] == 1
+    finally:
+        engine.shutdown()
+
+def test_zero_max_pending_is_unbounded():
+    engine = WODEngine(workers=0, max_pending=0)
+
+    for _ in range(3):
+        assert engine.run(heavy_computation, 0) is None
+    assert engine.stats()["rejected"] == 0
+
+def test_rejects_when_saturated():
+    engine = WODEngine(workers=0, max_pending=1)
+    started, release = threading.Event(), threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(5)
+
+    worker = threading.Thread(target=engine.run, args=(blocking,))
+    worker.start()
+    started.wait(5)
+    try:
+        with pytest.raises(WODEngineSaturated) as exc_info:
+            engine.run(heavy_computation, 0)
+        assert exc_info.value.retry_after >= 1
+        assert engine.stats()["rejected"] == 1
+    finally:
+        release.set()
+        worker.join()
+
+    # The slot is free again once the running computation is done
+    assert engine.run(heavy_computation, 0) is None